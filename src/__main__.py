@@ -1,10 +1,20 @@
 """This script is used to gather data from MercadoLibre API and storeit in a
 database."""
 
-import pandas as pd
+import asyncio
 
 from core import Country, MercadoLibreItems, MercadoLibreUniverse
-from libs import DatabaseHandler, read_config_from_file
+from core.dedup import TitleDeduplicator
+from core.http_cache import ResponseCache
+from core.http_client import MeliSession
+from libs import (
+    METRICS,
+    CategoryIndex,
+    CrawlCheckpoint,
+    DatabaseHandler,
+    ParquetStore,
+    read_config_from_file,
+)
 
 
 def main(config: dict) -> None:
@@ -12,36 +22,62 @@ def main(config: dict) -> None:
     database."""
     _country = config["country"]
 
-    meli = MercadoLibreItems(Country(country=_country))
-    country_products = meli.gell_all_country_products()
-    country_products["description"] = country_products["id"].apply(
-        lambda x: meli.get_product_description(x)
-    )
+    with (
+        ResponseCache() as cache,
+        MeliSession(cache=cache) as session,
+        DatabaseHandler("meli.db") as db,
+    ):
+        store = ParquetStore(config["parquet_root"]) if config.get("storage") == "parquet" else db
+        meli = MercadoLibreItems(Country(country=_country), session=session)
+        checkpoint = CrawlCheckpoint(db, meli.country_id) if config.get("resume") else None
+        country_products = meli.gell_all_country_products(
+            checkpoint=checkpoint, refresh=config.get("refresh", False)
+        )
+        deduplicator = TitleDeduplicator()
+        representatives, _ = deduplicator.cluster(country_products["title"])
+        descriptions, failed_descriptions = asyncio.run(
+            meli.aget_products_descriptions(country_products["id"].iloc[representatives])
+        )
+        # Each listing keeps its own description, aligned on the index: the rest of
+        # a cluster has none, since another seller may describe the same product
+        # differently.
+        country_products["description"] = descriptions.map(
+            lambda description: (description or {}).get("plain_text")
+        )
+        print(f"Near-duplicate listings: {deduplicator.stats}")
+        print(f"Descriptions that could not be fetched: {len(failed_descriptions)}")
 
-    country_products = country_products.filter(
-        ["id", "title", "price", "permalink", "condition", "available_quantity"]
-    )
+        country_products = country_products.filter(
+            ["id", "title", "price", "permalink", "condition", "available_quantity", "description"]
+        )
 
-    meli_universe = MercadoLibreUniverse()
-    categories_universe = meli_universe.get_all_categories_from_all_countries()
+        meli_universe = MercadoLibreUniverse(session=session)
+        categories_universe = meli_universe.get_all_categories_from_all_countries()
+        if config.get("category_tree"):
+            asyncio.run(
+                meli_universe.acrawl_category_tree(
+                    CategoryIndex(db), refresh=config.get("refresh", False)
+                )
+            )
+        print(f"HTTP cache: {cache.stats}")
+        print(f"HTTP latency: {session.latency.summary()}")
 
-    with DatabaseHandler("meli.db") as db:
-        country_products.to_sql(name=f"country_products_{_country}", con=db.cnx)
-        categories_universe.to_sql(name="categories_universe", con=db.cnx)
+        store.write_dataframe(f"country_products_{_country}", country_products)
+        store.write_dataframe("categories_universe", categories_universe)
 
-        print("Data has been stored in the database.")
+        print(f"Data has been stored in the {type(store).__name__}.")
 
-        print(db.get_table_names())
-        print(db.get_table_columns(f"country_products_{_country}"))
-        print(db.get_table_columns("categories_universe"))
-        print(db.get_table_data("categories_universe"))
-        print(db.get_table_data(f"country_products_{_country}"))
+        print(store.get_table_names())
+        print(store.get_table_columns(f"country_products_{_country}"))
+        print(store.get_table_columns("categories_universe"))
+        for table_name in ("categories_universe", f"country_products_{_country}"):
+            columns = store.get_table_columns(table_name)[:1]
+            rows = sum(len(chunk) for chunk in store.iter_table_frames(table_name, columns))
+            print(f"{table_name}: {rows} rows")
+            print(next(store.iter_table_frames(table_name, chunk_size=2), None))
 
-        df = pd.read_sql_query("SELECT * FROM categories_universe", db.cnx)
-        print(df.head(2))
-
-        df2 = pd.read_sql_query(f"SELECT * FROM country_products_{_country}", db.cnx)
-        print(df2.head(2))
+    if config.get("metrics_path"):
+        METRICS.write(config["metrics_path"])
 
 
 if __name__ == "__main__":
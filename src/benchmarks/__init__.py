@@ -0,0 +1,5 @@
+"""Benchmarks of the project.
+
+Run them from the `src` folder, e.g. `python -m benchmarks.collectors`.
+
+"""
@@ -0,0 +1,141 @@
+"""Benchmark of the product collectors: the former `pd.concat` accumulation
+against the batch generators materialized once.
+
+Every case runs in its own process so the peak RSS is not shared between them.
+
+Usage:
+    python -m benchmarks.collectors --rows 10000 100000 1000000
+
+"""
+
+import argparse
+import resource
+import subprocess
+import sys
+import time
+from typing import Iterator
+
+import pandas as pd
+
+from libs import materialize_batches
+
+PAGE_SIZE = 50
+PAGES_PER_CATEGORY = 20
+CASES = ["concat", "pandas", "arrow"]
+
+
+def synthetic_pages(rows: int) -> Iterator[list[dict]]:
+    """Yield search pages shaped like the results of the search endpoint.
+
+    Args:
+    - rows (int): Total number of products.
+
+    Yields:
+    - list[dict]: Products of a search page.
+
+    """
+    for start in range(0, rows, PAGE_SIZE):
+        yield [
+            {
+                "id": f"MCO{i}",
+                "title": f"Producto de prueba número {i}",
+                "price": float(i % 1000),
+                "permalink": f"https://articulo.mercadolibre.com.co/MCO-{i}",
+                "condition": "new" if i % 3 else "used",
+                "available_quantity": i % 50,
+                "seller": {"id": i % 997, "nickname": f"seller_{i % 997}"},
+                "attributes": [{"id": "BRAND", "value_name": f"brand_{i % 31}"}],
+            }
+            for i in range(start, min(start + PAGE_SIZE, rows))
+        ]
+
+
+def legacy_concat(rows: int) -> pd.DataFrame:
+    """Collect the pages as the crawler did before: a `pd.concat` per page
+    inside each category, then a `pd.concat` per category.
+
+    Args:
+    - rows (int): Total number of products.
+
+    Returns:
+    - pd.DataFrame: All the products.
+
+    """
+    all_country_products = pd.DataFrame()
+    all_category_products = pd.DataFrame()
+
+    for page_number, page in enumerate(synthetic_pages(rows), start=1):
+        all_category_products = pd.concat(
+            [all_category_products, pd.DataFrame(page)], ignore_index=True
+        )
+        if page_number % PAGES_PER_CATEGORY == 0:
+            all_country_products = pd.concat([all_country_products, all_category_products])
+            all_category_products = pd.DataFrame()
+
+    return pd.concat([all_country_products, all_category_products])
+
+
+def run_case(case: str, rows: int) -> None:
+    """Run a single case and print its wall time and peak RSS.
+
+    Args:
+    - case (str): One of `CASES`.
+    - rows (int): Total number of products.
+
+    """
+    start = time.perf_counter()
+    if case == "concat":
+        result = legacy_concat(rows)
+    else:
+        result = materialize_batches(synthetic_pages(rows), output=case)
+    elapsed = time.perf_counter() - start
+
+    assert result.shape[0] == rows
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{elapsed:.3f} {peak_rss_mb:.1f}")
+
+
+def main(rows_list: list[int], cases: list[str]) -> None:
+    """Run every case for every number of rows in a subprocess and print a
+    report.
+
+    Args:
+    - rows_list (list[int]): Numbers of rows to benchmark.
+    - cases (list[str]): Cases to benchmark.
+
+    """
+    print(f"{'rows':>10} {'case':>8} {'wall_s':>10} {'peak_rss_mb':>12}")
+    for rows in rows_list:
+        for case in cases:
+            completed = subprocess.run(
+                [
+                    sys.executable,
+                    "-m",
+                    "benchmarks.collectors",
+                    "--case",
+                    case,
+                    "--rows",
+                    str(rows),
+                ],
+                capture_output=True,
+                text=True,
+            )
+            if completed.returncode:
+                print(f"{rows:>10} {case:>8} failed: {completed.stderr.strip().splitlines()[-1]}")
+                continue
+
+            elapsed, peak_rss_mb = completed.stdout.split()
+            print(f"{rows:>10} {case:>8} {float(elapsed):>10.3f} {float(peak_rss_mb):>12.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--case", choices=CASES, help="Run a single case in this process.")
+    parser.add_argument("--cases", choices=CASES, nargs="+", default=CASES)
+    args = parser.parse_args()
+
+    if args.case:
+        run_case(args.case, args.rows[0])
+    else:
+        main(args.rows, args.cases)
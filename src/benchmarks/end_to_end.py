@@ -0,0 +1,186 @@
+"""End-to-end benchmark of the connectors and the database layer against the
+local fake API of `benchmarks.mock_api`: throughput, request latency and peak
+RSS of each case.
+
+Every case runs in its own process so the peak RSS is not shared between them.
+With `--output` the results are appended as JSON lines tagged with the git
+commit, so runs of different commits can be compared.
+
+Usage:
+    python -m benchmarks.end_to_end --categories 20 --products 1000 --latency-ms 5
+    python -m benchmarks.end_to_end --products 800 --subcategories 4 --cases crawl acrawl
+    python -m benchmarks.end_to_end --output bench_results.jsonl
+
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.mock_api import MockCatalog, MockMeliAPI
+from core import Country, MercadoLibreItems, MercadoLibreUniverse
+from core.http_client import MeliSession
+from libs import CategoryIndex, DatabaseHandler
+
+CASES = ["crawl", "acrawl", "descriptions", "universe", "category_tree", "db_write", "db_read"]
+
+
+def run_case(case: str, catalog: MockCatalog) -> dict:
+    """Run a single case against a fresh fake API and measure it.
+
+    Args:
+    - case (str): One of `CASES`.
+    - catalog (MockCatalog): The catalog of the fake API.
+
+    Returns:
+    - dict: The rows, requests, wall time, throughput, latency and peak RSS.
+
+    """
+    api = MockMeliAPI(catalog)
+    session = MeliSession(transport=api.transport(), async_transport=api.async_transport())
+    rows = 0
+
+    with session, tempfile.TemporaryDirectory() as tmp, DatabaseHandler(f"{tmp}/bench.db") as db:
+        if case == "universe":
+            start = time.perf_counter()
+            rows = len(
+                MercadoLibreUniverse(session=session).get_all_categories_from_all_countries()
+            )
+            elapsed = time.perf_counter() - start
+        elif case == "category_tree":
+            index = CategoryIndex(db)
+            start = time.perf_counter()
+            asyncio.run(MercadoLibreUniverse(session=session).acrawl_category_tree(index))
+            elapsed = time.perf_counter() - start
+            rows = db.cur.execute("SELECT COUNT(*) FROM categories;").fetchone()[0]
+        else:
+            meli = MercadoLibreItems(Country(country="Colombia"), session=session)
+            start = time.perf_counter()
+            if case == "crawl":
+                products = meli.gell_all_country_products(limit=None)
+            else:
+                products = asyncio.run(meli.agell_all_country_products(limit=None))
+            elapsed = time.perf_counter() - start
+            rows = len(products)
+
+            if case == "descriptions":
+                start = time.perf_counter()
+                descriptions, _ = asyncio.run(meli.aget_products_descriptions(products["id"]))
+                elapsed = time.perf_counter() - start
+                rows = int(descriptions.notna().sum())
+            elif case == "db_write":
+                start = time.perf_counter()
+                rows = db.write_dataframe("country_products_Colombia", products)
+                elapsed = time.perf_counter() - start
+            elif case == "db_read":
+                db.write_dataframe("country_products_Colombia", products)
+                start = time.perf_counter()
+                rows = sum(len(f) for f in db.iter_table_frames("country_products_Colombia"))
+                elapsed = time.perf_counter() - start
+
+    latency = max(session.latency.summary().values(), key=lambda s: s["count"], default={})
+    return {
+        "case": case,
+        "rows": rows,
+        "requests": api.requests if case not in ("db_write", "db_read") else 0,
+        "wall_s": round(elapsed, 4),
+        "rows_per_s": round(rows / elapsed, 1) if elapsed else None,
+        "p50_ms": round(latency.get("p50", 0) * 1000, 2),
+        "p95_ms": round(latency.get("p95", 0) * 1000, 2),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def git_commit() -> str | None:
+    """Get the short hash of the current git commit.
+
+    Returns:
+    - str | None: The hash, None outside a git repository.
+
+    """
+    completed = subprocess.run(
+        ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True
+    )
+    return completed.stdout.strip() or None
+
+
+def main(cases: list[str], catalog: MockCatalog, output: str | None) -> None:
+    """Run every case in a subprocess and print a report.
+
+    Args:
+    - cases (list[str]): Cases to benchmark.
+    - catalog (MockCatalog): The catalog of the fake API.
+    - output (str | None): The JSON lines file the results are appended to.
+
+    """
+    commit = git_commit()
+    print(f"commit {commit}, catalog {catalog.model_dump()}")
+    print(
+        f"{'case':>13} {'rows':>9} {'requests':>9} {'wall_s':>9} {'rows_per_s':>11}"
+        f" {'p50_ms':>8} {'p95_ms':>8} {'peak_rss_mb':>12}"
+    )
+
+    for case in cases:
+        completed = subprocess.run(
+            [
+                sys.executable,
+                "-m",
+                "benchmarks.end_to_end",
+                "--case",
+                case,
+                "--catalog",
+                catalog.model_dump_json(),
+            ],
+            capture_output=True,
+            text=True,
+        )
+        if completed.returncode:
+            print(f"{case:>13} failed: {completed.stderr.strip().splitlines()[-1]}")
+            continue
+
+        result = json.loads(completed.stdout.strip().splitlines()[-1])
+        print(
+            f"{case:>13} {result['rows']:>9} {result['requests']:>9} {result['wall_s']:>9.3f}"
+            f" {result['rows_per_s']:>11,.0f} {result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f}"
+            f" {result['peak_rss_mb']:>12.1f}"
+        )
+
+        if output:
+            with open(output, "a") as file:
+                record = {"commit": commit, "time": time.time(), **catalog.model_dump(), **result}
+                file.write(json.dumps(record) + os.linesep)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cases", choices=CASES, nargs="+", default=CASES)
+    parser.add_argument("--categories", type=int, default=10)
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--subcategories", type=int, default=0)
+    parser.add_argument("--latency-ms", type=float, default=2.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--output", help="JSON lines file to append the results to.")
+    parser.add_argument("--case", choices=CASES, help="Run a single case in this process.")
+    parser.add_argument("--catalog", help="Catalog of the single case, as JSON.")
+    args = parser.parse_args()
+
+    if args.case:
+        print(json.dumps(run_case(args.case, MockCatalog.model_validate_json(args.catalog))))
+    else:
+        main(
+            args.cases,
+            MockCatalog(
+                categories=args.categories,
+                products_per_category=args.products,
+                subcategories=args.subcategories,
+                latency_ms=args.latency_ms,
+                error_rate=args.error_rate,
+            ),
+            args.output,
+        )
@@ -0,0 +1,106 @@
+"""Import time of the entry points, measured with `python -X importtime`, and
+check that the light entry points do not load the heavy dependencies.
+
+With `--check` it exits with an error when an entry point loads a forbidden
+module or takes longer than its budget, so it can run as a regression test.
+
+Usage:
+    python -m benchmarks.import_time --repeat 3
+    python -m benchmarks.import_time --check
+
+"""
+
+import argparse
+import re
+import subprocess
+import sys
+
+HEAVY = ["pandas", "pyarrow", "numpy", "langchain", "langchain_core"]
+
+# Statement of each entry point, its modules that must stay unloaded and its
+# budget in milliseconds, generous enough to absorb the noise of a CI runner.
+ENTRY_POINTS: dict[str, tuple[str, list[str], float]] = {
+    "core": ("import core", HEAVY, 150),
+    "libs": ("import libs", HEAVY, 150),
+    "Country": ("from core import Country", HEAVY, 300),
+    "LLMConfigBuilder": ("from core import LLMConfigBuilder", HEAVY, 400),
+    "DatabaseHandler": (
+        "from libs import CrawlCheckpoint, DatabaseHandler, LLMResultCache",
+        HEAVY,
+        150,
+    ),
+    "crawler": ("from core import MercadoLibreItems", ["langchain", "langchain_core"], 2000),
+    "crawl_all": ("import crawl_all", ["langchain", "langchain_core"], 2000),
+    "llm_categorizer": ("import llm_categorizer", [], 4000),
+}
+
+_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)$")
+
+
+def measure(statement: str) -> tuple[float, set[str]]:
+    """Run the statement in a fresh interpreter with `-X importtime`.
+
+    Args:
+    - statement (str): The Python statement, e.g. "import core".
+
+    Returns:
+    - tuple[float, set[str]]: The import time in milliseconds, the sum of the
+      top-level imports, and the top-level packages imported.
+
+    """
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    total_us, packages = 0, set()
+    for line in completed.stderr.splitlines():
+        if match := _LINE.match(line):
+            _, cumulative, indent, name = match.groups()
+            packages.add(name.split(".")[0])
+            if not indent:
+                total_us += int(cumulative)
+    return total_us / 1000, packages
+
+
+def main(names: list[str], repeat: int, check: bool) -> int:
+    """Measure every entry point and print a report.
+
+    Args:
+    - names (list[str]): Entry points to measure, keys of ENTRY_POINTS.
+    - repeat (int): Runs per entry point, the fastest one is reported.
+    - check (bool): Whether to fail on forbidden modules or exceeded budgets.
+
+    Returns:
+    - int: The exit code, 1 if a check failed.
+
+    """
+    failures = []
+    print(f"{'entry point':>18} {'import_ms':>10} {'budget_ms':>10}  heavy modules loaded")
+    for name in names:
+        statement, forbidden, budget_ms = ENTRY_POINTS[name]
+        runs = [measure(statement) for _ in range(repeat)]
+        elapsed_ms = min(ms for ms, _ in runs)
+        loaded = sorted(set(HEAVY) & runs[0][1])
+        print(f"{name:>18} {elapsed_ms:>10.1f} {budget_ms:>10.0f}  {', '.join(loaded) or '-'}")
+
+        if unexpected := sorted(set(forbidden) & set(loaded)):
+            failures.append(f"{name} loads {', '.join(unexpected)}")
+        if elapsed_ms > budget_ms:
+            failures.append(f"{name} takes {elapsed_ms:.0f} ms, over its {budget_ms:.0f} ms")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return int(check and bool(failures))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entry-points", nargs="+", choices=ENTRY_POINTS, default=ENTRY_POINTS)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--check", action="store_true")
+    args = parser.parse_args()
+
+    sys.exit(main(list(args.entry_points), args.repeat, args.check))
@@ -0,0 +1,80 @@
+"""Report of the k-NN classifier: rows per second, how many rows it handles
+before the LLM and how much it agrees with the LLM labels of
+`meli_148_categorized.csv`, by cross-validation over the labeled rows.
+
+Usage:
+    python -m benchmarks.knn_classifier --k 5 --min-agreement 0.8 --folds 5
+
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from core import ProductCategory
+from core.knn_classifier import KNNClassifier
+
+LABELS_PATH = Path(__file__).resolve().parents[2] / "meli_148_categorized.csv"
+
+
+def main(labels_path: str, k: int, min_agreement: float, folds: int) -> None:
+    """Classify every fold with an index seeded from the other folds and print
+    the report.
+
+    Args:
+    - labels_path (str): The ';' separated CSV with 'title', 'description' and
+      'category' columns.
+    - k (int): The number of neighbours that vote.
+    - min_agreement (float): The share of the votes required to skip the LLM.
+    - folds (int): The number of cross-validation folds.
+
+    """
+    df = pd.read_csv(labels_path, sep=";")
+    df["llm"] = df["category"].map(ProductCategory.from_text)
+    df = df[df["llm"].notna()].reset_index(drop=True)
+    df["fold"] = np.random.default_rng(0).permutation(len(df)) % folds
+    df["knn"] = None
+
+    fit_time = predict_time = 0.0
+    handled_total = deferred_total = 0
+    for fold in range(folds):
+        train, test = df[df["fold"] != fold], df[df["fold"] == fold]
+        classifier = KNNClassifier(k=k, min_agreement=min_agreement)
+
+        start = time.perf_counter()
+        classifier.fit(train[["title", "description"]].to_dict("records"), train["llm"].tolist())
+        fit_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        df.loc[test.index, "knn"] = classifier.predict_batch(
+            test[["title", "description"]].to_dict("records")
+        )
+        predict_time += time.perf_counter() - start
+        handled_total += classifier.classified
+        deferred_total += classifier.deferred
+
+    handled = df[df["knn"].notna()]
+    agreement = (handled["knn"] == handled["llm"]).mean() if len(handled) else float("nan")
+
+    print(f"rows: {len(df)} in {folds} folds, k={k}, min agreement {min_agreement}")
+    print(f"indexing: {len(df) * (folds - 1) / fit_time:,.0f} rows/s")
+    print(f"classifying: {len(df) / predict_time:,.0f} rows/s")
+    print(f"handled by the neighbours: {handled_total}")
+    print(f"deferred to the LLM: {deferred_total}")
+    print(f"agreement with the LLM labels on the handled rows: {agreement:.1%}")
+    print()
+    print(pd.crosstab(handled["knn"], handled["llm"], rownames=["knn"], colnames=["llm"]))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--labels", default=str(LABELS_PATH))
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--min-agreement", type=float, default=0.8)
+    parser.add_argument("--folds", type=int, default=5)
+    args = parser.parse_args()
+
+    main(args.labels, args.k, args.min_agreement, args.folds)
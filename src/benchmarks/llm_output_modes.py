@@ -0,0 +1,134 @@
+"""Report of the free and constrained output modes of the LLM categorizer:
+rows per second, tokens generated per row, answers that name no category and
+agreement with the labels of `meli_148_categorized.csv`.
+
+It needs a running backend, e.g. Ollama with the model pulled.
+
+Usage:
+    python -m benchmarks.llm_output_modes --family ollama_llms --model phi3 --rows 50
+
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+import pandas as pd
+from langchain_core.exceptions import OutputParserException
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.language_models.llms import BaseLLM
+from langchain_core.output_parsers import StrOutputParser
+
+from core import LLMConfigBuilder, ProductCategory, llm_retriever
+from libs.metrics import METRICS
+from llm_categorizer import CategoryCodeParser, category_prompt_and_parser
+
+LABELS_PATH = Path(__file__).resolve().parents[2] / "meli_148_categorized.csv"
+
+
+def parse_answer(answer: str, output_mode: str) -> ProductCategory | None:
+    """Parse a raw answer of the LLM the way its output mode does.
+
+    Args:
+    - answer (str): The raw answer.
+    - output_mode (str): "free" or "constrained".
+
+    Returns:
+    - ProductCategory | None: The category, None if the answer names none.
+
+    """
+    if output_mode == "free":
+        return ProductCategory.from_text(answer)
+    try:
+        return CategoryCodeParser().parse(answer)
+    except OutputParserException:
+        return None
+
+
+def run_mode(
+    llm: BaseLLM | BaseChatModel,
+    output_mode: str,
+    products: list[dict[str, str]],
+    max_concurrency: int,
+) -> tuple[dict, list[ProductCategory | None]]:
+    """Categorize the products in an output mode, keeping the raw answers.
+
+    Args:
+    - llm (BaseLLM | BaseChatModel): The LLM built for the output mode.
+    - output_mode (str): "free" or "constrained".
+    - products (list[dict[str, str]]): The title and description of each product.
+    - max_concurrency (int): The maximum number of requests in flight.
+
+    Returns:
+    - tuple[dict, list[ProductCategory | None]]: The report of the mode and the
+      category of each product.
+
+    """
+    prompt, _ = category_prompt_and_parser(output_mode)
+    chain = prompt | llm | StrOutputParser()
+
+    METRICS.reset()
+    start = time.perf_counter()
+    answers = chain.batch(products, config={"max_concurrency": max_concurrency})
+    elapsed = time.perf_counter() - start
+
+    labels = [parse_answer(answer, output_mode) for answer in answers]
+    tokens = {
+        series["labels"]["kind"]: series["value"]
+        for series in METRICS.snapshot()["counters"].get("llm_tokens_total", [])
+    }
+    report = {
+        "mode": output_mode,
+        "rows_per_s": len(products) / elapsed,
+        "s_per_row": elapsed / len(products),
+        "completion_tokens_per_row": tokens.get("completion", 0) / len(products),
+        "answer_chars_per_row": sum(len(answer) for answer in answers) / len(products),
+        "invalid": labels.count(None) / len(products),
+    }
+    return report, labels
+
+
+def main(labels_path: str, family: str, model: str, rows: int, max_concurrency: int) -> None:
+    """Categorize the first rows of the labeled CSV in both output modes and
+    print the report.
+
+    Args:
+    - labels_path (str): The ';' separated CSV with 'title', 'description' and
+      'category' columns.
+    - family (str): The family of the LLM, see `LLMConfigBuilder`.
+    - model (str): The model name.
+    - rows (int): The number of rows to categorize.
+    - max_concurrency (int): The maximum number of requests in flight.
+
+    """
+    df = pd.read_csv(labels_path, sep=";").head(rows)
+    products = df[["title", "description"]].fillna("").to_dict("records")
+    expected = df["category"].map(ProductCategory.from_text)
+
+    reports = []
+    for output_mode in ("free", "constrained"):
+        config = LLMConfigBuilder(
+            family=family,
+            model=model,
+            ls_project_name="meli",
+            llm_args={"temperature": 0},
+            output_mode=output_mode,
+        )
+        report, labels = run_mode(llm_retriever(config), output_mode, products, max_concurrency)
+        report["agreement"] = (pd.Series(labels, dtype=object) == expected).mean()
+        reports.append(report)
+
+    print(f"rows: {len(products)}, model: {family}/{model}")
+    print(pd.DataFrame(reports).set_index("mode").round(3).to_string())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--labels", default=str(LABELS_PATH))
+    parser.add_argument("--family", default="ollama_llms")
+    parser.add_argument("--model", default="phi3")
+    parser.add_argument("--rows", type=int, default=50)
+    parser.add_argument("--max-concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    main(args.labels, args.family, args.model, args.rows, args.max_concurrency)
@@ -0,0 +1,300 @@
+"""Local fake of the MercadoLibre API, served through httpx mock transports,
+with a synthetic catalog of configurable size, latency and error rate.
+
+Usage:
+    api = MockMeliAPI(MockCatalog(categories=10, products_per_category=1000))
+    meli = MercadoLibreItems(
+        Country(country="Colombia"),
+        transport=api.transport(),
+        async_transport=api.async_transport(),
+    )
+
+"""
+
+import asyncio
+import random
+import time
+from typing import get_args
+
+from httpx import (
+    AsyncBaseTransport,
+    BaseTransport,
+    MockTransport,
+    QueryParams,
+    Request,
+    Response,
+)
+from pydantic import BaseModel
+
+from core.base_models import Country
+
+SITE_IDS = [
+    "MLC", "MEC", "MNI", "MPE", "MCO", "MCU", "MBO", "MLV", "MLU", "MPA",
+    "MLA", "MLB", "MCR", "MGT", "MRD", "MSV", "MPY", "MLM", "MHN",
+]  # fmt: skip
+CONDITIONS = ["new", "used", "not_specified"]
+PAGE_SIZE = 50
+
+
+class MockCatalog(BaseModel):
+    """Size and behaviour of the fake API.
+
+    Args:
+        categories (int): Categories per country.
+        products_per_category (int): Listings of each leaf category.
+        subcategories (int): Children of each category, at most 100. Each one is a
+            leaf with products_per_category listings. 0 makes the categories the
+            leaves.
+        latency_ms (float): Latency added to every response.
+        error_rate (float): Share of the search and items requests answered 503.
+        max_offset (int): Largest search offset served, like the real API.
+        seed (int): Seed of the errors.
+
+    """
+
+    categories: int = 5
+    products_per_category: int = 1000
+    subcategories: int = 0
+    latency_ms: float = 0.0
+    error_rate: float = 0.0
+    max_offset: int = 1000
+    seed: int = 0
+
+
+class MockMeliAPI:
+    """A class that answers the endpoints used by the connectors from a
+    synthetic catalog, generated on the fly so its size costs no memory."""
+
+    def __init__(self, catalog: MockCatalog | None = None):
+        """Initialize the MockMeliAPI object.
+
+        Args:
+            catalog (MockCatalog | None, optional): The catalog to serve. Defaults
+                to MockCatalog().
+
+        """
+        self.catalog = catalog or MockCatalog()
+        self.sites = [
+            {"id": site_id, "name": name, "default_currency_id": f"{site_id[1:]}$"}
+            for site_id, name in zip(SITE_IDS, get_args(Country.model_fields["country"].annotation))
+        ]
+        self.requests = 0
+        self.errors = 0
+        self._random = random.Random(self.catalog.seed)
+
+    def transport(self) -> BaseTransport:
+        """Get a sync transport of the fake API.
+
+        Returns:
+            BaseTransport: The transport, its latency blocks the thread.
+
+        """
+
+        def handler(request: Request) -> Response:
+            """Answer the request after the latency."""
+            time.sleep(self.catalog.latency_ms / 1000)
+            return self.handle(request)
+
+        return MockTransport(handler)
+
+    def async_transport(self) -> AsyncBaseTransport:
+        """Get an async transport of the fake API.
+
+        Returns:
+            AsyncBaseTransport: The transport, its latency awaits.
+
+        """
+
+        async def handler(request: Request) -> Response:
+            """Answer the request after the latency."""
+            await asyncio.sleep(self.catalog.latency_ms / 1000)
+            return self.handle(request)
+
+        return MockTransport(handler)
+
+    def product(self, category_id: str, position: int) -> dict:
+        """Build a search result shaped like the real ones.
+
+        Args:
+            category_id (str): The id of the category.
+            position (int): The position of the product in the category.
+
+        Returns:
+            dict: The product.
+
+        """
+        item_id = f"{category_id}{position:07d}"
+        return {
+            "id": item_id,
+            "title": (
+                f"Producto {position % 97} de la categoría {category_id} x {position % 6 + 1}"
+            ),
+            "price": float(1000 + position * 37 % 100_000),
+            "permalink": f"https://articulo.mercadolibre.com/{item_id}",
+            "condition": CONDITIONS[position % 3],
+            "available_quantity": position % 50,
+            "currency_id": "COP",
+            "seller": {"id": position % 997, "nickname": f"seller_{position % 997}"},
+            "shipping": {"free_shipping": bool(position % 2), "logistic_type": "fulfillment"},
+            "attributes": [{"id": "BRAND", "value_name": f"brand_{position % 31}"}],
+        }
+
+    def children(self, category_id: str) -> list[str]:
+        """Get the subcategories of a category.
+
+        Args:
+            category_id (str): The id of the category.
+
+        Returns:
+            list[str]: The ids of the subcategories, empty for a leaf.
+
+        """
+        # The top-level ids are the site and 4 digits, e.g. MCO1000.
+        if len(category_id) != 7:
+            return []
+        return [f"{category_id}{j:02d}" for j in range(self.catalog.subcategories)]
+
+    def total(self, category_id: str, condition: str | None = None) -> int:
+        """Get the listing count of a category.
+
+        Args:
+            category_id (str): The id of the category.
+            condition (str | None, optional): The condition the listings are
+                filtered on. Defaults to None.
+
+        Returns:
+            int: The listing count.
+
+        """
+        leaves = len(self.children(category_id)) or 1
+        per_leaf = self.catalog.products_per_category
+        if condition is not None:
+            per_leaf = len(range(CONDITIONS.index(condition), per_leaf, len(CONDITIONS)))
+        return leaves * per_leaf
+
+    def search(self, category_id: str, condition: str | None, params: QueryParams) -> Response:
+        """Answer a search page of a category, like the real endpoint: the
+        paging, the results, and the filters that narrow the search.
+
+        The listings of a category are the ones of its leaves one after the
+        other, and filtering on a condition keeps every third listing of a leaf.
+
+        Args:
+            category_id (str): The id of the category.
+            condition (str | None): The condition the listings are filtered on.
+            params (QueryParams): The query parameters, with the offset.
+
+        Returns:
+            Response: The search page, 400 past the maximum offset.
+
+        """
+        offset = int(params.get("offset", 0))
+        if offset > self.catalog.max_offset:
+            return Response(400, json={"message": "offset exceeds the maximum"})
+
+        leaves = self.children(category_id) or [category_id]
+        per_leaf = self.total(leaves[0], condition)
+        total = len(leaves) * per_leaf
+        step, first = (
+            (1, 0) if condition is None else (len(CONDITIONS), CONDITIONS.index(condition))
+        )
+
+        filters = []
+        if self.children(category_id):
+            filters.append(
+                {
+                    "id": "category",
+                    "name": "Categorías",
+                    "values": [{"id": leaf, "results": per_leaf} for leaf in leaves],
+                }
+            )
+        if condition is None:
+            filters.append(
+                {
+                    "id": "ITEM_CONDITION",
+                    "name": "Condición",
+                    "values": [
+                        {"id": value, "results": self.total(category_id, value)}
+                        for value in CONDITIONS
+                    ],
+                }
+            )
+
+        return Response(
+            200,
+            json={
+                "paging": {"total": total, "offset": offset, "limit": PAGE_SIZE},
+                "results": [
+                    self.product(leaves[k // per_leaf], first + step * (k % per_leaf))
+                    for k in range(offset, min(offset + PAGE_SIZE, total))
+                ],
+                "available_filters": filters,
+            },
+        )
+
+    def handle(self, request: Request) -> Response:
+        """Answer a request of the connectors.
+
+        Args:
+            request (Request): The request.
+
+        Returns:
+            Response: The JSON response, 404 for an unknown path.
+
+        """
+        self.requests += 1
+        parts = [part for part in request.url.path.split("/") if part]
+        params = request.url.params
+
+        if parts == ["sites"]:
+            return Response(200, json=self.sites)
+
+        if len(parts) == 3 and parts[0] == "sites" and parts[2] == "categories":
+            return Response(
+                200,
+                json=[
+                    {"id": f"{parts[1]}{1000 + i}", "name": f"Categoría {i}"}
+                    for i in range(self.catalog.categories)
+                ],
+            )
+
+        if self._random.random() < self.catalog.error_rate:
+            self.errors += 1
+            return Response(503, json={"message": "service unavailable"})
+
+        if len(parts) == 2 and parts[0] == "categories":
+            children = self.children(parts[1])
+            return Response(
+                200,
+                json={
+                    "id": parts[1],
+                    "name": f"Categoría {parts[1]}",
+                    "total_items_in_this_category": self.total(parts[1]),
+                    "children_categories": [
+                        {
+                            "id": child,
+                            "name": f"Categoría {child}",
+                            "total_items_in_this_category": self.total(child),
+                        }
+                        for child in children
+                    ],
+                },
+            )
+
+        if len(parts) == 3 and parts[0] == "sites" and parts[2] == "search":
+            return self.search(params["category"], params.get("ITEM_CONDITION"), params)
+
+        if len(parts) == 3 and parts[0] == "items" and parts[2] == "description":
+            return Response(200, json={"id": parts[1], "plain_text": f"Descripción de {parts[1]}"})
+
+        if parts == ["items"]:
+            # The multiget answers the item resources, without their description.
+            return Response(
+                200,
+                json=[
+                    {"code": 200, "body": {"id": item_id, "title": f"Producto {item_id}"}}
+                    for item_id in params["ids"].split(",")
+                ],
+            )
+
+        return Response(404, json={"message": "not found"})
@@ -0,0 +1,137 @@
+"""Report of the packed categorizer against one product per LLM call: rows per
+second, LLM calls and tokens per row, products sent again alone, agreement of
+the two paths and with the labels of `meli_148_categorized.csv`.
+
+It needs a running backend, e.g. Ollama with the model pulled.
+
+Usage:
+    python -m benchmarks.packed_categorizer --family ollama_llms --model phi3 --pack-size 20
+
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+import pandas as pd
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.language_models.llms import BaseLLM
+from langchain_core.output_parsers import StrOutputParser
+
+from core import LLMConfigBuilder, ProductCategory, llm_retriever
+from libs.metrics import METRICS
+from llm_categorizer import CATEGORY_PROMPT, PackedCategoryChain
+
+LABELS_PATH = Path(__file__).resolve().parents[2] / "meli_148_categorized.csv"
+
+
+def run_path(
+    llm: BaseLLM | BaseChatModel,
+    products: list[dict[str, str]],
+    pack_size: int,
+    token_budget: int,
+    max_concurrency: int,
+) -> tuple[dict, list[ProductCategory | None]]:
+    """Categorize the products one per call, or in packs.
+
+    Args:
+    - llm (BaseLLM | BaseChatModel): The LLM.
+    - products (list[dict[str, str]]): The title and description of each product.
+    - pack_size (int): The products per call, 1 for the single-row path.
+    - token_budget (int): The estimated tokens of the products of a pack.
+    - max_concurrency (int): The maximum number of requests in flight.
+
+    Returns:
+    - tuple[dict, list[ProductCategory | None]]: The report of the path and the
+      category of each product.
+
+    """
+    chain = CATEGORY_PROMPT | llm | StrOutputParser()
+    if pack_size > 1:
+        chain = PackedCategoryChain(llm, chain, pack_size, token_budget)
+
+    METRICS.reset()
+    start = time.perf_counter()
+    answers = chain.batch(products, config={"max_concurrency": max_concurrency})
+    elapsed = time.perf_counter() - start
+
+    snapshot = METRICS.snapshot()["counters"]
+    calls = sum(series["value"] for series in snapshot.get("llm_requests_total", []))
+    tokens = {
+        series["labels"]["kind"]: series["value"] for series in snapshot.get("llm_tokens_total", [])
+    }
+    report = {
+        "path": f"packed x{pack_size}" if pack_size > 1 else "single",
+        "rows_per_s": len(products) / elapsed,
+        "calls": calls,
+        "prompt_tokens_per_row": tokens.get("prompt", 0) / len(products),
+        "completion_tokens_per_row": tokens.get("completion", 0) / len(products),
+        "fallbacks": chain.stats["fallbacks"] if pack_size > 1 else 0,
+    }
+    return report, [ProductCategory.from_text(answer) for answer in answers]
+
+
+def main(
+    labels_path: str,
+    family: str,
+    model: str,
+    rows: int | None,
+    pack_size: int,
+    token_budget: int,
+    max_concurrency: int,
+) -> None:
+    """Categorize the labeled CSV one product per call and in packs, and print
+    the report.
+
+    Args:
+    - labels_path (str): The ';' separated CSV with 'title', 'description' and
+      'category' columns.
+    - family (str): The family of the LLM, see `LLMConfigBuilder`.
+    - model (str): The model name.
+    - rows (int | None): The number of rows to categorize, None for all.
+    - pack_size (int): The products per call of the packed path.
+    - token_budget (int): The estimated tokens of the products of a pack.
+    - max_concurrency (int): The maximum number of requests in flight.
+
+    """
+    df = pd.read_csv(labels_path, sep=";").head(rows)
+    products = df[["title", "description"]].fillna("").to_dict("records")
+    expected = df["category"].map(ProductCategory.from_text)
+    config = LLMConfigBuilder(
+        family=family, model=model, ls_project_name="meli", llm_args={"temperature": 0}
+    )
+    llm = llm_retriever(config)
+
+    single_report, single = run_path(llm, products, 1, token_budget, max_concurrency)
+    packed_report, packed = run_path(llm, products, pack_size, token_budget, max_concurrency)
+
+    single = pd.Series(single, dtype=object)
+    packed = pd.Series(packed, dtype=object)
+    single_report["agreement"] = (single == expected).mean()
+    packed_report["agreement"] = (packed == expected).mean()
+    packed_report["agreement_with_single"] = (packed == single).mean()
+
+    print(f"rows: {len(products)}, model: {family}/{model}")
+    print(pd.DataFrame([single_report, packed_report]).set_index("path").round(3).to_string())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--labels", default=str(LABELS_PATH))
+    parser.add_argument("--family", default="ollama_llms")
+    parser.add_argument("--model", default="phi3")
+    parser.add_argument("--rows", type=int, default=None)
+    parser.add_argument("--pack-size", type=int, default=20)
+    parser.add_argument("--token-budget", type=int, default=1500)
+    parser.add_argument("--max-concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    main(
+        args.labels,
+        args.family,
+        args.model,
+        args.rows,
+        args.pack_size,
+        args.token_budget,
+        args.max_concurrency,
+    )
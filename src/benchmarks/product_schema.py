@@ -0,0 +1,96 @@
+"""Benchmark of the memory per product row: the object-dtype DataFrame of the
+raw search results, filtered afterwards, against the rows projected and typed
+with PRODUCT_COLUMNS as the pages are parsed.
+
+Every case runs in its own process so the peak RSS is not shared between them.
+
+Usage:
+    python -m benchmarks.product_schema --rows 10000 100000 1000000
+
+"""
+
+import argparse
+import resource
+import subprocess
+import sys
+import time
+
+from benchmarks.collectors import synthetic_pages
+from libs import materialize_batches
+from libs.schemas import PRODUCT_COLUMNS
+
+CASES = ["objects", "typed", "arrow"]
+
+
+def run_case(case: str, rows: int) -> None:
+    """Run a single case and print its wall time, bytes per row and peak RSS.
+
+    Args:
+    - case (str): One of `CASES`.
+    - rows (int): Total number of products.
+
+    """
+    start = time.perf_counter()
+    if case == "objects":
+        result = materialize_batches(synthetic_pages(rows)).filter(list(PRODUCT_COLUMNS))
+        nbytes = result.memory_usage(deep=True, index=False).sum()
+    elif case == "typed":
+        result = materialize_batches(synthetic_pages(rows), columns=PRODUCT_COLUMNS)
+        nbytes = result.memory_usage(deep=True, index=False).sum()
+    else:
+        result = materialize_batches(synthetic_pages(rows), "arrow", PRODUCT_COLUMNS)
+        nbytes = result.nbytes
+    elapsed = time.perf_counter() - start
+
+    assert result.shape[0] == rows
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{elapsed:.3f} {nbytes / rows:.1f} {peak_rss_mb:.1f}")
+
+
+def main(rows_list: list[int], cases: list[str]) -> None:
+    """Run every case for every number of rows in a subprocess and print a
+    report.
+
+    Args:
+    - rows_list (list[int]): Numbers of rows to benchmark.
+    - cases (list[str]): Cases to benchmark.
+
+    """
+    print(f"{'rows':>10} {'case':>8} {'wall_s':>10} {'bytes_row':>10} {'peak_rss_mb':>12}")
+    for rows in rows_list:
+        for case in cases:
+            completed = subprocess.run(
+                [
+                    sys.executable,
+                    "-m",
+                    "benchmarks.product_schema",
+                    "--case",
+                    case,
+                    "--rows",
+                    str(rows),
+                ],
+                capture_output=True,
+                text=True,
+            )
+            if completed.returncode:
+                print(f"{rows:>10} {case:>8} failed: {completed.stderr.strip().splitlines()[-1]}")
+                continue
+
+            elapsed, bytes_row, peak_rss_mb = completed.stdout.split()
+            print(
+                f"{rows:>10} {case:>8} {float(elapsed):>10.3f} {float(bytes_row):>10.1f}"
+                f" {float(peak_rss_mb):>12.1f}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--case", choices=CASES, help="Run a single case in this process.")
+    parser.add_argument("--cases", choices=CASES, nargs="+", default=CASES)
+    args = parser.parse_args()
+
+    if args.case:
+        run_case(args.case, args.rows[0])
+    else:
+        main(args.rows, args.cases)
@@ -0,0 +1,54 @@
+"""Report of the rule-based pre-classifier: how many rows it handles before the
+LLM and how much it agrees with the LLM labels of `meli_148_categorized.csv`.
+
+Usage:
+    python -m benchmarks.rule_classifier --min-confidence 0.8
+
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from core import ProductCategory
+from core.rule_classifier import RuleClassifier
+
+LABELS_PATH = Path(__file__).resolve().parents[2] / "meli_148_categorized.csv"
+
+
+def main(labels_path: str, min_confidence: float) -> None:
+    """Classify the labeled titles with the rules and print the report.
+
+    Args:
+    - labels_path (str): The ';' separated CSV with 'title' and 'category' columns.
+    - min_confidence (float): The confidence required to skip the LLM.
+
+    """
+    df = pd.read_csv(labels_path, sep=";")
+    df["llm"] = df["category"].map(ProductCategory.from_text)
+
+    classifier = RuleClassifier(min_confidence=min_confidence)
+    start = time.perf_counter()
+    df["rules"] = df["title"].map(classifier.predict)
+    elapsed = time.perf_counter() - start
+
+    handled = df[df["rules"].notna() & df["llm"].notna()]
+    agreement = (handled["rules"] == handled["llm"]).mean() if len(handled) else float("nan")
+
+    print(f"rows: {len(df)} ({len(df) / elapsed:,.0f} rows/s through the rules)")
+    print(f"handled by the rules: {classifier.classified}")
+    print(f"deferred to the LLM: {classifier.deferred}")
+    print(f"agreement with the LLM labels on the handled rows: {agreement:.1%}")
+    print()
+    print(pd.crosstab(handled["rules"], handled["llm"], rownames=["rules"], colnames=["llm"]))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--labels", default=str(LABELS_PATH))
+    parser.add_argument("--min-confidence", type=float, default=0.8)
+    args = parser.parse_args()
+
+    main(args.labels, args.min_confidence)
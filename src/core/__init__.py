@@ -1,13 +1,52 @@
-"""Core module."""
+"""Core module.
 
-from .base_models import Country
-from .llm_initializer import LLMConfigBuilder, llm_retriever
-from .meli_connectors import MercadoLibreItems, MercadoLibreUniverse
+The names are imported from their submodule on first access, so e.g. the
+crawler does not load langchain and `Country` does not load pandas.
+
+"""
+
+from importlib import import_module
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from .base_models import Country, ProductCategory
+    from .llm_initializer import LLMConfigBuilder, embeddings_retriever, llm_retriever
+    from .llm_pool import LLMPool
+    from .meli_connectors import MercadoLibreItems, MercadoLibreUniverse
+
+_SUBMODULES = {
+    "Country": ".base_models",
+    "embeddings_retriever": ".llm_initializer",
+    "LLMConfigBuilder": ".llm_initializer",
+    "llm_retriever": ".llm_initializer",
+    "LLMPool": ".llm_pool",
+    "MercadoLibreItems": ".meli_connectors",
+    "MercadoLibreUniverse": ".meli_connectors",
+    "ProductCategory": ".base_models",
+}
 
 __all__ = [
     "Country",
+    "embeddings_retriever",
     "LLMConfigBuilder",
     "llm_retriever",
+    "LLMPool",
     "MercadoLibreItems",
     "MercadoLibreUniverse",
+    "ProductCategory",
 ]
+
+
+def __getattr__(name: str) -> Any:
+    """Import a public name from its submodule on first access."""
+    if name not in _SUBMODULES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    value = getattr(import_module(_SUBMODULES[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    """List the public names of the module."""
+    return sorted(__all__)
@@ -1,6 +1,8 @@
 """This module contains the base models for the application."""
 
-from typing import Literal
+import re
+from enum import StrEnum
+from typing import Literal, Self
 
 from pydantic import BaseModel
 
@@ -29,3 +31,35 @@ class Country(BaseModel):
         "Mexico",
         "Honduras",
     ]
+
+
+class ProductCategory(StrEnum):
+    """This class represents the categories a product is sold in."""
+
+    MULTIPLE_UNITS = "multiple_units"
+    SINGLE_UNIT = "single_unit"
+    PACKAGE = "package"
+
+    @classmethod
+    def from_text(cls, text: str) -> Self | None:
+        """This method parses the category from a free text answer, e.g. of an
+        LLM, taking the first category mentioned in English or Spanish.
+
+        Args:
+            text (str): The text to parse.
+
+        Returns:
+            ProductCategory | None: The category, None if the text mentions none.
+
+        """
+        match = _CATEGORY_PATTERN.search(str(text).lower())
+        if match is None:
+            return None
+        return next(cls(name) for name, value in match.groupdict().items() if value)
+
+
+_CATEGORY_PATTERN = re.compile(
+    r"(?P<multiple_units>multiple[_ ]units?|varias unidades|m[uú]ltiples unidades)"
+    r"|(?P<single_unit>single[_ ]units?|una unidad|unidad individual)"
+    r"|(?P<package>packages?|paquetes?)"
+)
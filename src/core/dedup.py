@@ -0,0 +1,190 @@
+"""This module contains the near-duplicate detection of the listings, so the
+descriptions and categories are requested once per group of listings of the same
+product."""
+
+import re
+import unicodedata
+import zlib
+from typing import Hashable, Iterable
+
+import numpy as np
+
+# Prime above 2**32 for the universal hashes of the MinHash permutations.
+_PRIME = (1 << 32) + 15
+
+
+def normalize_title(title: str) -> str:
+    """This function lowercases a title and removes its accents, punctuation and
+    repeated whitespace.
+
+    Args:
+        title (str): The title of the listing.
+
+    Returns:
+        str: The normalized title.
+
+    """
+    title = unicodedata.normalize("NFKD", str(title).lower())
+    title = "".join(c for c in title if not unicodedata.combining(c))
+    return " ".join(re.findall(r"\w+", title))
+
+
+def title_numbers(title: str) -> tuple[int, ...]:
+    """This function returns the numbers of a title, e.g. the unit counts of
+    "Paquete X 6unidades", as the key two near-duplicates must share.
+
+    Args:
+        title (str): The title of the listing.
+
+    Returns:
+        tuple[int, ...]: The numbers of the title, sorted.
+
+    """
+    return tuple(sorted(int(number) for number in re.findall(r"\d+", normalize_title(title))))
+
+
+class TitleDeduplicator:
+    """This class clusters the listings whose normalized titles are near
+    duplicates, with MinHash signatures of their character shingles and
+    locality-sensitive hashing over bands of the signatures.
+
+    The titles of a cluster also have exactly the same numbers, since "Kit De 2
+    Llantas" and "Kit De 4 Llantas" are near duplicates as text but not the same
+    product, and the unit count decides their category.
+
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.8,
+        num_perm: int = 128,
+        bands: int = 16,
+        shingle_size: int = 4,
+        seed: int = 0,
+    ):
+        """This method initializes the class.
+
+        Args:
+            threshold (float, optional): The estimated Jaccard similarity of the
+                shingles above which two titles are duplicates. Defaults to 0.8.
+            num_perm (int, optional): The number of hash functions of a signature.
+                Defaults to 128.
+            bands (int, optional): The number of LSH bands, num_perm must be a
+                multiple of it. Defaults to 16.
+            shingle_size (int, optional): The characters per shingle. Defaults to 4.
+            seed (int, optional): The seed of the hash functions. Defaults to 0.
+
+        """
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, 1 << 31, num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, 1 << 32, num_perm, dtype=np.uint64)
+        self.threshold = threshold
+        self.bands = bands
+        self.shingle_size = shingle_size
+        self.rows = 0
+        self.clusters = 0
+
+    @property
+    def stats(self) -> dict[str, float]:
+        """Property: This method returns the rows and clusters seen, and the
+        share of the rows that were duplicates."""
+        ratio = 1 - self.clusters / self.rows if self.rows else 0.0
+        return {"rows": self.rows, "clusters": self.clusters, "dedup_ratio": round(ratio, 4)}
+
+    def shingles(self, title: str) -> np.ndarray:
+        """This method returns the hashes of the character shingles of a title.
+
+        Args:
+            title (str): The title of the listing.
+
+        Returns:
+            np.ndarray: The unique 32 bits hashes of the shingles.
+
+        """
+        text = f" {normalize_title(title)} "
+        size = min(self.shingle_size, len(text))
+        return np.unique(
+            np.fromiter(
+                (zlib.crc32(text[i : i + size].encode()) for i in range(len(text) - size + 1)),
+                dtype=np.uint64,
+            )
+        )
+
+    def signatures(self, titles: Iterable[str]) -> np.ndarray:
+        """This method returns the MinHash signature of each title, computed
+        once per distinct normalized title.
+
+        Args:
+            titles (Iterable[str]): The titles of the listings.
+
+        Returns:
+            np.ndarray: The signatures, one row per title.
+
+        """
+        distinct: dict[str, int] = {}
+        rows = [distinct.setdefault(normalize_title(title), len(distinct)) for title in titles]
+        signatures = np.array(
+            [
+                ((np.outer(self.a, self.shingles(title)) + self.b[:, None]) % _PRIME).min(axis=1)
+                for title in distinct
+            ],
+            dtype=np.uint64,
+        ).reshape(-1, len(self.a))
+        return signatures[np.array(rows, dtype=np.int64)]
+
+    def cluster(
+        self, titles: Iterable[str], keys: Iterable[Hashable] | None = None
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """This method clusters the near-duplicate titles.
+
+        Within each LSH band the titles sharing a bucket are compared with the
+        first title of the bucket, and joined to its cluster if they have the
+        same numbers and keys and their estimated similarity reaches the
+        threshold.
+
+        Args:
+            titles (Iterable[str]): The titles of the listings.
+            keys (Iterable[Hashable] | None, optional): A value of each listing
+                that must be equal too, e.g. its description. Defaults to None.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: The positions of the representative
+                listing of each cluster, the first one in the input, and for every
+                listing the position of its cluster in the representatives, so
+                `values[inverse]` propagates the values of the representatives.
+
+        """
+        titles = list(titles)
+        keys = [None] * len(titles) if keys is None else list(keys)
+        matches = [(title_numbers(title), key) for title, key in zip(titles, keys)]
+        signatures = self.signatures(titles)
+        parents = np.arange(len(signatures))
+
+        def find(i: int) -> int:
+            """This function returns the root of the cluster of a listing."""
+            while parents[i] != i:
+                parents[i] = parents[parents[i]]
+                i = parents[i]
+            return i
+
+        for band in np.split(signatures, self.bands, axis=1):
+            if not len(band):
+                break
+            _, first, buckets = np.unique(band, axis=0, return_index=True, return_inverse=True)
+            leaders = first[buckets.ravel()]
+            for i in np.flatnonzero(leaders != np.arange(len(leaders))):
+                leader = leaders[i]
+                root_i, root_leader = find(i), find(leader)
+                if root_i == root_leader or matches[i] != matches[leader]:
+                    continue
+                if np.mean(signatures[i] == signatures[leader]) >= self.threshold:
+                    parents[max(root_i, root_leader)] = min(root_i, root_leader)
+
+        roots = np.array([find(i) for i in range(len(parents))], dtype=np.int64)
+        positions, inverse = np.unique(roots, return_inverse=True)
+        self.rows += len(roots)
+        self.clusters += len(positions)
+        return positions, inverse.ravel()
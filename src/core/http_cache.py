@@ -0,0 +1,507 @@
+"""This module contains the persistent cache of the MercadoLibre API responses,
+plugged into the connectors as httpx transports."""
+
+import json
+import re
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Self
+
+from httpx import (
+    AsyncBaseTransport,
+    AsyncHTTPTransport,
+    BaseTransport,
+    HTTPTransport,
+    Request,
+    Response,
+)
+
+from libs import DatabaseHandler
+
+# Seconds a response stays fresh, by regex over the url path. 0 means it is
+# always revalidated with its ETag, paths without a match are never cached.
+DEFAULT_TTLS = {
+    r"^/sites/?$": 24 * 3600,
+    r"^/sites/\w+/categories/?$": 24 * 3600,
+    r"^/categories/": 24 * 3600,
+    r"^/items": 3600,
+    r"^/sites/\w+/search/?$": 15 * 60,
+}
+
+# Seconds an expired response is kept to be revalidated with its ETag, before
+# it is evicted from the store.
+DEFAULT_KEEP_EXPIRED_S = 7 * 24 * 3600
+
+# Headers that describe the raw body, which is stored already decoded.
+_DROPPED_HEADERS = {"content-encoding", "content-length", "transfer-encoding"}
+
+
+class CacheStore(ABC):
+    """This class is the interface of the stores used by `ResponseCache`.
+
+    It is a context manager that closes the store on exit.
+
+    """
+
+    @abstractmethod
+    def get(self, key: str) -> dict[str, Any] | None:
+        """This method returns the stored entry of the key, if any.
+
+        Args:
+            key (str): Key of the entry.
+
+        Returns:
+            dict[str, Any] | None: Entry with the keys `status_code`, `headers`,
+                `content`, `etag` and `expires_at`.
+
+        """
+
+    @abstractmethod
+    def set(self, key: str, entry: dict[str, Any]) -> None:
+        """This method stores the entry of the key.
+
+        Args:
+            key (str): Key of the entry.
+            entry (dict[str, Any]): Entry as returned by `get`.
+
+        """
+
+    @abstractmethod
+    def touch(self, key: str, expires_at: float) -> None:
+        """This method extends the freshness of the entry of the key.
+
+        Args:
+            key (str): Key of the entry.
+            expires_at (float): New expiration timestamp.
+
+        """
+
+    @abstractmethod
+    def evict(self, expired_before: float) -> int:
+        """This method removes the entries expired before a timestamp.
+
+        Args:
+            expired_before (float): Expiration timestamp of the oldest entry kept.
+
+        Returns:
+            int: The number of entries removed.
+
+        """
+
+    @abstractmethod
+    def clear(self) -> None:
+        """This method removes every entry."""
+
+    @abstractmethod
+    def close(self) -> None:
+        """This method releases the resources of the store."""
+
+    def __enter__(self) -> Self:
+        """This method enters the context manager.
+
+        Returns:
+            Self: The current instance.
+
+        """
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """This method exits the context manager, closing the store.
+
+        Args:
+            exc_type: The type of the exception.
+            exc_val: The exception value.
+            exc_tb: The exception traceback.
+
+        """
+        self.close()
+
+
+class SQLiteCacheStore(CacheStore):
+    """This class stores the cached responses in a SQLite database."""
+
+    def __init__(self, db_name: str = "http_cache.db"):
+        """This method initializes the class and creates the cache table.
+
+        Args:
+            db_name (str, optional): Database file. Defaults to "http_cache.db".
+
+        """
+        self.db = DatabaseHandler(db_name)
+        self.db.connect_to_db()
+        self.db.cur.execute(
+            """CREATE TABLE IF NOT EXISTS http_cache (
+                key TEXT PRIMARY KEY,
+                status_code INTEGER NOT NULL,
+                headers TEXT NOT NULL,
+                content BLOB NOT NULL,
+                etag TEXT,
+                expires_at REAL NOT NULL
+            )"""
+        )
+        self.db.cur.execute(
+            "CREATE INDEX IF NOT EXISTS ix_http_cache_expires_at ON http_cache (expires_at);"
+        )
+        self.db.cnx.commit()
+
+    def get(self, key: str) -> dict[str, Any] | None:
+        """This method returns the stored entry of the key, if any.
+
+        Args:
+            key (str): Key of the entry.
+
+        Returns:
+            dict[str, Any] | None: The stored entry.
+
+        """
+        row = self.db.cur.execute(
+            "SELECT status_code, headers, content, etag, expires_at FROM http_cache WHERE key = ?",
+            (key,),
+        ).fetchone()
+        if row is None:
+            return None
+
+        status_code, headers, content, etag, expires_at = row
+        return {
+            "status_code": status_code,
+            "headers": json.loads(headers),
+            "content": content,
+            "etag": etag,
+            "expires_at": expires_at,
+        }
+
+    def set(self, key: str, entry: dict[str, Any]) -> None:
+        """This method stores the entry of the key.
+
+        Args:
+            key (str): Key of the entry.
+            entry (dict[str, Any]): Entry to store.
+
+        """
+        self.db.cur.execute(
+            "INSERT OR REPLACE INTO http_cache VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                key,
+                entry["status_code"],
+                json.dumps(entry["headers"]),
+                entry["content"],
+                entry["etag"],
+                entry["expires_at"],
+            ),
+        )
+        self.db.cnx.commit()
+
+    def touch(self, key: str, expires_at: float) -> None:
+        """This method extends the freshness of the entry of the key.
+
+        Args:
+            key (str): Key of the entry.
+            expires_at (float): New expiration timestamp.
+
+        """
+        self.db.cur.execute("UPDATE http_cache SET expires_at = ? WHERE key = ?", (expires_at, key))
+        self.db.cnx.commit()
+
+    def evict(self, expired_before: float) -> int:
+        """This method removes the entries expired before a timestamp.
+
+        Args:
+            expired_before (float): Expiration timestamp of the oldest entry kept.
+
+        Returns:
+            int: The number of entries removed.
+
+        """
+        removed = self.db.cur.execute(
+            "DELETE FROM http_cache WHERE expires_at < ?", (expired_before,)
+        ).rowcount
+        self.db.cnx.commit()
+        return removed
+
+    def clear(self) -> None:
+        """This method removes every entry."""
+        self.db.cur.execute("DELETE FROM http_cache")
+        self.db.cnx.commit()
+
+    def close(self) -> None:
+        """This method closes the connection to the database."""
+        self.db.close_connection()
+
+
+class ResponseCache:
+    """This class decides which responses are cached, for how long, and counts
+    the hits and misses of the cache.
+
+    It can be shared by several connectors, e.g. `MercadoLibreItems` and
+    `MercadoLibreUniverse`, so the metadata downloaded by one of them is served
+    from the store to the others and to the next runs.
+
+    The entries expired for longer than `keep_expired_s` are evicted when the
+    cache is opened, so the store does not grow with every crawl. It is a
+    context manager that closes the store on exit.
+
+    """
+
+    def __init__(
+        self,
+        store: CacheStore | None = None,
+        ttls: dict[str, float] | None = None,
+        keep_expired_s: float = DEFAULT_KEEP_EXPIRED_S,
+    ):
+        """This method initializes the class and evicts the old entries.
+
+        Args:
+            store (CacheStore | None, optional): Store of the responses. Defaults to
+                a SQLiteCacheStore.
+            ttls (dict[str, float] | None, optional): Seconds a response stays fresh
+                by regex over the url path. Defaults to DEFAULT_TTLS.
+            keep_expired_s (float, optional): Seconds an expired response is kept
+                to be revalidated. Defaults to DEFAULT_KEEP_EXPIRED_S.
+
+        """
+        self.store = store or SQLiteCacheStore()
+        self.ttls = [(re.compile(pattern), ttl) for pattern, ttl in (ttls or DEFAULT_TTLS).items()]
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.evictions = self.store.evict(time.time() - keep_expired_s)
+
+    @property
+    def stats(self) -> dict[str, int]:
+        """Property: This method returns the counters of the cache."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "revalidations": self.revalidations,
+            "evictions": self.evictions,
+        }
+
+    def close(self) -> None:
+        """This method closes the store."""
+        self.store.close()
+
+    def __enter__(self) -> Self:
+        """This method enters the context manager.
+
+        Returns:
+            Self: The current instance.
+
+        """
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """This method exits the context manager, closing the store.
+
+        Args:
+            exc_type: The type of the exception.
+            exc_val: The exception value.
+            exc_tb: The exception traceback.
+
+        """
+        self.close()
+
+    def ttl(self, request: Request) -> float | None:
+        """This method returns the seconds a response to the request is fresh.
+
+        Args:
+            request (Request): The request.
+
+        Returns:
+            float | None: The seconds, None if the response must not be cached.
+
+        """
+        if request.method != "GET":
+            return None
+
+        for pattern, ttl in self.ttls:
+            if pattern.search(request.url.path):
+                return ttl
+        return None
+
+    @staticmethod
+    def key(request: Request) -> str:
+        """This method returns the key of the request in the store.
+
+        Args:
+            request (Request): The request.
+
+        Returns:
+            str: The url of the request, without trailing slash in the path.
+
+        """
+        return str(request.url.copy_with(path=request.url.path.rstrip("/") or "/"))
+
+    def prepare(self, request: Request) -> tuple[Response | None, dict[str, Any] | None]:
+        """This method looks the request up in the store before it is sent.
+
+        Args:
+            request (Request): The request.
+
+        Returns:
+            tuple[Response | None, dict[str, Any] | None]: The cached response if
+                it is still fresh, and the stored entry to revalidate otherwise.
+
+        """
+        entry = self.store.get(self.key(request))
+        if entry is None:
+            return None, None
+
+        if entry["expires_at"] > time.time():
+            self.hits += 1
+            return self._build_response(request, entry), entry
+
+        if entry["etag"]:
+            request.headers["If-None-Match"] = entry["etag"]
+        return None, entry
+
+    def process(
+        self, request: Request, response: Response, entry: dict[str, Any] | None, ttl: float
+    ) -> Response:
+        """This method stores the response, or refreshes the stored entry when
+        the server answers it has not been modified.
+
+        Args:
+            request (Request): The request sent.
+            response (Response): The response read from the server.
+            entry (dict[str, Any] | None): The stored entry being revalidated.
+            ttl (float): Seconds the response stays fresh.
+
+        Returns:
+            Response: The response to return to the client.
+
+        """
+        key = self.key(request)
+
+        if response.status_code == 304 and entry is not None:
+            self.revalidations += 1
+            self.store.touch(key, time.time() + ttl)
+            return self._build_response(request, entry)
+
+        self.misses += 1
+        headers = {k: v for k, v in response.headers.items() if k.lower() not in _DROPPED_HEADERS}
+        if response.status_code == 200:
+            self.store.set(
+                key,
+                {
+                    "status_code": response.status_code,
+                    "headers": headers,
+                    "content": response.content,
+                    "etag": response.headers.get("ETag"),
+                    "expires_at": time.time() + ttl,
+                },
+            )
+
+        return Response(
+            response.status_code, headers=headers, content=response.content, request=request
+        )
+
+    @staticmethod
+    def _build_response(request: Request, entry: dict[str, Any]) -> Response:
+        """This method builds a response from a stored entry.
+
+        Args:
+            request (Request): The request.
+            entry (dict[str, Any]): The stored entry.
+
+        Returns:
+            Response: The cached response.
+
+        """
+        return Response(
+            entry["status_code"],
+            headers=entry["headers"],
+            content=entry["content"],
+            request=request,
+        )
+
+
+class CachingTransport(BaseTransport):
+    """This class is a sync httpx transport that serves the responses from a
+    `ResponseCache`."""
+
+    def __init__(self, cache: ResponseCache, transport: BaseTransport | None = None):
+        """This method initializes the class.
+
+        Args:
+            cache (ResponseCache): The cache.
+            transport (BaseTransport | None, optional): Transport that sends the
+                requests missing in the cache. Defaults to HTTPTransport().
+
+        """
+        self.cache = cache
+        self.transport = transport or HTTPTransport()
+
+    def handle_request(self, request: Request) -> Response:
+        """This method returns the cached response or sends the request.
+
+        Args:
+            request (Request): The request.
+
+        Returns:
+            Response: The response.
+
+        """
+        ttl = self.cache.ttl(request)
+        if ttl is None:
+            return self.transport.handle_request(request)
+
+        cached, entry = self.cache.prepare(request)
+        if cached is not None:
+            return cached
+
+        response = self.transport.handle_request(request)
+        try:
+            response.read()
+        finally:
+            response.close()
+        return self.cache.process(request, response, entry, ttl)
+
+    def close(self) -> None:
+        """This method closes the wrapped transport."""
+        self.transport.close()
+
+
+class AsyncCachingTransport(AsyncBaseTransport):
+    """This class is an async httpx transport that serves the responses from a
+    `ResponseCache`."""
+
+    def __init__(self, cache: ResponseCache, transport: AsyncBaseTransport | None = None):
+        """This method initializes the class.
+
+        Args:
+            cache (ResponseCache): The cache.
+            transport (AsyncBaseTransport | None, optional): Transport that sends the
+                requests missing in the cache. Defaults to AsyncHTTPTransport().
+
+        """
+        self.cache = cache
+        self.transport = transport or AsyncHTTPTransport()
+
+    async def handle_async_request(self, request: Request) -> Response:
+        """This method returns the cached response or sends the request.
+
+        Args:
+            request (Request): The request.
+
+        Returns:
+            Response: The response.
+
+        """
+        ttl = self.cache.ttl(request)
+        if ttl is None:
+            return await self.transport.handle_async_request(request)
+
+        cached, entry = self.cache.prepare(request)
+        if cached is not None:
+            return cached
+
+        response = await self.transport.handle_async_request(request)
+        try:
+            await response.aread()
+        finally:
+            await response.aclose()
+        return self.cache.process(request, response, entry, ttl)
+
+    async def aclose(self) -> None:
+        """This method closes the wrapped transport."""
+        await self.transport.aclose()
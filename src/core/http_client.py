@@ -0,0 +1,654 @@
+"""This module contains the HTTP layer shared by the MercadoLibre connectors:
+the session holding the pooled clients, and the helpers to request the API
+concurrently, with rate limiting and retries."""
+
+import asyncio
+import importlib.util
+import random
+import re
+import statistics
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Self
+
+from httpx import (
+    AsyncBaseTransport,
+    AsyncClient,
+    AsyncHTTPTransport,
+    BaseTransport,
+    Client,
+    HTTPStatusError,
+    HTTPTransport,
+    Limits,
+    Request,
+    Response,
+    Timeout,
+    TransportError,
+)
+from loguru import logger
+from pydantic import BaseModel
+
+from core.http_cache import AsyncCachingTransport, CachingTransport, ResponseCache
+from libs.metrics import METRICS
+
+log = logger.opt(colors=True)
+
+API_URL = "https://api.mercadolibre.com/"
+
+# Path segments that are ids, e.g. MCO or MCO1234, replaced to group the latency
+# of the requests by endpoint.
+_ID_SEGMENT = re.compile(r"^[A-Z]{3}\d*$")
+
+
+class HttpConfig(BaseModel):
+    """This class represents the configuration of the pooled HTTP clients.
+
+    Args:
+        max_connections (int): Maximum open connections.
+        max_keepalive_connections (int): Maximum idle connections kept alive.
+        keepalive_expiry (float): Seconds an idle connection is kept alive.
+        http2 (bool): Whether to negotiate HTTP/2, it needs the `h2` package.
+        connect_timeout (float): Seconds to establish a connection.
+        read_timeout (float): Seconds to wait for a chunk of the response.
+        write_timeout (float): Seconds to send a chunk of the request.
+        pool_timeout (float): Seconds to wait for a free connection of the pool.
+        accept_encoding (str): Compressions accepted for the responses.
+
+    """
+
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 30.0
+    http2: bool = False
+    connect_timeout: float = 5.0
+    read_timeout: float = 30.0
+    write_timeout: float = 30.0
+    pool_timeout: float = 10.0
+    accept_encoding: str = "gzip, deflate"
+
+    @property
+    def limits(self) -> Limits:
+        """Property: This method returns the limits of the connection pool."""
+        return Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+
+    @property
+    def timeout(self) -> Timeout:
+        """Property: This method returns the timeouts of the requests."""
+        return Timeout(
+            connect=self.connect_timeout,
+            read=self.read_timeout,
+            write=self.write_timeout,
+            pool=self.pool_timeout,
+        )
+
+
+class LatencyStats:
+    """This class records the latency of the requests, until the response
+    headers are received, grouped by endpoint."""
+
+    def __init__(self):
+        """This method initializes the class."""
+        self.latencies: dict[str, list[float]] = {}
+
+    @staticmethod
+    def endpoint(request: Request) -> str:
+        """This method returns the endpoint of a request, its path with the ids
+        replaced, e.g. `/sites/{id}/search`.
+
+        Args:
+            request (Request): The request.
+
+        Returns:
+            str: The endpoint.
+
+        """
+        segments = request.url.path.rstrip("/").split("/")
+        return "/".join("{id}" if _ID_SEGMENT.match(s) else s for s in segments) or "/"
+
+    def record(self, request: Request, seconds: float) -> str:
+        """This method records the latency of a request.
+
+        Args:
+            request (Request): The request.
+            seconds (float): The latency in seconds.
+
+        Returns:
+            str: The endpoint of the request.
+
+        """
+        endpoint = self.endpoint(request)
+        self.latencies.setdefault(endpoint, []).append(seconds)
+        return endpoint
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        """This method returns the count and latency percentiles per endpoint.
+
+        Returns:
+            dict[str, dict[str, float]]: The count, mean, p50, p95 and max latency in
+                seconds of each endpoint.
+
+        """
+        summary = {}
+        for endpoint, latencies in self.latencies.items():
+            ordered = sorted(latencies)
+            summary[endpoint] = {
+                "count": len(ordered),
+                "mean": statistics.fmean(ordered),
+                "p50": ordered[len(ordered) // 2],
+                "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+                "max": ordered[-1],
+            }
+        return summary
+
+
+class TrafficStats:
+    """This class counts the requests that reach the network, the ones that
+    fail, with a transport error or an error status, and the bytes downloaded.
+
+    The responses served by the cache are not counted.
+
+    """
+
+    def __init__(self):
+        """This method initializes the class."""
+        self.requests = 0
+        self.errors = 0
+        self.bytes = 0
+
+    def record(self, response: Response | None) -> None:
+        """This method records a request sent to the network.
+
+        Args:
+            response (Response | None): The response, already read, or None if the
+                request failed before one arrived.
+
+        """
+        self.requests += 1
+        if response is None or response.is_error:
+            self.errors += 1
+        if response is not None:
+            # The responses built in memory, e.g. by a mock transport, have no
+            # bytes downloaded, their content is counted instead.
+            self.bytes += response.num_bytes_downloaded or len(response.content)
+
+    def summary(self) -> dict[str, int]:
+        """This method returns the requests, errors and bytes downloaded.
+
+        Returns:
+            dict[str, int]: The counts.
+
+        """
+        return {"requests": self.requests, "errors": self.errors, "bytes": self.bytes}
+
+
+class TrafficTransport(BaseTransport):
+    """This class is a sync httpx transport that records the traffic of the
+    transport it wraps in a `TrafficStats`."""
+
+    def __init__(self, traffic: TrafficStats, transport: BaseTransport):
+        """This method initializes the class.
+
+        Args:
+            traffic (TrafficStats): The stats to record the requests in.
+            transport (BaseTransport): Transport that sends the requests.
+
+        """
+        self.traffic = traffic
+        self.transport = transport
+
+    def handle_request(self, request: Request) -> Response:
+        """This method sends the request and records it.
+
+        Args:
+            request (Request): The request.
+
+        Returns:
+            Response: The response, already read.
+
+        """
+        try:
+            response = self.transport.handle_request(request)
+            response.read()
+        except Exception:
+            self.traffic.record(None)
+            raise
+        self.traffic.record(response)
+        return response
+
+    def close(self) -> None:
+        """This method closes the wrapped transport."""
+        self.transport.close()
+
+
+class AsyncTrafficTransport(AsyncBaseTransport):
+    """This class is an async httpx transport that records the traffic of the
+    transport it wraps in a `TrafficStats`."""
+
+    def __init__(self, traffic: TrafficStats, transport: AsyncBaseTransport):
+        """This method initializes the class.
+
+        Args:
+            traffic (TrafficStats): The stats to record the requests in.
+            transport (AsyncBaseTransport): Transport that sends the requests.
+
+        """
+        self.traffic = traffic
+        self.transport = transport
+
+    async def handle_async_request(self, request: Request) -> Response:
+        """This method sends the request and records it.
+
+        Args:
+            request (Request): The request.
+
+        Returns:
+            Response: The response, already read.
+
+        """
+        try:
+            response = await self.transport.handle_async_request(request)
+            await response.aread()
+        except Exception:
+            self.traffic.record(None)
+            raise
+        self.traffic.record(response)
+        return response
+
+    async def aclose(self) -> None:
+        """This method closes the wrapped transport."""
+        await self.transport.aclose()
+
+
+class HostRateLimiter:
+    """This class is an asynchronous token bucket that limits the requests per
+    second sent to each host.
+
+    The buckets outlive the event loop, so a limiter can be shared by the
+    `asyncio.run` calls of a session, and its locks are created again in each
+    new loop. A limiter with a parent also waits for the parent, so a caller
+    can be slower than the session without changing the rate of the others.
+
+    """
+
+    def __init__(
+        self,
+        requests_per_second: float | None = None,
+        burst: int = 1,
+        parent: "HostRateLimiter | None" = None,
+    ):
+        """This method initializes the class.
+
+        Args:
+            requests_per_second (float | None, optional): Requests per second allowed
+                per host. None disables the limiter. Defaults to None.
+            burst (int, optional): Requests that can be sent at once. Defaults to 1.
+            parent (HostRateLimiter | None, optional): Limiter every request also
+                waits for, e.g. the one of the session. Defaults to None.
+
+        """
+        self.requests_per_second = requests_per_second
+        self.burst = burst
+        self.parent = parent
+        self._buckets: dict[str, tuple[float, float]] = {}
+        self._locks: dict[str, asyncio.Lock] = {}
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    async def acquire(self, host: str) -> None:
+        """This method waits until a request can be sent to the host.
+
+        Args:
+            host (str): Host of the request.
+
+        """
+        if self.parent is not None:
+            await self.parent.acquire(host)
+        if not self.requests_per_second:
+            return
+
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop, self._locks = loop, {}
+
+        async with self._locks.setdefault(host, asyncio.Lock()):
+            now = time.monotonic()
+            tokens, last = self._buckets.get(host, (float(self.burst), now))
+            tokens = min(float(self.burst), tokens + (now - last) * self.requests_per_second)
+
+            if tokens < 1:
+                await asyncio.sleep((1 - tokens) / self.requests_per_second)
+                tokens, now = 1.0, time.monotonic()
+
+            self._buckets[host] = (tokens - 1, now)
+
+
+class MeliSession:
+    """This class holds the HTTP clients shared by the connectors, e.g. a
+    `MercadoLibreItems` and a `MercadoLibreUniverse`, so they reuse the same
+    connection pool, response cache, and latency and traffic metrics.
+
+    It is a context manager, sync and async, that closes the clients on exit.
+
+    Its rate limiter is shared by every async request of the session, so the
+    rate applies to the whole crawl instead of to each call of a connector.
+
+    """
+
+    def __init__(
+        self,
+        config: HttpConfig | None = None,
+        cache: ResponseCache | None = None,
+        transport: BaseTransport | None = None,
+        async_transport: AsyncBaseTransport | None = None,
+        requests_per_second: float | None = None,
+    ):
+        """This method initializes the class.
+
+        Args:
+            config (HttpConfig | None, optional): Configuration of the clients.
+                Defaults to HttpConfig().
+            cache (ResponseCache | None, optional): Cache of the API responses.
+                Defaults to None.
+            transport (BaseTransport | None, optional): Transport of the sync client,
+                e.g. an `httpx.MockTransport`. Defaults to a pooled HTTPTransport.
+            async_transport (AsyncBaseTransport | None, optional): Transport of the
+                async clients. Defaults to a pooled AsyncHTTPTransport.
+            requests_per_second (float | None, optional): Requests per second allowed
+                per host to the session. None disables the limiter. Defaults to None.
+
+        """
+        self.config = config or HttpConfig()
+        self.cache = cache
+        self.transport = transport
+        self.async_transport = async_transport
+        self.rate_limiter = HostRateLimiter(requests_per_second)
+        self.latency = LatencyStats()
+        self.traffic = TrafficStats()
+        self._client: Client | None = None
+        self._async_client: AsyncClient | None = None
+
+        if self.config.http2 and importlib.util.find_spec("h2") is None:
+            log.warning("HTTP/2 needs the <y>h2</y> package, falling back to HTTP/1.1")
+            self.config = self.config.model_copy(update={"http2": False})
+
+    @property
+    def client(self) -> Client:
+        """Property: This method returns the sync client, creating it on first
+        use."""
+        if self._client is None:
+            transport = TrafficTransport(
+                self.traffic,
+                self.transport or HTTPTransport(limits=self.config.limits, http2=self.config.http2),
+            )
+            if self.cache is not None:
+                transport = CachingTransport(self.cache, transport)
+
+            self._client = Client(
+                base_url=API_URL,
+                transport=transport,
+                timeout=self.config.timeout,
+                headers={"Accept-Encoding": self.config.accept_encoding},
+                event_hooks={"request": [self._start_timer], "response": [self._stop_timer]},
+            )
+        return self._client
+
+    @asynccontextmanager
+    async def async_client(self) -> AsyncIterator[AsyncClient]:
+        """This method yields the async client of the session if it has been
+        entered with `async with`, or a new client closed on exit otherwise.
+
+        Yields:
+            AsyncClient: The async client.
+
+        """
+        if self._async_client is not None:
+            yield self._async_client
+            return
+
+        async with self._build_async_client() as client:
+            yield client
+
+    def shared_rate_limiter(self, requests_per_second: float | None = None) -> HostRateLimiter:
+        """This method returns the rate limiter of the session, or a limiter of
+        the caller on top of it if a rate is given.
+
+        The rate of the session is only set when it is built, so the rate of a
+        call never changes the one of the other requests of the session.
+
+        Args:
+            requests_per_second (float | None, optional): Requests per second allowed
+                per host to the caller, on top of the rate of the session. None only
+                applies the rate of the session. Defaults to None.
+
+        Returns:
+            HostRateLimiter: The rate limiter shared by the requests of the session,
+                or a limiter of the caller whose parent is that one.
+
+        """
+        if requests_per_second is None:
+            return self.rate_limiter
+        return HostRateLimiter(requests_per_second, parent=self.rate_limiter)
+
+    def close(self) -> None:
+        """This method closes the sync client."""
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+    async def aclose(self) -> None:
+        """This method closes the sync and async clients."""
+        self.close()
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+
+    def __enter__(self) -> Self:
+        """This method enters the context manager.
+
+        Returns:
+            Self: The current instance.
+
+        """
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """This method exits the context manager, closing the sync client.
+
+        Args:
+            exc_type: The type of the exception.
+            exc_val: The exception value.
+            exc_tb: The exception traceback.
+
+        """
+        self.close()
+
+    async def __aenter__(self) -> Self:
+        """This method enters the async context manager, opening an async client
+        shared by every async request until exit.
+
+        Returns:
+            Self: The current instance.
+
+        """
+        self._async_client = self._build_async_client()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        """This method exits the async context manager, closing the clients.
+
+        Args:
+            exc_type: The type of the exception.
+            exc_val: The exception value.
+            exc_tb: The exception traceback.
+
+        """
+        await self.aclose()
+
+    def _build_async_client(self) -> AsyncClient:
+        """This method returns a new async client with the configuration of the
+        session.
+
+        Returns:
+            AsyncClient: The async client.
+
+        """
+        transport = AsyncTrafficTransport(
+            self.traffic,
+            self.async_transport
+            or AsyncHTTPTransport(limits=self.config.limits, http2=self.config.http2),
+        )
+        if self.cache is not None:
+            transport = AsyncCachingTransport(self.cache, transport)
+
+        return AsyncClient(
+            base_url=API_URL,
+            transport=transport,
+            timeout=self.config.timeout,
+            headers={"Accept-Encoding": self.config.accept_encoding},
+            event_hooks={"request": [self._astart_timer], "response": [self._astop_timer]},
+        )
+
+    @staticmethod
+    def _start_timer(request: Request) -> None:
+        """This method stores the time the request is sent.
+
+        Args:
+            request (Request): The request.
+
+        """
+        request.extensions["meli_sent_at"] = time.perf_counter()
+
+    def _stop_timer(self, response: Response) -> None:
+        """This method records the latency and status of the response, in the
+        session and in the shared metrics.
+
+        Args:
+            response (Response): The response.
+
+        """
+        sent_at = response.request.extensions.get("meli_sent_at")
+        if sent_at is None:
+            return
+
+        seconds = time.perf_counter() - sent_at
+        endpoint = self.latency.record(response.request, seconds)
+        METRICS.observe("meli_http_request_seconds", seconds, endpoint=endpoint)
+        METRICS.inc("meli_http_requests_total", endpoint=endpoint, status=response.status_code)
+
+    async def _astart_timer(self, request: Request) -> None:
+        """This method stores the time the async request is sent.
+
+        Args:
+            request (Request): The request.
+
+        """
+        self._start_timer(request)
+
+    async def _astop_timer(self, response: Response) -> None:
+        """This method records the latency of the async response.
+
+        Args:
+            response (Response): The response.
+
+        """
+        self._stop_timer(response)
+
+
+class RetryPolicy(BaseModel):
+    """This class represents the retry policy applied to failed requests.
+
+    Args:
+        max_retries (int): Maximum number of retries per request.
+        backoff_factor (float): Base delay in seconds of the exponential backoff.
+        max_backoff (float): Upper bound in seconds for a single backoff delay.
+        retry_statuses (frozenset[int]): HTTP status codes that trigger a retry.
+
+    """
+
+    max_retries: int = 5
+    backoff_factor: float = 0.5
+    max_backoff: float = 30.0
+    retry_statuses: frozenset[int] = frozenset({429, 500, 502, 503, 504})
+
+    def backoff(self, attempt: int, retry_after: str | None = None) -> float:
+        """This method returns the seconds to wait before the next attempt.
+
+        Args:
+            attempt (int): Number of the attempt that just failed, starting at 0.
+            retry_after (str | None, optional): Value of the `Retry-After` header.
+
+        Returns:
+            float: Seconds to wait.
+
+        """
+        if retry_after is not None and retry_after.isdigit():
+            return min(float(retry_after), self.max_backoff)
+
+        delay = self.backoff_factor * 2**attempt
+        return min(delay + random.uniform(0, self.backoff_factor), self.max_backoff)
+
+
+async def fetch_json(
+    client: AsyncClient,
+    url: str,
+    semaphore: asyncio.Semaphore,
+    rate_limiter: HostRateLimiter,
+    retry: RetryPolicy,
+) -> Any:
+    """This function requests the url and returns the decoded JSON, retrying
+    with backoff on transport errors and on the retryable status codes.
+
+    Args:
+        client (AsyncClient): Client used to send the request.
+        url (str): Url to request, relative to the client base url.
+        semaphore (asyncio.Semaphore): Semaphore bounding the requests in flight.
+        rate_limiter (HostRateLimiter): Rate limiter applied per host.
+        retry (RetryPolicy): Retry policy.
+
+    Returns:
+        Any: The decoded JSON response.
+
+    Raises:
+        HTTPStatusError: If the response is still an error after all the retries.
+        TransportError: If the request still fails after all the retries.
+
+    """
+    request = client.build_request("GET", url)
+
+    for attempt in range(retry.max_retries + 1):
+        retry_after = None
+
+        async with semaphore:
+            await rate_limiter.acquire(request.url.host)
+            try:
+                response = await client.send(request)
+            except TransportError as error:
+                if attempt == retry.max_retries:
+                    raise
+                METRICS.inc(
+                    "meli_http_retries_total",
+                    endpoint=LatencyStats.endpoint(request),
+                    reason=type(error).__name__,
+                )
+                log.warning(f"Request to <y>{url}</y> failed: {error!r}")
+            else:
+                if response.status_code not in retry.retry_statuses:
+                    return response.raise_for_status().json()
+                if attempt == retry.max_retries:
+                    raise HTTPStatusError(
+                        f"Giving up on {url} after {attempt} retries",
+                        request=request,
+                        response=response,
+                    )
+                retry_after = response.headers.get("Retry-After")
+                METRICS.inc(
+                    "meli_http_retries_total",
+                    endpoint=LatencyStats.endpoint(request),
+                    reason=response.status_code,
+                )
+                log.warning(f"Request to <y>{url}</y> returned {response.status_code}")
+
+        await asyncio.sleep(retry.backoff(attempt, retry_after))
@@ -0,0 +1,389 @@
+"""This module contains the embedding-based classifier that categorizes the
+products by the votes of their nearest labeled neighbours, before falling back
+to the LLM."""
+
+import re
+import unicodedata
+import zlib
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+from langchain_core.embeddings import Embeddings
+from loguru import logger
+
+from core.base_models import ProductCategory
+
+log = logger.opt(colors=True)
+
+
+class HashingEmbeddings(Embeddings):
+    """This class embeds texts on the CPU with signed feature hashing of their
+    words and character n-grams, so no model has to be downloaded or served.
+
+    The vectors are lexical, not semantic: two titles are only close when they
+    share words or spellings, e.g. "audífonos" and "auriculares" are not. Set a
+    sentence-transformers model as the embedding model for semantic neighbours.
+
+    """
+
+    def __init__(self, dimensions: int = 1024, ngram_range: tuple[int, int] = (3, 5)):
+        """This method initializes the class.
+
+        Args:
+            dimensions (int, optional): The size of the vectors. Defaults to 1024.
+            ngram_range (tuple[int, int], optional): The smallest and largest
+                character n-grams hashed. Defaults to (3, 5).
+
+        """
+        self.dimensions = dimensions
+        self.ngram_range = ngram_range
+
+    def features(self, text: str) -> list[str]:
+        """This method returns the words and character n-grams of a text,
+        lowercased and without accents.
+
+        Args:
+            text (str): The text.
+
+        Returns:
+            list[str]: The features of the text.
+
+        """
+        text = unicodedata.normalize("NFKD", str(text).lower())
+        words = re.findall(r"\w+", "".join(c for c in text if not unicodedata.combining(c)))
+        features = [f"w:{word}" for word in words]
+        for word in words:
+            padded = f" {word} "
+            for n in range(self.ngram_range[0], self.ngram_range[1] + 1):
+                features.extend(padded[i : i + n] for i in range(len(padded) - n + 1))
+        return features
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        """This method embeds the texts.
+
+        Args:
+            texts (list[str]): The texts.
+
+        Returns:
+            list[list[float]]: The L2 normalized vector of each text.
+
+        """
+        return self.embed_array(texts).tolist()
+
+    def embed_query(self, text: str) -> list[float]:
+        """This method embeds a text.
+
+        Args:
+            text (str): The text.
+
+        Returns:
+            list[float]: The L2 normalized vector of the text.
+
+        """
+        return self.embed_array([text])[0].tolist()
+
+    def embed_array(self, texts: list[str]) -> np.ndarray:
+        """This method embeds the texts in a single float32 matrix.
+
+        Args:
+            texts (list[str]): The texts.
+
+        Returns:
+            np.ndarray: The L2 normalized vectors, one row per text.
+
+        """
+        vectors = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature, count in Counter(self.features(text)).items():
+                digest = zlib.crc32(feature.encode())
+                sign = 1.0 if digest & 1 << 31 else -1.0
+                vectors[row, digest % self.dimensions] += sign * (1.0 + np.log(count))
+        return normalize(vectors)
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """This function scales the vectors to unit length, so their dot product is
+    their cosine similarity.
+
+    Args:
+        vectors (np.ndarray): The vectors, one per row.
+
+    Returns:
+        np.ndarray: The normalized float32 vectors.
+
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+class VectorIndex:
+    """This class finds the nearest vectors by cosine similarity, with an
+    exhaustive NumPy search or, when hnswlib is installed and `ann` is set, an
+    HNSW graph for large indexes."""
+
+    def __init__(self, ann: bool = False):
+        """This method initializes the class.
+
+        Args:
+            ann (bool, optional): Whether to build an approximate HNSW index. Falls
+                back to the brute-force search if hnswlib is not installed.
+                Defaults to False.
+
+        """
+        self._buffer = np.empty((0, 0), dtype=np.float32)
+        self.labels: list[ProductCategory] = []
+        self.ann = ann
+        self._hnsw = None
+
+        if ann:
+            try:
+                import hnswlib  # noqa: F401
+            except ImportError:
+                log.warning("hnswlib is not installed, using the brute-force vector index")
+                self.ann = False
+
+    def __len__(self) -> int:
+        """This method returns the number of vectors in the index."""
+        return len(self.labels)
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """Property: This method returns the vectors in the index, one per
+        row."""
+        return self._buffer[: len(self)]
+
+    def add(self, vectors: np.ndarray, labels: list[ProductCategory]) -> None:
+        """This method adds labeled vectors to the index, without rebuilding it.
+
+        The matrix and the HNSW graph double their capacity when they are full,
+        so adding n vectors in any number of calls copies O(n) rows in total.
+
+        Args:
+            vectors (np.ndarray): The vectors, one per row.
+            labels (list[ProductCategory]): The category of each vector.
+
+        """
+        vectors = normalize(vectors)
+        start, end = len(self), len(self) + len(vectors)
+        if end > len(self._buffer):
+            buffer = np.empty((max(end, 2 * len(self._buffer)), vectors.shape[1]), np.float32)
+            if start:
+                buffer[:start] = self.vectors
+            self._buffer = buffer
+        self._buffer[start:end] = vectors
+        self.labels.extend(labels)
+
+        if self.ann:
+            import hnswlib
+
+            if self._hnsw is None:
+                self._hnsw = hnswlib.Index(space="ip", dim=vectors.shape[1])
+                self._hnsw.init_index(max_elements=end, ef_construction=200, M=16)
+            elif end > self._hnsw.get_max_elements():
+                self._hnsw.resize_index(max(end, 2 * self._hnsw.get_max_elements()))
+            self._hnsw.add_items(vectors, np.arange(start, end))
+
+    def search(self, queries: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+        """This method returns the k nearest vectors of each query.
+
+        Args:
+            queries (np.ndarray): The query vectors, one per row.
+            k (int): The number of neighbours.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: The positions and the cosine similarities
+                of the neighbours of each query, the most similar first.
+
+        """
+        queries = normalize(queries)
+        k = min(k, len(self))
+
+        if self._hnsw is not None:
+            self._hnsw.set_ef(max(k, 50))
+            positions, distances = self._hnsw.knn_query(queries, k=k)
+            return positions, 1 - distances
+
+        similarities = queries @ self.vectors.T
+        positions = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+        scores = np.take_along_axis(similarities, positions, axis=1)
+        order = np.argsort(-scores, axis=1)
+        return np.take_along_axis(positions, order, axis=1), np.take_along_axis(scores, order, 1)
+
+
+class KNNClassifier:
+    """This class categorizes a product by the similarity weighted votes of its
+    nearest labeled products, and defers it to the LLM when the neighbours
+    disagree."""
+
+    def __init__(
+        self,
+        embeddings: Embeddings | None = None,
+        k: int = 5,
+        min_agreement: float = 0.8,
+        description_chars: int = 200,
+        ann: bool = False,
+    ):
+        """This method initializes the class.
+
+        Args:
+            embeddings (Embeddings | None, optional): The embedding model of the
+                products. Defaults to HashingEmbeddings(), which hashes the words of
+                the products instead of embedding their meaning.
+            k (int, optional): The number of neighbours that vote. Defaults to 5.
+            min_agreement (float, optional): The share of the votes the winning
+                category needs to skip the LLM. Defaults to 0.8.
+            description_chars (int, optional): The characters of the description
+                embedded after the title. Defaults to 200.
+            ann (bool, optional): Whether to use an approximate vector index.
+                Defaults to False.
+
+        """
+        self.embeddings = embeddings or HashingEmbeddings()
+        self.index = VectorIndex(ann=ann)
+        self.k = k
+        self.min_agreement = min_agreement
+        self.description_chars = description_chars
+        self.classified = 0
+        self.deferred = 0
+
+    @classmethod
+    def from_csv(
+        cls, labels_path: str, exclude_path: str | None = None, **kwargs
+    ) -> "KNNClassifier":
+        """This method builds the classifier seeded with the products of a ';'
+        separated CSV with 'title', 'description' and 'category' columns, e.g.
+        `meli_148_categorized.csv`.
+
+        The products of `exclude_path` are left out of the seed, so the products
+        to classify are not their own neighbours with the label being predicted.
+
+        Args:
+            labels_path (str): The path of the labeled CSV.
+            exclude_path (str | None, optional): The path of the ';' separated CSV
+                of the products to classify. Defaults to None.
+            **kwargs: Additional arguments to be passed to the class.
+
+        Returns:
+            KNNClassifier: The seeded classifier.
+
+        Raises:
+            ValueError: If no labeled product is left for the seed, e.g. when the
+                labels are the ones of the products to classify.
+
+        """
+        classifier = cls(**kwargs)
+        df = pd.read_csv(labels_path, sep=";")
+        if exclude_path is not None:
+            keys = ["title", "description"]
+            excluded = pd.read_csv(exclude_path, sep=";", usecols=keys).fillna("")
+            seen = pd.MultiIndex.from_frame(excluded)
+            df = df[~pd.MultiIndex.from_frame(df[keys].fillna("")).isin(seen)]
+        classifier.fit(
+            df[["title", "description"]].to_dict("records"),
+            df["category"].map(ProductCategory.from_text).tolist(),
+        )
+        if not len(classifier.index):
+            raise ValueError(
+                f"No labeled product of {labels_path} is left for the seed"
+                + ("" if exclude_path is None else f" out of the products of {exclude_path}")
+                + ", the neighbours would defer every product to the LLM"
+            )
+        return classifier
+
+    @property
+    def stats(self) -> dict[str, int]:
+        """Property: This method returns how many products were classified by
+        the neighbours and how many were deferred to the LLM."""
+        return {"knn": self.classified, "deferred": self.deferred}
+
+    def text(self, product: dict[str, str]) -> str:
+        """This method returns the text of a product that is embedded.
+
+        Args:
+            product (dict[str, str]): The title and description of the product.
+
+        Returns:
+            str: The title followed by the beginning of the description.
+
+        """
+        description = product.get("description")
+        description = "" if pd.isna(description) else str(description)
+        return f"{product['title']} {description[: self.description_chars]}"
+
+    def embed(self, products: list[dict[str, str]]) -> np.ndarray:
+        """This method embeds the products once, in a single batch.
+
+        Args:
+            products (list[dict[str, str]]): The title and description of each product.
+
+        Returns:
+            np.ndarray: The vector of each product.
+
+        """
+        texts = [self.text(product) for product in products]
+        if isinstance(self.embeddings, HashingEmbeddings):
+            return self.embeddings.embed_array(texts)
+        return np.asarray(self.embeddings.embed_documents(texts), dtype=np.float32)
+
+    def fit(self, products: list[dict[str, str]], labels: list[ProductCategory | None]) -> None:
+        """This method adds labeled products to the index, skipping the ones
+        without a category.
+
+        Args:
+            products (list[dict[str, str]]): The title and description of each product.
+            labels (list[ProductCategory | None]): The category of each product.
+
+        """
+        labeled = [(p, label) for p, label in zip(products, labels) if label is not None]
+        if labeled:
+            self.index.add(self.embed([p for p, _ in labeled]), [label for _, label in labeled])
+
+    def classify(
+        self, products: list[dict[str, str]]
+    ) -> list[tuple[ProductCategory | None, float]]:
+        """This method returns the category voted by the neighbours of each
+        product.
+
+        Args:
+            products (list[dict[str, str]]): The title and description of each product.
+
+        Returns:
+            list[tuple[ProductCategory | None, float]]: The category and its share of
+                the votes, (None, 0.0) if the index is empty.
+
+        """
+        if not products or not len(self.index):
+            return [(None, 0.0)] * len(products)
+
+        positions, scores = self.index.search(self.embed(products), self.k)
+        results = []
+        for row_positions, row_scores in zip(positions, scores):
+            votes = Counter()
+            for position, score in zip(row_positions, row_scores):
+                votes[self.index.labels[position]] += max(float(score), 0.0)
+            category, weight = votes.most_common(1)[0]
+            total = sum(votes.values())
+            results.append((category, weight / total) if total else (None, 0.0))
+        return results
+
+    def predict_batch(self, products: list[dict[str, str]]) -> list[ProductCategory | None]:
+        """This method returns the category of the products whose neighbours
+        agree, and counts them as classified or deferred.
+
+        Args:
+            products (list[dict[str, str]]): The title and description of each product.
+
+        Returns:
+            list[ProductCategory | None]: The category of each product, None if the
+                LLM has to decide.
+
+        """
+        predictions = [
+            category if category is not None and agreement >= self.min_agreement else None
+            for category, agreement in self.classify(products)
+        ]
+        self.deferred += predictions.count(None)
+        self.classified += len(predictions) - predictions.count(None)
+        return predictions
@@ -1,19 +1,38 @@
 """Functions to initialize the language models."""
 
-from typing import Any, Literal
+from typing import TYPE_CHECKING, Any, Literal
 
 from dotenv import load_dotenv
-from langchain.callbacks.tracers import LangChainTracer
-from langchain_core.language_models.chat_models import BaseChatModel
-from langchain_core.language_models.llms import BaseLLM
 from pydantic import BaseModel, Field
 
-load_dotenv()
+if TYPE_CHECKING:
+    from langchain_core.embeddings import Embeddings
+    from langchain_core.language_models.chat_models import BaseChatModel
+    from langchain_core.language_models.llms import BaseLLM
+
+    from core.llm_pool import LLMPool
 
+load_dotenv()
 
-def openai_chatter(model: str, ls_project_name: str, kwargs: dict = {}) -> BaseChatModel:
+# Arguments of each family in the constrained output mode, where the model
+# answers the digit code of a category: generation is capped to the code, and
+# OpenAI can only sample the tokens of "1", "2" and "3" (16, 17 and 18 in the
+# cl100k and o200k vocabularies). Ollama gets a couple of tokens more because
+# some tokenizers emit a leading space before the digit.
+CONSTRAINED_LLM_ARGS: dict[str, dict[str, Any]] = {
+    "openai_chatter": {
+        "temperature": 0,
+        "max_tokens": 1,
+        "model_kwargs": {"logit_bias": {16: 100, 17: 100, 18: 100}},
+    },
+    "ollama_chatter": {"temperature": 0, "num_predict": 3},
+    "ollama_llms": {"temperature": 0, "num_predict": 3},
+}
+
+
+def openai_chatter(model: str, ls_project_name: str, kwargs: dict = {}) -> "BaseChatModel":
     """This function initializes the OpenAI model with a LangSmith project and
-    returns it.
+    the metrics callback, and returns it.
 
     Args:
         model (str): The model name.
@@ -24,15 +43,18 @@ def openai_chatter(model: str, ls_project_name: str, kwargs: dict = {}) -> BaseC
         BaseChatModel: The initialized OpenAI Chat model.
 
     """
+    from langchain.callbacks.tracers import LangChainTracer
     from langchain_openai import ChatOpenAI
 
+    from core.llm_metrics import LLMMetricsHandler
+
     tracer = LangChainTracer(project_name=ls_project_name)
-    return ChatOpenAI(model=model, callbacks=[tracer], **kwargs)
+    return ChatOpenAI(model=model, callbacks=[tracer, LLMMetricsHandler(model)], **kwargs)
 
 
-def ollama_chatter(model: str, ls_project_name: str, kwargs: dict = {}) -> BaseChatModel:
+def ollama_chatter(model: str, ls_project_name: str, kwargs: dict = {}) -> "BaseChatModel":
     """This function initializes the Ollama model with a LangSmith project and
-    returns it.
+    the metrics callback, and returns it.
 
     Args:
         model (str): The model name.
@@ -43,16 +65,19 @@ def ollama_chatter(model: str, ls_project_name: str, kwargs: dict = {}) -> BaseC
         BaseChatModel: The initialized Ollama Chat model.
 
     """
+    from langchain.callbacks.tracers import LangChainTracer
     from langchain_community.chat_models import ChatOllama
 
+    from core.llm_metrics import LLMMetricsHandler
+
     tracer = LangChainTracer(project_name=ls_project_name)
 
-    return ChatOllama(model=model, callbacks=[tracer], **kwargs)
+    return ChatOllama(model=model, callbacks=[tracer, LLMMetricsHandler(model)], **kwargs)
 
 
-def ollama_llms(model: str, ls_project_name: str, kwargs: dict = {}) -> BaseLLM:
+def ollama_llms(model: str, ls_project_name: str, kwargs: dict = {}) -> "BaseLLM":
     """This function initializes the Ollama model with a LangSmith project and
-    returns it.
+    the metrics callback, and returns it.
 
     Args:
         model (str): The model name.
@@ -63,11 +88,14 @@ def ollama_llms(model: str, ls_project_name: str, kwargs: dict = {}) -> BaseLLM:
         BaseLLM: The initialized Ollama LLM model.
 
     """
+    from langchain.callbacks.tracers import LangChainTracer
     from langchain_community.llms import Ollama
 
+    from core.llm_metrics import LLMMetricsHandler
+
     tracer = LangChainTracer(project_name=ls_project_name)
 
-    return Ollama(model=model, callbacks=[tracer], **kwargs)
+    return Ollama(model=model, callbacks=[tracer, LLMMetricsHandler(model)], **kwargs)
 
 
 class LLMConfigBuilder(BaseModel):
@@ -78,6 +106,21 @@ class LLMConfigBuilder(BaseModel):
         model (Literal["mistral", "llama3", "gpt-3.5-turbo", "gpt-4"]): The model name.
         ls_project_name (str): The name of the LangSmith project.
         llm_args (dict[str, Any]): Additional arguments to be passed to the LLM.
+        engine (Literal["llm", "knn"]): Whether the LLM categorizes every product
+            or only the ones whose labeled neighbours disagree.
+        embedding_model (str): "hashing" for the built-in feature hashing of the
+            words, which needs no model but only matches shared words, or the
+            name of a sentence-transformers model.
+        knn_args (dict[str, Any]): Additional arguments to be passed to the
+            KNNClassifier, e.g. k or min_agreement.
+        output_mode (Literal["free", "constrained"]): Whether the LLM answers the
+            category in free text, or only its digit code with the generation
+            capped by CONSTRAINED_LLM_ARGS.
+        max_concurrency (int): The maximum requests in flight to the backend when
+            it is part of a pool.
+        priority (int): The tier of the backend in a pool, the higher tiers only
+            get the calls the lower ones cannot take, e.g. 1 for OpenAI behind
+            the local Ollama hosts.
 
     """
 
@@ -85,19 +128,32 @@ class LLMConfigBuilder(BaseModel):
     model: Literal["mistral", "llama3", "gpt-3.5-turbo", "gpt-4", "phi3", "phi3:14b"]
     ls_project_name: str
     llm_args: dict[str, Any] = Field(default_factory=dict)
+    engine: Literal["llm", "knn"] = "llm"
+    embedding_model: str = "hashing"
+    knn_args: dict[str, Any] = Field(default_factory=dict)
+    output_mode: Literal["free", "constrained"] = "free"
+    max_concurrency: int = 4
+    priority: int = 0
 
 
-def llm_retriever(config: LLMConfigBuilder) -> BaseLLM | BaseChatModel:
+def llm_retriever(
+    config: LLMConfigBuilder | list[LLMConfigBuilder],
+) -> "BaseLLM | BaseChatModel | LLMPool":
     """This function calls the specified function based on the input function
     name.
 
     Args:
-        func_name (Literal["openai_chatter", "ollama_chatter"]): The function name to call.
+        config (LLMConfigBuilder | list[LLMConfigBuilder]): The configuration of
+            the LLM, or of each backend of a pool, e.g. one per Ollama host with
+            its `base_url` in llm_args.
 
     Returns:
-        llm_builder: The function to build the LLM with LangSmith project attached.
+        llm_builder: The function to build the LLM with LangSmith project attached,
+            or the LLMPool of the backends for a list of configurations.
 
     """
+    if isinstance(config, list):
+        return llm_pool_retriever(config)
 
     # Dictionary mapping function names to their actual functions
     llm_options = {
@@ -109,4 +165,55 @@ def llm_retriever(config: LLMConfigBuilder) -> BaseLLM | BaseChatModel:
     # Get the function from the dictionary without calling it
     _llm = llm_options.get(config.family, lambda: ValueError("Invalid function name"))
 
-    return _llm(model=config.model, ls_project_name=config.ls_project_name, kwargs=config.llm_args)
+    kwargs = config.llm_args
+    if config.output_mode == "constrained":
+        kwargs = {**CONSTRAINED_LLM_ARGS[config.family], **config.llm_args}
+
+    return _llm(model=config.model, ls_project_name=config.ls_project_name, kwargs=kwargs)
+
+
+def llm_pool_retriever(configs: list[LLMConfigBuilder]) -> "LLMPool":
+    """This function builds the LLM of each configuration and returns them as a
+    pool that routes every call to one of them.
+
+    Args:
+        configs (list[LLMConfigBuilder]): The configuration of each backend.
+
+    Returns:
+        LLMPool: The pool, its backends named by family, model and base_url.
+
+    """
+    from core.llm_pool import LLMPool, PoolBackend
+
+    backends = []
+    for i, config in enumerate(configs):
+        name = f"{config.family}/{config.model}"
+        if "base_url" in config.llm_args:
+            name += f"@{config.llm_args['base_url']}"
+        if any(backend.name == name for backend in backends):
+            name += f"#{i}"
+        backends.append(
+            PoolBackend(name, llm_retriever(config), config.max_concurrency, config.priority)
+        )
+    return LLMPool(backends)
+
+
+def embeddings_retriever(config: LLMConfigBuilder) -> "Embeddings":
+    """This function returns the embedding model of the configuration.
+
+    Args:
+        config (LLMConfigBuilder): The configuration with the embedding model name.
+
+    Returns:
+        Embeddings: The HashingEmbeddings, or the sentence-transformers model run
+            locally on the CPU.
+
+    """
+    if config.embedding_model == "hashing":
+        from core.knn_classifier import HashingEmbeddings
+
+        return HashingEmbeddings()
+
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+
+    return HuggingFaceEmbeddings(model_name=config.embedding_model, model_kwargs={"device": "cpu"})
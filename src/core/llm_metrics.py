@@ -0,0 +1,81 @@
+"""This module contains the callback that records the latency, outcome and
+tokens of every LLM call in the shared metrics."""
+
+import time
+from typing import Any
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+from libs.metrics import METRICS
+
+
+def token_usage(response: LLMResult) -> tuple[int, int]:
+    """This function returns the tokens of an LLM response, from whichever field
+    the provider reports them in.
+
+    Args:
+        response (LLMResult): The response of the LLM.
+
+    Returns:
+        tuple[int, int]: The prompt and completion tokens, 0 if not reported.
+
+    """
+    usage = (response.llm_output or {}).get("token_usage") or {}
+    if usage:
+        return usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)
+
+    prompt_tokens = completion_tokens = 0
+    for generation in (g for generations in response.generations for g in generations):
+        metadata = getattr(getattr(generation, "message", None), "usage_metadata", None)
+        info = generation.generation_info or {}
+        if metadata:
+            prompt_tokens += metadata.get("input_tokens", 0)
+            completion_tokens += metadata.get("output_tokens", 0)
+        else:
+            # Ollama reports the tokens evaluated in the prompt and generated.
+            prompt_tokens += info.get("prompt_eval_count") or 0
+            completion_tokens += info.get("eval_count") or 0
+    return prompt_tokens, completion_tokens
+
+
+class LLMMetricsHandler(BaseCallbackHandler):
+    """This class is a LangChain callback that records the latency, outcome and
+    tokens of the calls to an LLM."""
+
+    def __init__(self, model: str):
+        """This method initializes the class.
+
+        Args:
+            model (str): The name of the model, the label of its metrics.
+
+        """
+        self.model = model
+        self._started: dict[UUID, float] = {}
+
+    def on_llm_start(self, serialized: dict[str, Any], prompts: list[str], *, run_id: UUID, **_):
+        """This method stores the time a completion call starts."""
+        self._started[run_id] = time.perf_counter()
+
+    def on_chat_model_start(
+        self, serialized: dict[str, Any], messages: list[list[Any]], *, run_id: UUID, **_
+    ):
+        """This method stores the time a chat call starts."""
+        self._started[run_id] = time.perf_counter()
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **_):
+        """This method records the latency and tokens of a successful call."""
+        started = self._started.pop(run_id, None)
+        if started is not None:
+            METRICS.observe("llm_request_seconds", time.perf_counter() - started, model=self.model)
+        METRICS.inc("llm_requests_total", model=self.model, outcome="success")
+
+        prompt_tokens, completion_tokens = token_usage(response)
+        METRICS.inc("llm_tokens_total", prompt_tokens, model=self.model, kind="prompt")
+        METRICS.inc("llm_tokens_total", completion_tokens, model=self.model, kind="completion")
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **_):
+        """This method records a failed call."""
+        self._started.pop(run_id, None)
+        METRICS.inc("llm_requests_total", model=self.model, outcome=type(error).__name__)
@@ -0,0 +1,222 @@
+"""This module contains the pool that spreads the calls to the LLM over several
+backends, e.g. a few Ollama hosts with OpenAI taking the overflow."""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+from langchain_core.callbacks import CallbackManagerForChainRun
+from langchain_core.runnables import Runnable, RunnableConfig
+from langchain_core.runnables.config import patch_config
+
+from libs.metrics import METRICS
+
+
+class PoolBackend:
+    """This class holds a backend of the pool and its routing state."""
+
+    def __init__(self, name: str, runnable: Runnable, max_concurrency: int = 4, priority: int = 0):
+        """This method initializes the class.
+
+        Args:
+            name (str): The name of the backend, the label of its metrics.
+            runnable (Runnable): The model of the backend.
+            max_concurrency (int, optional): The maximum requests in flight to the
+                backend. Defaults to 4.
+            priority (int, optional): The tier of the backend, the lower tiers are
+                used first and the higher ones only when they are full or down.
+                Defaults to 0.
+
+        """
+        self.name = name
+        self.runnable = runnable
+        self.max_concurrency = max_concurrency
+        self.priority = priority
+        self.outstanding = 0
+        self.requests = 0
+        self.failures = 0
+        self.down_until = 0.0
+
+    def is_up(self, now: float) -> bool:
+        """This method returns whether the backend is out of its cooldown."""
+        return self.down_until <= now
+
+
+class LLMPool(Runnable[Any, Any]):
+    """This class presents several LLM backends as a single runnable.
+
+    Each call goes to the backend with the fewest requests in flight among the
+    lowest priority tier with a free slot, and waits when every backend is at
+    its maximum concurrency. A backend that fails is put in a cooldown and the
+    call fails over to the next backend. When the cooldown ends the backend gets
+    traffic again, and a success brings it back up.
+
+    """
+
+    def __init__(self, backends: list[PoolBackend], cooldown_s: float = 30.0):
+        """This method initializes the class.
+
+        Args:
+            backends (list[PoolBackend]): The backends, with unique names.
+            cooldown_s (float, optional): The seconds a failed backend gets no
+                traffic, unless every backend is down. Defaults to 30.0.
+
+        """
+        if not backends:
+            raise ValueError("The pool needs at least one backend")
+        self.backends = backends
+        self.cooldown_s = cooldown_s
+        self._condition = threading.Condition()
+
+    @property
+    def stats(self) -> dict[str, dict[str, Any]]:
+        """Property: This method returns the requests, failures, requests in
+        flight and health of each backend."""
+        now = time.monotonic()
+        with self._condition:
+            return {
+                backend.name: {
+                    "requests": backend.requests,
+                    "failures": backend.failures,
+                    "outstanding": backend.outstanding,
+                    "up": backend.is_up(now),
+                }
+                for backend in self.backends
+            }
+
+    def _acquire(self, excluded: set[str]) -> PoolBackend | None:
+        """This method reserves a slot of the backend the next call goes to,
+        waiting while the candidates are full.
+
+        Args:
+            excluded (set[str]): The backends already tried by the call.
+
+        Returns:
+            PoolBackend | None: The backend, None if every backend was tried.
+
+        """
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                candidates = [b for b in self.backends if b.name not in excluded]
+                if not candidates:
+                    return None
+                # When every candidate is down, they are all tried anyway rather
+                # than failing the call without a request.
+                up = [b for b in candidates if b.is_up(now)] or candidates
+                free = [b for b in up if b.outstanding < b.max_concurrency]
+                if free:
+                    tier = min(b.priority for b in free)
+                    backend = min(
+                        (b for b in free if b.priority == tier), key=lambda b: b.outstanding
+                    )
+                    backend.outstanding += 1
+                    backend.requests += 1
+                    return backend
+                # Wake up on a released slot, or when a cooldown ends.
+                cooldowns = [b.down_until - now for b in candidates if not b.is_up(now)]
+                self._condition.wait(timeout=min(cooldowns, default=None))
+
+    def _release(self, backend: PoolBackend, failed: bool) -> None:
+        """This method frees the slot of a call and updates the health of its
+        backend.
+
+        Args:
+            backend (PoolBackend): The backend of the call.
+            failed (bool): Whether the call failed.
+
+        """
+        with self._condition:
+            backend.outstanding -= 1
+            if failed:
+                backend.failures += 1
+                backend.down_until = time.monotonic() + self.cooldown_s
+            else:
+                backend.down_until = 0.0
+            self._condition.notify_all()
+
+    def _route(
+        self,
+        input: Any,
+        run_manager: CallbackManagerForChainRun,
+        config: RunnableConfig,
+        **kwargs: Any,
+    ) -> Any:
+        """This method invokes the backends one after the other until one
+        succeeds.
+
+        Args:
+            input (Any): The input of the model, e.g. the prompt value.
+            run_manager (CallbackManagerForChainRun): The run of the pool.
+            config (RunnableConfig): The config of the run.
+
+        Returns:
+            Any: The output of the backend that succeeded.
+
+        Raises:
+            Exception: The error of the last backend, if every backend failed.
+
+        """
+        tried: set[str] = set()
+        error: Exception | None = None
+        while (backend := self._acquire(tried)) is not None:
+            tried.add(backend.name)
+            try:
+                output = backend.runnable.invoke(
+                    input, patch_config(config, callbacks=run_manager.get_child()), **kwargs
+                )
+            except Exception as exc:
+                self._release(backend, failed=True)
+                METRICS.inc(
+                    "llm_pool_requests_total", backend=backend.name, outcome=type(exc).__name__
+                )
+                error = exc
+                continue
+            self._release(backend, failed=False)
+            METRICS.inc("llm_pool_requests_total", backend=backend.name, outcome="success")
+            return output
+        raise error
+
+    def invoke(self, input: Any, config: RunnableConfig | None = None, **kwargs: Any) -> Any:
+        """This method invokes a backend, failing over to the others.
+
+        Args:
+            input (Any): The input of the model, e.g. the prompt value.
+            config (RunnableConfig | None, optional): The config of the run.
+                Defaults to None.
+
+        Returns:
+            Any: The output of the backend, e.g. a message for chat models.
+
+        """
+        return self._call_with_config(self._route, input, config, **kwargs)
+
+    def check_health(self, probe: str = "OK") -> dict[str, bool]:
+        """This method sends a short prompt to every backend at the same time,
+        putting the ones that fail in the cooldown and bringing back the others.
+
+        Args:
+            probe (str, optional): The prompt. Defaults to "OK".
+
+        Returns:
+            dict[str, bool]: Whether each backend answered.
+
+        """
+
+        def check(backend: PoolBackend) -> bool:
+            """This function probes a backend outside of the routing."""
+            try:
+                backend.runnable.invoke(probe)
+            except Exception:
+                healthy = False
+            else:
+                healthy = True
+            with self._condition:
+                backend.down_until = 0.0 if healthy else time.monotonic() + self.cooldown_s
+                self._condition.notify_all()
+            return healthy
+
+        with ThreadPoolExecutor(max_workers=len(self.backends)) as executor:
+            results = executor.map(check, self.backends)
+            return {backend.name: healthy for backend, healthy in zip(self.backends, results)}
@@ -1,29 +1,79 @@
 """This module contains the classes to connect to MercadoLibre API and gather
 data from it."""
 
+import asyncio
+from collections import deque
+from contextlib import aclosing
+from typing import TYPE_CHECKING, AsyncIterator, Iterator, Literal
+
 import pandas as pd
-from httpx import Client
+from httpx import (
+    AsyncBaseTransport,
+    AsyncClient,
+    BaseTransport,
+    HTTPStatusError,
+    TransportError,
+)
 from loguru import logger
 
 from core import Country
+from core.http_cache import ResponseCache
+from core.http_client import MeliSession, RetryPolicy, fetch_json
+from libs import CrawlCheckpoint, materialize_batches
+from libs.metrics import METRICS
+from libs.schemas import PRODUCT_COLUMNS, project_records
+
+if TYPE_CHECKING:
+    import pyarrow as pa
+
+    from libs.category_index import CategoryIndex
 
 log = logger.opt(colors=True)
 
+# Results per search page, and largest offset the search endpoint serves, so at
+# most SEARCH_MAX_RESULTS listings of a search can be crawled.
+SEARCH_PAGE_SIZE = 50
+SEARCH_MAX_OFFSET = 1000
+SEARCH_MAX_RESULTS = SEARCH_MAX_OFFSET + SEARCH_PAGE_SIZE
+
+# Filters of `available_filters` used, in order, to split a search over the
+# offset cap into narrower searches that together cover all its listings.
+SPLIT_FILTERS = ("category", "ITEM_CONDITION", "price")
+
 
 class MercadoLibreItems:
     """This class is used to request the MercadoLibre API by country and gather
     +    all the products from all categories."""
 
-    def __init__(self, country: Country):
+    def __init__(
+        self,
+        country: Country,
+        transport: BaseTransport | None = None,
+        async_transport: AsyncBaseTransport | None = None,
+        cache: ResponseCache | None = None,
+        session: MeliSession | None = None,
+    ):
         """This method initializes the class.
 
         Args:
             country (Country): Country object.
+            transport (BaseTransport | None, optional): Transport of the sync client,
+                e.g. an `httpx.MockTransport`. Defaults to None.
+            async_transport (AsyncBaseTransport | None, optional): Transport of the
+                async clients. Defaults to None.
+            cache (ResponseCache | None, optional): Cache of the API responses, it can
+                be shared with other connectors. Defaults to None.
+            session (MeliSession | None, optional): Session shared with other
+                connectors. When given, transport, async_transport and cache are
+                taken from it. Defaults to a new session with them.
 
         """
         self._country = str(country.country)
 
-        self.client = Client(base_url="https://api.mercadolibre.com/")
+        self.session = session or MeliSession(
+            cache=cache, transport=transport, async_transport=async_transport
+        )
+        self.client = self.session.client
         self.country_id = self.get_country_id(country.country)
         self.cats = self.get_categories_given_country_id(self.country_id)
 
@@ -98,63 +148,515 @@ class MercadoLibreItems:
         """
         return self.client.get(f"items/{item_id}/description").json()
 
-    def get_products_by_category(self, category_id: str, limit: int = 1000) -> pd.DataFrame:
-        """This method returns all the products from a category.
+    async def aget_products_descriptions(
+        self,
+        item_ids: "pd.Series | list[str]",
+        max_concurrency: int = 10,
+        requests_per_second: float | None = None,
+        retry: RetryPolicy | None = None,
+    ) -> tuple[pd.Series, dict[str, str]]:
+        """This method returns the descriptions of many products, requesting the
+        description endpoint of each item concurrently.
+
+        The multiget endpoint, `items?ids=`, returns the item resources and not
+        their descriptions, so every item needs its own request.
 
         Args:
-            category_id (str): Category id.
-            limit (int, optional): Number of products to retrieve. Defaults to 1000.
+            item_ids (pd.Series | list[str]): Item ids.
+            max_concurrency (int, optional): Maximum requests in flight. Defaults to 10.
+            requests_per_second (float | None, optional): Requests per second allowed
+                per host to this call, on top of the rate of the session. None only
+                applies the rate of the session. Defaults to None.
+            retry (RetryPolicy | None, optional): Retry policy on 429/5xx responses
+                and transport errors. Defaults to RetryPolicy().
 
         Returns:
-            pd.DataFrame: DataFrame with all the products from the category.
+            tuple[pd.Series, dict[str, str]]: The descriptions aligned to the input
+                item ids, None where the item failed, and the failed item ids with
+                the reason of the failure.
 
         """
-        all_category_products = pd.DataFrame()
+        item_ids = pd.Series(item_ids, name="description")
+        unique_ids = list(dict.fromkeys(item_ids))
+        semaphore = asyncio.Semaphore(max_concurrency)
+        rate_limiter = self.session.shared_rate_limiter(requests_per_second)
+        retry = retry or RetryPolicy()
+        descriptions, failed = {}, {}
+
+        async def fetch_description(client: AsyncClient, item_id: str) -> None:
+            """This function requests the description of an item and files it as
+            a description or as a failure."""
+            try:
+                descriptions[item_id] = await fetch_json(
+                    client, f"items/{item_id}/description", semaphore, rate_limiter, retry
+                )
+            except (HTTPStatusError, TransportError) as error:
+                failed[item_id] = repr(error)
+
+        async with self.session.async_client() as client:
+            await asyncio.gather(*(fetch_description(client, item_id) for item_id in unique_ids))
+
+        if failed:
+            log.warning(f"Could not fetch <r>{len(failed)}</r> of {len(unique_ids)} descriptions")
+
+        return item_ids.map(descriptions.get), failed
+
+    def iter_products_by_category(
+        self,
+        category_id: str,
+        limit: int | None = 1000,
+        checkpoint: CrawlCheckpoint | None = None,
+        refresh: bool = False,
+        filters: dict[str, str] | None = None,
+    ) -> Iterator[list[dict]]:
+        """This method yields the raw results of each search page of a category.
+
+        The first page tells the listing count of the category, `paging.total`,
+        so only the pages that exist are requested. A category with more listings
+        than the offset cap serves is crawled through its subcategories, or
+        through the values of the other SPLIT_FILTERS, instead.
 
-        for off in range(0, limit, 50):
-            products = self.client.get(
-                f"/sites/{self.country_id}/search?category={category_id}&offset={off}"
-            ).json()
+        Args:
+            category_id (str): Category id.
+            limit (int | None, optional): Number of products to retrieve, None for
+                all of them. Defaults to 1000.
+            checkpoint (CrawlCheckpoint | None, optional): Checkpoint where each page
+                is recorded once crawled, and read from instead of requesting it
+                again. Defaults to None.
+            refresh (bool, optional): Whether to request again a category completed
+                by the interrupted crawl when its listing count has changed since.
+                Defaults to False.
+            filters (dict[str, str] | None, optional): Search filters applied on top
+                of the category, e.g. {"ITEM_CONDITION": "2230284"}. Defaults to None.
+
+        Yields:
+            list[dict]: Products of a search page.
 
-            all_category_products = pd.concat(
-                [all_category_products, pd.DataFrame(products["results"])], ignore_index=True
+        """
+        filters = filters or {}
+        key = self._search_key(category_id, filters)
+        pages = {} if checkpoint is None else checkpoint.get_pages(key)
+        recorded = None if checkpoint is None else checkpoint.get_category(key)
+        first_page = None
+
+        if refresh and recorded is not None and recorded[1]:
+            first_page = self.client.get(self._search_url(category_id, 0, filters)).json()
+            if first_page["paging"]["total"] != recorded[0]:
+                log.info(f"Category <y>{key}</y> has changed, crawling it again")
+                checkpoint.reset(key)
+                pages = {}
+
+        if 0 not in pages or recorded is None or recorded[0] is None:
+            first_page = (
+                first_page or self.client.get(self._search_url(category_id, 0, filters)).json()
             )
+            pages[0] = first_page["results"]
+            if checkpoint is not None:
+                checkpoint.save_page(key, 0, pages[0], first_page["paging"]["total"])
+
+        total = recorded[0] if first_page is None else first_page["paging"]["total"]
+        if first_page is None and min(total, limit or total) > SEARCH_MAX_RESULTS:
+            # The filters to split the search on are only in a fresh first page.
+            first_page = self.client.get(self._search_url(category_id, 0, filters)).json()
+
+        offsets, searches = self._plan_search(
+            category_id, filters, first_page or {"paging": {"total": total}}, limit
+        )
+        for sub_category_id, sub_filters, sub_limit in searches:
+            yield from self.iter_products_by_category(
+                sub_category_id,
+                sub_limit,
+                checkpoint=checkpoint,
+                refresh=refresh,
+                filters=sub_filters,
+            )
+
+        for off in offsets:
+            if off not in pages:
+                page = self.client.get(self._search_url(category_id, off, filters)).json()
+                if checkpoint is not None:
+                    checkpoint.save_page(key, off, page["results"], page["paging"]["total"])
+                pages[off] = page["results"]
+            yield pages[off]
+
+        if checkpoint is not None:
+            checkpoint.complete_category(key)
+
+    def iter_country_products(
+        self,
+        limit: int | None = 1000,
+        checkpoint: CrawlCheckpoint | None = None,
+        refresh: bool = False,
+    ) -> Iterator[list[dict]]:
+        """This method yields the raw results of each search page of every
+        category in the country.
+
+        Args:
+            limit (int | None, optional): Number of products to retrieve per
+                category, None for all of them. Defaults to 1000.
+            checkpoint (CrawlCheckpoint | None, optional): Checkpoint to resume an
+                interrupted crawl from. Defaults to None.
+            refresh (bool, optional): Whether to request again the categories of the
+                checkpoint whose listing count has changed. Defaults to False.
+
+        Yields:
+            list[dict]: Products of a search page.
+
+        """
+        for category in self.cats:
+            yield from self.iter_products_by_category(
+                category["id"], limit=limit, checkpoint=checkpoint, refresh=refresh
+            )
+
+    def get_products_by_category(self, category_id: str, limit: int | None = 1000) -> pd.DataFrame:
+        """This method returns all the products from a category, requesting only
+        the search pages it has.
+
+        Args:
+            category_id (str): Category id.
+            limit (int | None, optional): Number of products to retrieve, None for
+                all of them. Defaults to 1000.
+
+        Returns:
+            pd.DataFrame: DataFrame with all the products from the category.
 
-        return all_category_products
+        """
+        return materialize_batches(
+            self.iter_products_by_category(category_id, limit=limit), columns=PRODUCT_COLUMNS
+        )
 
-    def gell_all_country_products(self, limit: int = 1000) -> pd.DataFrame:
+    def gell_all_country_products(
+        self,
+        limit: int | None = 1000,
+        output: Literal["pandas", "arrow"] = "pandas",
+        checkpoint: CrawlCheckpoint | None = None,
+        refresh: bool = False,
+        columns: "dict[str, tuple[str, str]] | None" = PRODUCT_COLUMNS,
+    ) -> "pd.DataFrame | pa.Table":
         """This method returns all the products from all categories in the
         country.
 
         Args:
-            limit (int, optional): Number of products to retrieve. Defaults to 1000.
+            limit (int | None, optional): Number of products to retrieve per
+                category, None for all of them. Defaults to 1000.
+            output (Literal["pandas", "arrow"], optional): Whether to return a pandas
+                DataFrame or an Arrow table. Defaults to "pandas".
+            checkpoint (CrawlCheckpoint | None, optional): Checkpoint to resume the
+                crawl from, e.g. after a network error. It is finished once all the
+                products are collected. The resumed pages only have the columns of
+                the checkpoint. Defaults to None.
+            refresh (bool, optional): Whether to request again the categories of the
+                checkpoint whose listing count has changed since the interrupted
+                crawl. Defaults to False.
+            columns (dict[str, tuple[str, str]] | None, optional): Schema
+                each page is projected to and typed with as it is parsed. None keeps
+                every field of the results. Defaults to PRODUCT_COLUMNS.
 
         Returns:
-            pd.DataFrame: DataFrame with all the products from all categories.
+            pd.DataFrame | pa.Table: All the products from all categories.
 
         """
-        all_country_products = pd.DataFrame()
-        for category in self.cats:
-            all_country_products = pd.concat(
-                [all_country_products, self.get_products_by_category(category["id"], limit=limit)]
+        all_country_products = materialize_batches(
+            self.iter_country_products(limit, checkpoint=checkpoint, refresh=refresh),
+            output,
+            columns,
+        )
+        if checkpoint is not None:
+            checkpoint.finish()
+        self._log_collected(all_country_products)
+
+        return all_country_products
+
+    async def agell_all_country_products(
+        self,
+        limit: int | None = 1000,
+        max_concurrency: int = 10,
+        requests_per_second: float | None = None,
+        retry: RetryPolicy | None = None,
+        output: Literal["pandas", "arrow"] = "pandas",
+        columns: "dict[str, tuple[str, str]] | None" = PRODUCT_COLUMNS,
+    ) -> "pd.DataFrame | pa.Table":
+        """This method returns all the products from all categories in the
+        country, requesting the search pages of every category concurrently.
+
+        Args:
+            limit (int | None, optional): Number of products to retrieve per
+                category, None for all of them. Defaults to 1000.
+            max_concurrency (int, optional): Maximum requests in flight. Defaults to 10.
+            requests_per_second (float | None, optional): Requests per second allowed
+                per host to this call, on top of the rate of the session. None only
+                applies the rate of the session. Defaults to None.
+            retry (RetryPolicy | None, optional): Retry policy on 429/5xx responses
+                and transport errors. Defaults to RetryPolicy().
+            output (Literal["pandas", "arrow"], optional): Whether to return a pandas
+                DataFrame or an Arrow table. Defaults to "pandas".
+            columns (dict[str, tuple[str, str]] | None, optional): Schema
+                each page is projected to as soon as it arrives. None keeps every
+                field of the results. Defaults to PRODUCT_COLUMNS.
+
+        Returns:
+            pd.DataFrame | pa.Table: All the products from all categories, the same
+                and in the same order as the ones of `gell_all_country_products`.
+
+        """
+        pages = self._aiter_search_pages(
+            limit, max_concurrency, requests_per_second, retry or RetryPolicy(), columns
+        )
+        async with aclosing(pages):
+            ordered = sorted([page async for page in pages], key=lambda page: page[0])
+
+        all_country_products = materialize_batches(
+            (results for _, results in ordered), output, columns
+        )
+        self._log_collected(all_country_products)
+
+        return all_country_products
+
+    async def aiter_country_products(
+        self,
+        limit: int | None = 1000,
+        max_concurrency: int = 10,
+        requests_per_second: float | None = None,
+        retry: RetryPolicy | None = None,
+        columns: "dict[str, tuple[str, str]] | None" = PRODUCT_COLUMNS,
+    ) -> AsyncIterator[list[dict]]:
+        """This method yields the results of each search page of every category
+        in the country as soon as it arrives.
+
+        At most `max_concurrency` pages are requested or waiting to be consumed,
+        so a slow consumer slows the crawl down instead of piling pages up.
+
+        Args:
+            limit (int | None, optional): Number of products to retrieve per
+                category, None for all of them. Defaults to 1000.
+            max_concurrency (int, optional): Maximum pages in flight. Defaults to 10.
+            requests_per_second (float | None, optional): Requests per second allowed
+                per host to this call, on top of the rate of the session. None only
+                applies the rate of the session. Defaults to None.
+            retry (RetryPolicy | None, optional): Retry policy on 429/5xx responses
+                and transport errors. Defaults to RetryPolicy().
+            columns (dict[str, tuple[str, str]] | None, optional): Schema
+                each page is projected to. None keeps every field of the results.
+                Defaults to PRODUCT_COLUMNS.
+
+        Yields:
+            list[dict]: Products of a search page, in completion order.
+
+        """
+        pages = self._aiter_search_pages(
+            limit, max_concurrency, requests_per_second, retry or RetryPolicy(), columns
+        )
+        async with aclosing(pages):
+            async for _, results in pages:
+                yield results
+
+    async def _aiter_search_pages(
+        self,
+        limit: int | None,
+        max_concurrency: int,
+        requests_per_second: float | None,
+        retry: RetryPolicy,
+        columns: "dict[str, tuple[str, str]] | None",
+    ) -> AsyncIterator[tuple[tuple[int, ...], list[dict]]]:
+        """This method yields the results of the search pages of every category
+        as they arrive, scheduling the rest of the pages of a search, or the
+        narrower searches it is split into, when its first page arrives.
+
+        Args:
+            limit (int | None): Number of products to retrieve per category.
+            max_concurrency (int): Maximum pages in flight or waiting to be consumed.
+            requests_per_second (float | None): Requests per second allowed per host
+                to this call on top of the rate of the session, None only applies
+                the rate of the session.
+            retry (RetryPolicy): Retry policy on 429/5xx responses and transport errors.
+            columns (dict[str, tuple[str, str]] | None): Schema each page is
+                projected to.
+
+        Yields:
+            tuple[tuple[int, ...], list[dict]]: The position of the page in the
+                order of `iter_country_products`, and its results.
+
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+        rate_limiter = self.session.shared_rate_limiter(requests_per_second)
+        # Position of the search, category id, filters, offset and limit of the pages
+        # to request, the limit only matters for the first page of a search.
+        jobs = deque(((i,), category["id"], {}, 0, limit) for i, category in enumerate(self.cats))
+
+        async def fetch_page(client: AsyncClient, category_id: str, filters: dict, off: int):
+            """This function requests a search page."""
+            url = self._search_url(category_id, off, filters)
+            return await fetch_json(client, url, semaphore, rate_limiter, retry)
+
+        async with self.session.async_client() as client:
+            pending: dict[asyncio.Task, tuple] = {}
+            try:
+                while True:
+                    while len(pending) < max_concurrency and jobs:
+                        job = jobs.popleft()
+                        pending[asyncio.create_task(fetch_page(client, *job[1:4]))] = job
+
+                    if not pending:
+                        return
+
+                    done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        position, category_id, filters, off, search_limit = pending.pop(task)
+                        page = task.result()
+
+                        if off == 0:
+                            offsets, searches = self._plan_search(
+                                category_id, filters, page, search_limit
+                            )
+                            jobs.extend(
+                                (position, category_id, filters, o, None) for o in offsets[1:]
+                            )
+                            jobs.extend(
+                                (position + (j,), *search[:2], 0, search[2])
+                                for j, search in enumerate(searches)
+                            )
+                            if searches:
+                                continue
+
+                        results = page["results"]
+                        yield (
+                            position + (off,),
+                            results if columns is None else project_records(results, columns),
+                        )
+            finally:
+                for task in pending:
+                    task.cancel()
+
+    def _search_url(
+        self, category_id: str, offset: int, filters: dict[str, str] | None = None
+    ) -> str:
+        """This method returns the search url of a category page.
+
+        Args:
+            category_id (str): Category id.
+            offset (int): Offset of the page.
+            filters (dict[str, str] | None, optional): Search filters applied on top
+                of the category. Defaults to None.
+
+        Returns:
+            str: Search url.
+
+        """
+        params = "".join(f"&{name}={value}" for name, value in (filters or {}).items())
+        return f"/sites/{self.country_id}/search?category={category_id}{params}&offset={offset}"
+
+    @staticmethod
+    def _search_key(category_id: str, filters: dict[str, str]) -> str:
+        """This method returns the key of a search in the checkpoint, the
+        category id followed by its filters, e.g. `MCO1234|price=*-1000.0`.
+
+        Args:
+            category_id (str): Category id.
+            filters (dict[str, str]): Search filters applied on top of the category.
+
+        Returns:
+            str: The key of the search.
+
+        """
+        return "|".join([category_id, *(f"{name}={value}" for name, value in filters.items())])
+
+    def _plan_search(
+        self, category_id: str, filters: dict[str, str], first_page: dict, limit: int | None
+    ) -> tuple[list[int], list[tuple[str, dict[str, str], int | None]]]:
+        """This method plans the crawl of a search from its first page: the
+        offsets of the pages it has, or the narrower searches that cover it when
+        it has more listings than the offset cap serves.
+
+        Args:
+            category_id (str): Category id.
+            filters (dict[str, str]): Search filters applied on top of the category.
+            first_page (dict): The response of the first page of the search.
+            limit (int | None): Number of products to retrieve, None for all of them.
+
+        Returns:
+            tuple[list[int], list[tuple[str, dict[str, str], int | None]]]: The
+                offsets of the pages to crawl, the first one included, and the
+                category id, filters and limit of each narrower search. Only one
+                of them is not empty.
+
+        """
+        total = first_page["paging"]["total"]
+        wanted = total if limit is None else min(limit, total)
+
+        if wanted > SEARCH_MAX_RESULTS:
+            available = {f["id"]: f["values"] for f in first_page.get("available_filters", [])}
+            for filter_id in SPLIT_FILTERS:
+                if filter_id in filters or not available.get(filter_id):
+                    continue
+
+                searches, remaining = [], limit
+                for value in available[filter_id]:
+                    if filter_id == "category" and value["id"] == category_id:
+                        continue
+                    share = value.get("results")
+                    if remaining is not None:
+                        share = remaining if share is None else min(share, remaining)
+                        remaining -= share
+                    if share == 0:
+                        continue
+
+                    if filter_id == "category":
+                        searches.append((value["id"], filters, share))
+                    else:
+                        searches.append((category_id, {**filters, filter_id: value["id"]}, share))
+                    if remaining == 0:
+                        break
+                if searches:
+                    return [], searches
+
+            log.warning(
+                f"Search <y>{self._search_key(category_id, filters)}</y> has {total} listings,"
+                f" only the first {SEARCH_MAX_RESULTS} can be crawled"
             )
 
+        return list(range(0, min(wanted, SEARCH_MAX_RESULTS), SEARCH_PAGE_SIZE)), []
+
+    def _log_collected(self, all_country_products: "pd.DataFrame | pa.Table") -> None:
+        """This method logs how many products have been collected, and counts
+        them in the shared metrics.
+
+        Args:
+            all_country_products (pd.DataFrame | pa.Table): Products collected from
+                the country.
+
+        """
         log.info(
             f"""You have collected: \n
             {all_country_products.shape[0]} products from {self.country} from {len(self.cats)} categories
             """
         )
-
-        return all_country_products
+        METRICS.inc("meli_crawled_rows_total", all_country_products.shape[0], country=self.country)
 
 
 class MercadoLibreUniverse:
     """This class is used to request the MercadoLibre API and gather all the
     categories from all countries."""
 
-    def __init__(self):
-        """This method initializes the class."""
-        self.client = Client(base_url="https://api.mercadolibre.com/")
+    def __init__(
+        self,
+        transport: BaseTransport | None = None,
+        cache: ResponseCache | None = None,
+        session: MeliSession | None = None,
+    ):
+        """This method initializes the class.
+
+        Args:
+            transport (BaseTransport | None, optional): Transport of the client, e.g.
+                an `httpx.MockTransport`. Defaults to None.
+            cache (ResponseCache | None, optional): Cache of the API responses, it can
+                be shared with other connectors. Defaults to None.
+            session (MeliSession | None, optional): Session shared with other
+                connectors. When given, transport and cache are taken from it.
+                Defaults to a new session with them.
+
+        """
+        self.session = session or MeliSession(cache=cache, transport=transport)
+        self.client = self.session.client
 
     def get_categories_given_country_id(self, country_id: str) -> dict:
         """This method returns the categories given the country id.
@@ -175,26 +677,28 @@ class MercadoLibreUniverse:
         self.countries = [country["name"] for country in self.countries_details]
         self.df_countries_details = pd.DataFrame(self.countries_details)
 
-    def get_all_categories_from_all_countries(self) -> pd.DataFrame:
-        """This method returns all the categories from all countries.
+    def iter_categories_from_all_countries(self) -> Iterator[list[dict]]:
+        """This method yields the raw categories of each country.
 
-        Returns:
-            pd.DataFrame: DataFrame with all the categories from all countries.
+        Yields:
+            list[dict]: Categories from a country.
 
         """
         self.gather_countries_info()
 
-        all_universe_cats = pd.DataFrame()
-
         for country in self.countries_details:
-            cats = self.get_categories_given_country_id(country["id"])
-            df_cats = pd.DataFrame(cats)
-            df_cats["country_id"] = df_cats["id"].apply(lambda x: x[:3])
-            df_cats["cat_code"] = df_cats["id"].apply(lambda x: x[3:])
+            yield self.get_categories_given_country_id(country["id"])
 
-            all_universe_cats = pd.concat([all_universe_cats, df_cats])
+    def get_all_categories_from_all_countries(self) -> pd.DataFrame:
+        """This method returns all the categories from all countries.
 
-        del df_cats
+        Returns:
+            pd.DataFrame: DataFrame with all the categories from all countries.
+
+        """
+        all_universe_cats = materialize_batches(self.iter_categories_from_all_countries())
+        all_universe_cats["country_id"] = all_universe_cats["id"].str[:3]
+        all_universe_cats["cat_code"] = all_universe_cats["id"].str[3:]
 
         merged = all_universe_cats.merge(
             self.df_countries_details,
@@ -208,3 +712,102 @@ class MercadoLibreUniverse:
         )
 
         return merged
+
+    async def acrawl_category_tree(
+        self,
+        index: "CategoryIndex",
+        site_ids: list[str] | None = None,
+        max_concurrency: int = 10,
+        requests_per_second: float | None = None,
+        retry: RetryPolicy | None = None,
+        refresh: bool = False,
+    ) -> dict[str, int]:
+        """This method crawls the full category tree of the sites concurrently
+        and stores it in the category index.
+
+        Each `/categories/{id}` response lists the children of the category with
+        their listing count. A child whose count equals the indexed one keeps
+        its indexed subtree instead of being requested again, so a refresh only
+        walks the branches that changed.
+
+        Args:
+            index (CategoryIndex): The index the trees are stored in.
+            site_ids (list[str] | None, optional): The ids of the sites, e.g. MCO.
+                Defaults to None, every site.
+            max_concurrency (int, optional): Maximum requests in flight. Defaults to 10.
+            requests_per_second (float | None, optional): Requests per second allowed
+                per host to this call, on top of the rate of the session. None only
+                applies the rate of the session. Defaults to None.
+            retry (RetryPolicy | None, optional): Retry policy on 429/5xx responses
+                and transport errors. Defaults to RetryPolicy().
+            refresh (bool, optional): Whether to request again every category, even
+                the ones whose listing count has not changed. Defaults to False.
+
+        Returns:
+            dict[str, int]: The sites crawled and changed, the categories requested,
+                kept from the index and failed.
+
+        """
+        if site_ids is None:
+            self.gather_countries_info()
+            site_ids = [country["id"] for country in self.countries_details]
+
+        semaphore = asyncio.Semaphore(max_concurrency)
+        rate_limiter = self.session.shared_rate_limiter(requests_per_second)
+        retry = retry or RetryPolicy()
+        stats = dict.fromkeys(("sites", "changed", "requested", "kept", "failed"), 0)
+
+        async def crawl_site(client: AsyncClient, site_id: str) -> None:
+            """This function crawls the tree of a site from its top-level
+            categories and stores it."""
+            known = {} if refresh else index.totals(site_id)
+            roots = await fetch_json(
+                client, f"sites/{site_id}/categories", semaphore, rate_limiter, retry
+            )
+            nodes = {
+                root["id"]: {"parent_id": None, "name": root["name"], "total_items": None}
+                for root in roots
+            }
+            kept: set[str] = set()
+
+            async def visit(category_id: str) -> None:
+                """This function requests a category and visits the children
+                whose listing count changed."""
+                try:
+                    category = await fetch_json(
+                        client, f"categories/{category_id}", semaphore, rate_limiter, retry
+                    )
+                except (HTTPStatusError, TransportError) as error:
+                    log.warning(f"Could not fetch category <r>{category_id}</r>: {error!r}")
+                    stats["failed"] += 1
+                    # The indexed count stays, so the next crawl requests it again.
+                    nodes[category_id]["total_items"] = known.get(category_id)
+                    kept.add(category_id)
+                    return
+
+                stats["requested"] += 1
+                nodes[category_id]["total_items"] = category.get("total_items_in_this_category")
+                children = []
+                for child in category.get("children_categories", []):
+                    total = child.get("total_items_in_this_category")
+                    nodes[child["id"]] = {
+                        "parent_id": category_id,
+                        "name": child["name"],
+                        "total_items": total,
+                    }
+                    if total is not None and known.get(child["id"]) == total:
+                        stats["kept"] += 1
+                        kept.add(child["id"])
+                    else:
+                        children.append(child["id"])
+                await asyncio.gather(*(visit(child_id) for child_id in children))
+
+            await asyncio.gather(*(visit(root["id"]) for root in roots))
+            stats["sites"] += 1
+            stats["changed"] += index.replace_site(site_id, nodes, kept)
+
+        async with self.session.async_client() as client:
+            await asyncio.gather(*(crawl_site(client, site_id) for site_id in site_ids))
+
+        log.info(f"Category trees: {stats}")
+        return stats
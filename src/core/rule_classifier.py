@@ -0,0 +1,124 @@
+"""This module contains the rule-based classifier that categorizes the products
+whose title states the answer, before falling back to the LLM."""
+
+import re
+
+from core.base_models import ProductCategory
+
+_NUMBER = r"(?:\d+|dos|tres|cuatro|cinco|seis|diez|doce)"
+_UNITS = r"(?:unidades|unds?|uds?|pzs?|piezas|pares)"
+# End of a number, also when a unit is attached to it, e.g. "6unidades".
+_END = rf"(?:\b|(?={_UNITS}\b))"
+# A number of units other than one, since "x 1" and "1 und" are single units.
+_MANY = rf"(?!1{_END}){_NUMBER}"
+
+# Rules evaluated in order, the first matching rule gives the category.
+DEFAULT_RULES: list[tuple[str, ProductCategory, float]] = [
+    (
+        rf"\b(?:paquetes?|paq|pack|caja|bolsa|display)\b"
+        rf"\s*(?:x|×|\*|por|de|con)?\s*{_NUMBER}{_END}"
+        rf"|\b{_NUMBER}\s*(?:paquetes|packs|cajas|bolsas)\b",
+        ProductCategory.PACKAGE,
+        0.95,
+    ),
+    (
+        rf"(?:\bx|×)\s*{_MANY}\s*{_UNITS}?\b"
+        rf"|\b{_MANY}\s*{_UNITS}\b"
+        rf"|\b(?:kit|set|juego|combo) (?:de|x) {_MANY}{_END}"
+        r"|\b(?:par|pareja) de\b|\bx(?!1\b)\d+\b",
+        ProductCategory.MULTIPLE_UNITS,
+        0.9,
+    ),
+    (
+        r"\b(?:paquetes?|pack|combo)\b",
+        ProductCategory.PACKAGE,
+        0.7,
+    ),
+    (
+        rf"\b(?:1|una?) unidad\b|\bunidad\b|\bindividual\b|(?:\bx|×) ?1{_END}",
+        ProductCategory.SINGLE_UNIT,
+        0.85,
+    ),
+]
+
+
+class RuleClassifier:
+    """This class categorizes a product with compiled regular expressions over
+    its title, and defers it to the LLM when no rule is confident enough."""
+
+    def __init__(
+        self,
+        rules: list[tuple[str, ProductCategory, float]] | None = None,
+        min_confidence: float = 0.8,
+    ):
+        """This method initializes the class.
+
+        Args:
+            rules (list[tuple[str, ProductCategory, float]] | None, optional): The
+                pattern, category and confidence of each rule, in order. Defaults to
+                DEFAULT_RULES.
+            min_confidence (float, optional): The confidence required to skip the
+                LLM. Defaults to 0.8.
+
+        """
+        self.rules = [
+            (re.compile(pattern, re.IGNORECASE), category, confidence)
+            for pattern, category, confidence in (rules or DEFAULT_RULES)
+        ]
+        self.min_confidence = min_confidence
+        self.classified = 0
+        self.deferred = 0
+
+    @property
+    def stats(self) -> dict[str, int]:
+        """Property: This method returns how many products were classified by
+        the rules and how many were deferred to the LLM."""
+        return {"rules": self.classified, "deferred": self.deferred}
+
+    def classify(self, title: str) -> tuple[ProductCategory | None, float]:
+        """This method returns the category of the first rule matching a title.
+
+        Args:
+            title (str): The title of the product.
+
+        Returns:
+            tuple[ProductCategory | None, float]: The category and the confidence of
+                the rule, (None, 0.0) if no rule matches.
+
+        """
+        for pattern, category, confidence in self.rules:
+            if pattern.search(str(title)):
+                return category, confidence
+        return None, 0.0
+
+    def predict(self, title: str) -> ProductCategory | None:
+        """This method returns the category of the title if it is confident
+        enough, and counts the product as classified or deferred.
+
+        Args:
+            title (str): The title of the product.
+
+        Returns:
+            ProductCategory | None: The category, None if the LLM has to decide.
+
+        """
+        category, confidence = self.classify(title)
+        if category is None or confidence < self.min_confidence:
+            self.deferred += 1
+            return None
+
+        self.classified += 1
+        return category
+
+    def predict_batch(self, products: list[dict[str, str]]) -> list[ProductCategory | None]:
+        """This method returns the category of each product from its title.
+
+        Args:
+            products (list[dict[str, str]]): The title and description of each product.
+
+        Returns:
+            list[ProductCategory | None]: The category of each product, None if the
+                LLM has to decide.
+
+        """
+        return [self.predict(product["title"]) for product in products]
@@ -0,0 +1,135 @@
+"""This script crawls the products of many countries in parallel, one worker
+process per country, and stores each country in its own table of the
+database."""
+
+import argparse
+import asyncio
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import get_args
+
+import pandas as pd
+
+from core import Country, MercadoLibreItems
+from core.http_cache import ResponseCache
+from core.http_client import MeliSession
+from libs import DatabaseHandler
+
+COUNTRIES = list(get_args(Country.model_fields["country"].annotation))
+
+
+def crawl_country(country: str, db_name: str, requests_per_second: float, limit: int) -> dict:
+    """This function crawls the products of a country and stores them in the
+    `country_products_{country}` table.
+
+    Args:
+        country (str): The country name.
+        db_name (str): The database file.
+        requests_per_second (float): The requests per second allowed to this worker.
+        limit (int): The number of products to retrieve per category.
+
+    Returns:
+        dict: The summary of the crawl: rows written, requests sent to the API,
+            failed requests, bytes downloaded, duration, and the error that
+            stopped the crawl if any. The responses served by the cache are not
+            counted.
+
+    """
+    start = time.perf_counter()
+    summary = {
+        "country": country,
+        "rows": 0,
+        "requests": 0,
+        "errors": 0,
+        "bytes": 0,
+        "error": None,
+    }
+
+    try:
+        with (
+            ResponseCache() as cache,
+            MeliSession(cache=cache, requests_per_second=requests_per_second) as session,
+        ):
+            try:
+                meli = MercadoLibreItems(Country(country=country), session=session)
+                products = asyncio.run(meli.agell_all_country_products(limit=limit)).filter(
+                    ["id", "title", "price", "permalink", "condition", "available_quantity"]
+                )
+            finally:
+                summary.update(session.traffic.summary())
+
+        with DatabaseHandler(db_name) as db:
+            summary["rows"] = db.write_dataframe(f"country_products_{country}", products)
+    except Exception as error:
+        summary["error"] = repr(error)
+
+    summary["duration_s"] = round(time.perf_counter() - start, 3)
+    return summary
+
+
+def crawl_countries(
+    countries: list[str],
+    db_name: str = "meli.db",
+    max_workers: int = 4,
+    requests_per_second: float = 20.0,
+    limit: int = 1000,
+) -> pd.DataFrame:
+    """This function crawls the countries in a pool of worker processes and
+    returns the consolidated summary.
+
+    The global request budget is split evenly between the workers running at
+    the same time, so the API sees at most `requests_per_second` overall.
+
+    Args:
+        countries (list[str]): The country names.
+        db_name (str, optional): The database file. Defaults to "meli.db".
+        max_workers (int, optional): The number of worker processes. Defaults to 4.
+        requests_per_second (float, optional): The global request budget. Defaults
+            to 20.0.
+        limit (int, optional): The number of products to retrieve per category.
+            Defaults to 1000.
+
+    Returns:
+        pd.DataFrame: The summary of each country, see `crawl_country`.
+
+    """
+    workers = max(1, min(max_workers, len(countries)))
+    worker_budget = requests_per_second / workers
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        summaries = list(
+            pool.map(
+                crawl_country,
+                countries,
+                [db_name] * len(countries),
+                [worker_budget] * len(countries),
+                [limit] * len(countries),
+            )
+        )
+
+    return pd.DataFrame(summaries)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--countries", nargs="+", choices=COUNTRIES, default=COUNTRIES)
+    parser.add_argument("--db", default="meli.db")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--requests-per-second", type=float, default=20.0)
+    parser.add_argument("--limit", type=int, default=1000)
+    args = parser.parse_args()
+
+    summary = crawl_countries(
+        args.countries, args.db, args.workers, args.requests_per_second, args.limit
+    )
+    summary.insert(0, "crawled_at", pd.Timestamp.now(tz="UTC").isoformat())
+
+    with DatabaseHandler(args.db) as db:
+        db.write_dataframe("crawl_summary", summary)
+
+    print(summary.to_string(index=False))
+    print(
+        f"Total: {summary['rows'].sum()} rows, {summary['requests'].sum()} requests,"
+        f" {summary['errors'].sum()} failed, {summary['bytes'].sum()} bytes,"
+        f" {summary['error'].notna().sum()} countries failed"
+    )
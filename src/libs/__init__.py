@@ -1,5 +1,56 @@
-"""This module contains the utility functions for the project."""
+"""This module contains the utility functions for the project.
 
-from .utils import DatabaseHandler, read_config_from_file
+The names are imported from their submodule on first access, so the database
+layer can be used without loading pandas or pyarrow.
 
-__all__ = ["DatabaseHandler", "read_config_from_file"]
+"""
+
+from importlib import import_module
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from .category_index import CategoryIndex
+    from .checkpoints import CrawlCheckpoint
+    from .llm_cache import LLMResultCache
+    from .metrics import METRICS, MetricsRegistry
+    from .parquet_store import ParquetStore
+    from .utils import DatabaseHandler, materialize_batches, read_config_from_file
+
+_SUBMODULES = {
+    "CategoryIndex": ".category_index",
+    "CrawlCheckpoint": ".checkpoints",
+    "DatabaseHandler": ".utils",
+    "LLMResultCache": ".llm_cache",
+    "METRICS": ".metrics",
+    "MetricsRegistry": ".metrics",
+    "ParquetStore": ".parquet_store",
+    "materialize_batches": ".utils",
+    "read_config_from_file": ".utils",
+}
+
+__all__ = [
+    "CategoryIndex",
+    "CrawlCheckpoint",
+    "DatabaseHandler",
+    "LLMResultCache",
+    "METRICS",
+    "MetricsRegistry",
+    "ParquetStore",
+    "materialize_batches",
+    "read_config_from_file",
+]
+
+
+def __getattr__(name: str) -> Any:
+    """Import a public name from its submodule on first access."""
+    if name not in _SUBMODULES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    value = getattr(import_module(_SUBMODULES[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    """List the public names of the module."""
+    return sorted(__all__)
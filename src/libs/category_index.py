@@ -0,0 +1,232 @@
+"""Contains the index of the category hierarchy of every country."""
+
+import time
+from typing import Any
+
+from .utils import DatabaseHandler
+
+
+class CategoryIndex:
+    """A class to store the category trees in SQLite as a closure table.
+
+    Every category has a row per ancestor, itself included at depth 0, so the
+    ancestors and descendants of a category are a single indexed query instead
+    of a walk of the tree. The categories are also indexed by their code, the id
+    without the site prefix, to map a category between countries.
+
+    """
+
+    def __init__(self, db: DatabaseHandler):
+        """Initialize the CategoryIndex object and create its tables.
+
+        Args:
+            db (DatabaseHandler): A connected database handler, e.g. of `meli.db`.
+
+        """
+        self.db = db
+
+        self.db.cur.execute(
+            """CREATE TABLE IF NOT EXISTS categories (
+                category_id TEXT PRIMARY KEY,
+                site_id TEXT NOT NULL,
+                cat_code TEXT NOT NULL,
+                name TEXT,
+                parent_id TEXT,
+                total_items INTEGER,
+                crawled_at REAL NOT NULL
+            )"""
+        )
+        self.db.cur.execute(
+            """CREATE TABLE IF NOT EXISTS category_closure (
+                ancestor_id TEXT NOT NULL,
+                descendant_id TEXT NOT NULL,
+                depth INTEGER NOT NULL,
+                site_id TEXT NOT NULL,
+                PRIMARY KEY (ancestor_id, descendant_id)
+            )"""
+        )
+        self.db.cur.execute(
+            "CREATE INDEX IF NOT EXISTS ix_categories_site ON categories (site_id);"
+        )
+        self.db.cur.execute(
+            "CREATE INDEX IF NOT EXISTS ix_categories_cat_code ON categories (cat_code, site_id);"
+        )
+        self.db.cur.execute(
+            "CREATE INDEX IF NOT EXISTS ix_categories_parent ON categories (parent_id);"
+        )
+        self.db.cur.execute(
+            "CREATE INDEX IF NOT EXISTS ix_category_closure_descendant "
+            "ON category_closure (descendant_id, depth);"
+        )
+        self.db.cur.execute(
+            "CREATE INDEX IF NOT EXISTS ix_category_closure_site ON category_closure (site_id);"
+        )
+        self.db.cnx.commit()
+
+    def get(self, category_id: str) -> dict[str, Any] | None:
+        """Get a category.
+
+        Args:
+            category_id (str): The id of the category, e.g. MCO1234.
+
+        Returns:
+            dict[str, Any] | None: The site, code, name, parent and listing count of
+                the category, None if it is not indexed.
+
+        """
+        self.db.cur.execute("SELECT * FROM categories WHERE category_id = ?;", (category_id,))
+        row = self.db.cur.fetchone()
+        if row is None:
+            return None
+        return dict(zip([column[0] for column in self.db.cur.description], row))
+
+    def totals(self, site_id: str) -> dict[str, int | None]:
+        """Get the listing count of every indexed category of a site.
+
+        Args:
+            site_id (str): The id of the site, e.g. MCO.
+
+        Returns:
+            dict[str, int | None]: The listing count of each category id.
+
+        """
+        query = "SELECT category_id, total_items FROM categories WHERE site_id = ?;"
+        return dict(self.db.cur.execute(query, (site_id,)).fetchall())
+
+    def ancestors(self, category_id: str) -> list[str]:
+        """Get the ancestors of a category.
+
+        Args:
+            category_id (str): The id of the category.
+
+        Returns:
+            list[str]: The ids of the ancestors, from the top-level category down
+                to the parent.
+
+        """
+        query = (
+            "SELECT ancestor_id FROM category_closure "
+            "WHERE descendant_id = ? AND depth > 0 ORDER BY depth DESC;"
+        )
+        return [row[0] for row in self.db.cur.execute(query, (category_id,)).fetchall()]
+
+    def descendants(self, category_id: str, max_depth: int | None = None) -> list[str]:
+        """Get the descendants of a category.
+
+        Args:
+            category_id (str): The id of the category.
+            max_depth (int | None, optional): The deepest level returned, 1 for the
+                children. Defaults to None, every level.
+
+        Returns:
+            list[str]: The ids of the descendants, level by level.
+
+        """
+        query = "SELECT descendant_id FROM category_closure WHERE ancestor_id = ? AND depth > 0"
+        params: tuple = (category_id,)
+        if max_depth is not None:
+            query += " AND depth <= ?"
+            params += (max_depth,)
+        query += " ORDER BY depth, descendant_id;"
+        return [row[0] for row in self.db.cur.execute(query, params).fetchall()]
+
+    def leaves(self, category_id: str) -> list[str]:
+        """Get the leaves under a category, the ones listings are filed in.
+
+        Args:
+            category_id (str): The id of the category.
+
+        Returns:
+            list[str]: The ids of the leaves, the category itself if it is a leaf.
+
+        """
+        query = """SELECT closure.descendant_id FROM category_closure AS closure
+            WHERE closure.ancestor_id = ? AND NOT EXISTS (
+                SELECT 1 FROM categories WHERE categories.parent_id = closure.descendant_id
+            )
+            ORDER BY closure.descendant_id;"""
+        return [row[0] for row in self.db.cur.execute(query, (category_id,)).fetchall()]
+
+    def equivalents(self, cat_code: str) -> dict[str, str]:
+        """Get the category of each site with a code.
+
+        Args:
+            cat_code (str): The code of the category, its id without the site.
+
+        Returns:
+            dict[str, str]: The category id of each site id.
+
+        """
+        query = "SELECT site_id, category_id FROM categories WHERE cat_code = ?;"
+        return dict(self.db.cur.execute(query, (cat_code,)).fetchall())
+
+    def equivalent(self, category_id: str, site_id: str) -> str | None:
+        """Get the category of another site with the same code, e.g. MLA1234 for
+        MCO1234 and MLA.
+
+        Args:
+            category_id (str): The id of the category.
+            site_id (str): The id of the other site.
+
+        Returns:
+            str | None: The id of the category, None if the site has no category
+                with the code.
+
+        """
+        query = "SELECT category_id FROM categories WHERE cat_code = ? AND site_id = ?;"
+        row = self.db.cur.execute(query, (category_id[3:], site_id)).fetchone()
+        return None if row is None else row[0]
+
+    def replace_site(
+        self, site_id: str, nodes: dict[str, dict[str, Any]], kept: set[str] | None = None
+    ) -> bool:
+        """Store the crawled tree of a site, keeping the indexed subtrees not
+        crawled again, and rebuild the closure of the site if it changed.
+
+        Args:
+            site_id (str): The id of the site.
+            nodes (dict[str, dict[str, Any]]): The crawled categories by id, with
+                their 'parent_id', 'name' and 'total_items'.
+            kept (set[str] | None, optional): The crawled categories whose indexed
+                descendants are kept. Defaults to None.
+
+        Returns:
+            bool: Whether the tree of the site changed.
+
+        """
+        query = (
+            "SELECT category_id, parent_id, name, total_items FROM categories WHERE site_id = ?;"
+        )
+        stored = {row[0]: row[1:] for row in self.db.cur.execute(query, (site_id,)).fetchall()}
+        keep = set(nodes)
+        for category_id in kept or ():
+            keep.update(self.descendants(category_id))
+
+        removed = [(category_id,) for category_id in stored.keys() - keep]
+        upserted = [
+            (category_id, site_id, category_id[3:], node["name"], node["parent_id"])
+            + (node["total_items"], time.time())
+            for category_id, node in nodes.items()
+            if stored.get(category_id) != (node["parent_id"], node["name"], node["total_items"])
+        ]
+        if not removed and not upserted:
+            return False
+
+        self.db.cur.executemany("DELETE FROM categories WHERE category_id = ?;", removed)
+        self.db.cur.executemany(
+            "INSERT OR REPLACE INTO categories VALUES (?, ?, ?, ?, ?, ?, ?);", upserted
+        )
+        self.db.cur.execute("DELETE FROM category_closure WHERE site_id = ?;", (site_id,))
+        self.db.cur.execute(
+            """INSERT INTO category_closure
+            WITH RECURSIVE closure (ancestor_id, descendant_id, depth) AS (
+                SELECT category_id, category_id, 0 FROM categories WHERE site_id = :site_id
+                UNION ALL
+                SELECT closure.ancestor_id, categories.category_id, closure.depth + 1
+                FROM closure JOIN categories ON categories.parent_id = closure.descendant_id
+            )
+            SELECT ancestor_id, descendant_id, depth, :site_id FROM closure;""",
+            {"site_id": site_id},
+        )
+        self.db.cnx.commit()
+        return True
@@ -0,0 +1,162 @@
+"""Contains the checkpoints that make the country crawls resumable."""
+
+import json
+import time
+
+from .utils import DatabaseHandler
+
+
+class CrawlCheckpoint:
+    """A class to record the search pages already crawled from a country.
+
+    The results of every completed page are kept in the database, projected to
+    the stored columns, so a crawl that dies halfway can resume from the pages
+    it is missing. Once the crawl succeeds the checkpoint is finished and its
+    pages are dropped, so the next crawl requests every page again.
+
+    """
+
+    def __init__(
+        self,
+        db: DatabaseHandler,
+        country_id: str,
+        columns: dict[str, tuple[str, str]] | None = None,
+    ):
+        """Initialize the CrawlCheckpoint object and create its tables.
+
+        Args:
+            db (DatabaseHandler): A connected database handler, e.g. of `meli.db`.
+            country_id (str): The id of the crawled country.
+            columns (dict[str, tuple[str, str]] | None, optional): The fields of
+                the results kept for the resume. Defaults to None, which keeps the
+                ones of PRODUCT_COLUMNS.
+
+        """
+        self.db = db
+        self.country_id = country_id
+        self._columns = columns
+
+        self.db.cur.execute(
+            """CREATE TABLE IF NOT EXISTS crawl_pages (
+                country_id TEXT NOT NULL,
+                category_id TEXT NOT NULL,
+                "offset" INTEGER NOT NULL,
+                results TEXT NOT NULL,
+                crawled_at REAL NOT NULL,
+                PRIMARY KEY (country_id, category_id, "offset")
+            )"""
+        )
+        self.db.cur.execute(
+            """CREATE TABLE IF NOT EXISTS crawl_categories (
+                country_id TEXT NOT NULL,
+                category_id TEXT NOT NULL,
+                total INTEGER,
+                completed INTEGER NOT NULL DEFAULT 0,
+                crawled_at REAL NOT NULL,
+                PRIMARY KEY (country_id, category_id)
+            )"""
+        )
+        self.db.cnx.commit()
+
+    def get_pages(self, category_id: str) -> dict[int, list[dict]]:
+        """Get the results of the pages already crawled from a category.
+
+        Args:
+            category_id (str): The id of the category.
+
+        Returns:
+            dict[int, list[dict]]: The results of each crawled page by offset.
+
+        """
+        query = (
+            'SELECT "offset", results FROM crawl_pages WHERE country_id = ? AND category_id = ?;'
+        )
+        rows = self.db.cur.execute(query, (self.country_id, category_id)).fetchall()
+        return {offset: json.loads(results) for offset, results in rows}
+
+    def save_page(self, category_id: str, offset: int, results: list[dict], total: int | None):
+        """Record a crawled page and the listing count of its category.
+
+        Args:
+            category_id (str): The id of the category.
+            offset (int): The offset of the page.
+            results (list[dict]): The results of the page, only their `columns`
+                are kept.
+            total (int | None): The listing count of the category, `paging.total`.
+
+        """
+        # The schemas import pandas, which the database handler does not need.
+        from .schemas import PRODUCT_COLUMNS, project_records
+
+        now = time.time()
+        self.db.cur.execute(
+            "INSERT OR REPLACE INTO crawl_pages VALUES (?, ?, ?, ?, ?);",
+            (
+                self.country_id,
+                category_id,
+                offset,
+                json.dumps(project_records(results, self._columns or PRODUCT_COLUMNS)),
+                now,
+            ),
+        )
+        self.db.cur.execute(
+            """INSERT INTO crawl_categories (country_id, category_id, total, crawled_at)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT (country_id, category_id) DO UPDATE SET
+                total = excluded.total, crawled_at = excluded.crawled_at;""",
+            (self.country_id, category_id, total, now),
+        )
+        self.db.cnx.commit()
+
+    def get_category(self, category_id: str) -> tuple[int | None, bool] | None:
+        """Get the recorded listing count of a category and whether all its
+        pages have been crawled.
+
+        Args:
+            category_id (str): The id of the category.
+
+        Returns:
+            tuple[int | None, bool] | None: The listing count and the completion
+                flag, None if the category has never been crawled.
+
+        """
+        query = (
+            "SELECT total, completed FROM crawl_categories "
+            "WHERE country_id = ? AND category_id = ?;"
+        )
+        row = self.db.cur.execute(query, (self.country_id, category_id)).fetchone()
+        return None if row is None else (row[0], bool(row[1]))
+
+    def complete_category(self, category_id: str):
+        """Mark all the pages of a category as crawled.
+
+        Args:
+            category_id (str): The id of the category.
+
+        """
+        self.db.cur.execute(
+            "UPDATE crawl_categories SET completed = 1 WHERE country_id = ? AND category_id = ?;",
+            (self.country_id, category_id),
+        )
+        self.db.cnx.commit()
+
+    def reset(self, category_id: str | None = None):
+        """Forget the crawled pages of a category, or of the whole country.
+
+        Args:
+            category_id (str | None, optional): The id of the category. Defaults to
+                None, which resets every category of the country.
+
+        """
+        condition, params = "country_id = ?", (self.country_id,)
+        if category_id is not None:
+            condition, params = "country_id = ? AND category_id = ?", (self.country_id, category_id)
+
+        self.db.cur.execute(f"DELETE FROM crawl_pages WHERE {condition};", params)
+        self.db.cur.execute(f"DELETE FROM crawl_categories WHERE {condition};", params)
+        self.db.cnx.commit()
+
+    def finish(self):
+        """Drop the pages of the country once its crawl has succeeded, so they
+        are neither kept twice in the database nor served to the next crawl."""
+        self.reset()
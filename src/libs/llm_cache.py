@@ -0,0 +1,151 @@
+"""Contains the persistent cache of the LLM results."""
+
+import hashlib
+import json
+import re
+import time
+from typing import Any
+
+from .utils import DatabaseHandler
+
+
+def normalize_input(llm_input: dict[str, Any]) -> str:
+    """Normalize the input of an LLM call so near-identical inputs share a key:
+    values are lowercased and their whitespace collapsed.
+
+    Args:
+    - llm_input (dict[str, Any]): The input of the prompt, e.g. title and description.
+
+    Returns:
+    - str: The normalized input as JSON.
+
+    """
+    return json.dumps(
+        {k: re.sub(r"\s+", " ", str(v)).strip().lower() for k, v in llm_input.items()},
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+
+
+class LLMResultCache:
+    """A class to cache the LLM results in SQLite, keyed by a hash of the model,
+    the prompt template, the LLM arguments and the normalized input."""
+
+    def __init__(self, db: DatabaseHandler, model: str, prompt_template: str, llm_args: dict):
+        """Initialize the LLMResultCache object and create its table.
+
+        Args:
+            db (DatabaseHandler): A connected database handler, e.g. of `meli.db`.
+            model (str): The name of the model.
+            prompt_template (str): The text of the prompt template.
+            llm_args (dict): The arguments of the LLM, e.g. the temperature.
+
+        """
+        self.db = db
+        self.fingerprint = hashlib.sha256(
+            json.dumps([model, prompt_template, llm_args], sort_keys=True, default=str).encode()
+        ).hexdigest()
+        self.hits = 0
+        self.misses = 0
+
+        self.db.cur.execute(
+            """CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                fingerprint TEXT NOT NULL,
+                result TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )"""
+        )
+        self.db.cur.execute(
+            "CREATE INDEX IF NOT EXISTS ix_llm_cache_fingerprint ON llm_cache (fingerprint);"
+        )
+        self.db.cnx.commit()
+
+    @property
+    def stats(self) -> dict[str, int]:
+        """Get the hits and misses of the cache.
+
+        Returns:
+            dict[str, int]: The hits and misses.
+
+        """
+        return {"hits": self.hits, "misses": self.misses}
+
+    def key(self, llm_input: dict[str, Any]) -> str:
+        """Get the key of an input.
+
+        Args:
+            llm_input (dict[str, Any]): The input of the prompt.
+
+        Returns:
+            str: The hash of the fingerprint and the normalized input.
+
+        """
+        return hashlib.sha256((self.fingerprint + normalize_input(llm_input)).encode()).hexdigest()
+
+    def get_many(self, llm_inputs: list[dict[str, Any]]) -> list[str | None]:
+        """Get the cached results of the inputs.
+
+        Args:
+            llm_inputs (list[dict[str, Any]]): The inputs of the prompt.
+
+        Returns:
+            list[str | None]: The result of each input, None if it is not cached.
+
+        """
+        keys = [self.key(llm_input) for llm_input in llm_inputs]
+        found = {}
+        for start in range(0, len(keys), 500):
+            chunk = keys[start : start + 500]
+            query = (
+                f"SELECT key, result FROM llm_cache WHERE key IN ({', '.join('?' * len(chunk))});"
+            )
+            found.update(self.db.cur.execute(query, chunk).fetchall())
+
+        results = [found.get(key) for key in keys]
+        self.hits += sum(result is not None for result in results)
+        self.misses += sum(result is None for result in results)
+        return results
+
+    def set_many(self, llm_inputs: list[dict[str, Any]], results: list[str]):
+        """Cache the results of the inputs.
+
+        Args:
+            llm_inputs (list[dict[str, Any]]): The inputs of the prompt.
+            results (list[str]): The result of each input.
+
+        """
+        now = time.time()
+        with self.db.cnx:
+            self.db.cur.executemany(
+                "INSERT OR REPLACE INTO llm_cache VALUES (?, ?, ?, ?);",
+                [
+                    (self.key(llm_input), self.fingerprint, result, now)
+                    for llm_input, result in zip(llm_inputs, results)
+                ],
+            )
+
+    def invalidate(self) -> int:
+        """Remove the cached results of the current model, prompt and arguments.
+
+        Returns:
+            int: The number of removed results.
+
+        """
+        with self.db.cnx:
+            return self.db.cur.execute(
+                "DELETE FROM llm_cache WHERE fingerprint = ?;", (self.fingerprint,)
+            ).rowcount
+
+    def invalidate_stale(self) -> int:
+        """Remove the cached results of any other model, prompt or arguments,
+        e.g. after the prompt has changed.
+
+        Returns:
+            int: The number of removed results.
+
+        """
+        with self.db.cnx:
+            return self.db.cur.execute(
+                "DELETE FROM llm_cache WHERE fingerprint != ?;", (self.fingerprint,)
+            ).rowcount
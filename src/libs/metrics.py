@@ -0,0 +1,248 @@
+"""Counters and latency histograms of the crawl, the database and the
+categorizer, kept in memory and exported in the Prometheus text format or as
+JSON."""
+
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Iterator
+
+# Upper bounds in seconds of the histogram buckets, from a cached response to a
+# slow LLM call.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Help text of the metrics recorded by the project, by name.
+METRIC_HELP = {
+    "meli_http_requests_total": "Responses of the MercadoLibre API by endpoint and status.",
+    "meli_http_request_seconds": "Latency of the MercadoLibre API until the headers.",
+    "meli_http_retries_total": "Requests to the MercadoLibre API retried, by reason.",
+    "meli_crawled_rows_total": "Products collected from the search pages.",
+    "db_write_rows_total": "Rows written by table and backend.",
+    "db_write_seconds": "Duration of the writes of a DataFrame.",
+    "categorizer_rows_total": "Categorized products by the source of their category.",
+    "categorizer_failed_rows_total": "Products left without a category, by error.",
+    "categorizer_packed_rows_total": "Products of packed LLM calls, packed or sent alone.",
+    "llm_requests_total": "Calls to the LLM by model and outcome.",
+    "llm_request_seconds": "Latency of the calls to the LLM.",
+    "llm_tokens_total": "Tokens of the LLM calls by kind, prompt or completion.",
+    "llm_pool_requests_total": "Calls routed by the LLM pool by backend and outcome.",
+    "pipeline_stage_rows_total": "Rows processed by each stage of the pipeline.",
+    "pipeline_stage_seconds": "Duration of the processing of a page by a stage.",
+}
+
+LabelKey = tuple[tuple[str, str], ...]
+
+
+def format_labels(labels: LabelKey, **extra: str) -> str:
+    """Format labels as a Prometheus label set.
+
+    Args:
+    - labels (LabelKey): The sorted label names and values.
+    - **extra (str): Labels appended after them, e.g. the `le` of a bucket.
+
+    Returns:
+    - str: The label set, e.g. `{endpoint="/sites",status="200"}`, or an empty
+      string without labels.
+
+    """
+    pairs = [*labels, *extra.items()]
+    if not pairs:
+        return ""
+    escaped = []
+    for name, value in pairs:
+        value = value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        escaped.append(f'{name}="{value}"')
+    return "{" + ",".join(escaped) + "}"
+
+
+def format_value(value: float) -> str:
+    """Format a sample value without losing precision, e.g. 1234567 or 0.0042.
+
+    Args:
+    - value (float): The value of a counter, bucket or sum.
+
+    Returns:
+    - str: The value, without decimals if it is integral.
+
+    """
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+class MetricsRegistry:
+    """A thread-safe registry of counters and histograms.
+
+    Recording is a dict lookup and an addition under a lock, cheap enough to
+    leave on in production. Disabling the registry makes it a no-op.
+
+    """
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS, enabled: bool = True):
+        """Initialize the MetricsRegistry object.
+
+        Args:
+            buckets (tuple[float, ...], optional): The upper bounds in seconds of
+                the histogram buckets. Defaults to DEFAULT_BUCKETS.
+            enabled (bool, optional): Whether to record the metrics. Defaults to
+                True.
+
+        """
+        self.buckets = tuple(sorted(buckets))
+        self.enabled = enabled
+        self.started_at = time.time()
+        self.counters: dict[str, dict[LabelKey, float]] = {}
+        self.histograms: dict[str, dict[LabelKey, list[float]]] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1.0, **labels: str | int) -> None:
+        """Add the value to a counter.
+
+        Args:
+            name (str): The name of the counter, ending in `_total`.
+            value (float, optional): The increment. Defaults to 1.0.
+            **labels (str | int): The labels of the series.
+
+        """
+        if not self.enabled:
+            return
+        key = tuple(sorted((k, str(v)) for k, v in labels.items()))
+        with self._lock:
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + value
+
+    def observe(self, name: str, seconds: float, **labels: str | int) -> None:
+        """Record a duration in a histogram.
+
+        Args:
+            name (str): The name of the histogram, ending in `_seconds`.
+            seconds (float): The duration.
+            **labels (str | int): The labels of the series.
+
+        """
+        if not self.enabled:
+            return
+        key = tuple(sorted((k, str(v)) for k, v in labels.items()))
+        with self._lock:
+            series = self.histograms.setdefault(name, {})
+            # Count of each bucket, the +Inf one last, followed by the sum.
+            values = series.get(key)
+            if values is None:
+                values = series[key] = [0.0] * (len(self.buckets) + 2)
+            values[bisect_left(self.buckets, seconds)] += 1
+            values[-1] += seconds
+
+    @contextmanager
+    def timer(self, name: str, **labels: str | int) -> Iterator[None]:
+        """Record the duration of the block in a histogram.
+
+        Args:
+            name (str): The name of the histogram.
+            **labels (str | int): The labels of the series.
+
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def reset(self) -> None:
+        """Remove every recorded series."""
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+            self.started_at = time.time()
+
+    def snapshot(self) -> dict:
+        """Get the recorded metrics as plain data.
+
+        Returns:
+            dict: The start time and uptime of the registry, the value of every
+                counter series, and the count, sum, mean and cumulative bucket
+                counts of every histogram series.
+
+        """
+        with self._lock:
+            counters = {
+                name: [{"labels": dict(key), "value": value} for key, value in series.items()]
+                for name, series in self.counters.items()
+            }
+            histograms = {}
+            for name, series in self.histograms.items():
+                histograms[name] = []
+                for key, values in series.items():
+                    cumulative, buckets = 0.0, {}
+                    for bound, count in zip([*self.buckets, "+Inf"], values[:-1]):
+                        cumulative += count
+                        buckets[str(bound)] = cumulative
+                    histograms[name].append(
+                        {
+                            "labels": dict(key),
+                            "count": cumulative,
+                            "sum": values[-1],
+                            "mean": values[-1] / cumulative if cumulative else 0.0,
+                            "buckets": buckets,
+                        }
+                    )
+
+        return {
+            "started_at": self.started_at,
+            "uptime_s": time.time() - self.started_at,
+            "counters": counters,
+            "histograms": histograms,
+        }
+
+    def to_prometheus(self) -> str:
+        """Get the recorded metrics in the Prometheus text exposition format.
+
+        Returns:
+            str: The metrics, with their HELP and TYPE lines.
+
+        """
+        snapshot = self.snapshot()
+        lines = []
+
+        for name, series in snapshot["counters"].items():
+            lines += [f"# HELP {name} {METRIC_HELP.get(name, name)}", f"# TYPE {name} counter"]
+            for s in series:
+                lines.append(
+                    f"{name}{format_labels(tuple(s['labels'].items()))} {format_value(s['value'])}"
+                )
+
+        for name, series in snapshot["histograms"].items():
+            lines += [f"# HELP {name} {METRIC_HELP.get(name, name)}", f"# TYPE {name} histogram"]
+            for s in series:
+                labels = tuple(s["labels"].items())
+                for bound, count in s["buckets"].items():
+                    lines.append(
+                        f"{name}_bucket{format_labels(labels, le=bound)} {format_value(count)}"
+                    )
+                lines.append(f"{name}_sum{format_labels(labels)} {format_value(s['sum'])}")
+                lines.append(f"{name}_count{format_labels(labels)} {format_value(s['count'])}")
+
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str) -> None:
+        """Write the recorded metrics to a file, atomically so a scraper or the
+        node exporter textfile collector never reads a partial file.
+
+        Args:
+            path (str): The file, in the Prometheus text format if it ends in
+                `.prom` or `.txt`, as JSON otherwise.
+
+        """
+        if path.endswith((".prom", ".txt")):
+            content = self.to_prometheus()
+        else:
+            content = json.dumps(self.snapshot(), indent=2)
+
+        temporary = f"{path}.tmp"
+        with open(temporary, "w") as file:
+            file.write(content)
+        os.replace(temporary, path)
+
+
+# Registry shared by the connectors, the database handlers and the categorizer.
+METRICS = MetricsRegistry()
@@ -0,0 +1,265 @@
+"""Contains the columnar storage of the tables in partitioned Parquet."""
+
+import os
+import re
+import time
+import uuid
+from datetime import date
+from typing import Any, Iterator, Self
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from .metrics import METRICS
+from .schemas import (
+    CATEGORIZED_COLUMNS,
+    CATEGORY_COLUMNS,
+    PRODUCT_COLUMNS,
+    arrow_schema,
+)
+
+PRODUCTS_SCHEMA = arrow_schema(PRODUCT_COLUMNS).append(pa.field("description", pa.string()))
+CATEGORIES_SCHEMA = arrow_schema(CATEGORY_COLUMNS)
+CATEGORIZED_SCHEMA = arrow_schema(CATEGORIZED_COLUMNS)
+
+# Dataset, partition columns and schema of the known tables, by regex over the
+# table name. The named groups of the regex are stored as partition columns, so
+# every `country_products_*` table lands in one dataset partitioned by country.
+PARQUET_TABLES = {
+    r"^country_products_(?P<country>.+)$": (
+        "country_products",
+        ["country", "crawl_date"],
+        PRODUCTS_SCHEMA,
+    ),
+    r"^categories_universe$": (
+        "categories_universe",
+        ["name_country", "crawl_date"],
+        CATEGORIES_SCHEMA,
+    ),
+    r"^categorized_products$": ("categorized_products", ["crawl_date"], CATEGORIZED_SCHEMA),
+}
+
+
+def parquet_table(table_name: str) -> tuple[str, dict[str, str], list[str], pa.Schema | None]:
+    """Get the dataset, fixed partition values, partition columns and schema of
+    a table from PARQUET_TABLES.
+
+    Args:
+    - table_name (str): The name of the table, e.g. "country_products_Colombia".
+
+    Returns:
+    - tuple[str, dict[str, str], list[str], pa.Schema | None]: The dataset name,
+      the partition values taken from the table name, the partition columns and
+      the schema. Unknown tables get their own dataset partitioned by date.
+
+    """
+    for pattern, (dataset, partitions, schema) in PARQUET_TABLES.items():
+        if match := re.search(pattern, table_name):
+            return dataset, match.groupdict(), partitions, schema
+    return table_name, {}, ["crawl_date"], None
+
+
+class ParquetStore:
+    """A class to store the tables as Parquet datasets, hive partitioned by
+    country and crawl date, with the same interface as DatabaseHandler to write
+    and read DataFrames."""
+
+    def __init__(self, root: str = "data", compression: str = "zstd"):
+        """Initialize the ParquetStore object.
+
+        Args:
+            root (str, optional): The directory of the datasets. Defaults to "data".
+            compression (str, optional): The Parquet compression codec. Defaults to
+                "zstd".
+
+        """
+        self.root = root
+        self.compression = compression
+
+    def __enter__(self) -> Self:
+        """Enter the runtime context, for symmetry with DatabaseHandler.
+
+        Returns:
+            Self: The ParquetStore object.
+
+        """
+        os.makedirs(self.root, exist_ok=True)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Exit the runtime context, there is no connection to close."""
+
+    def get_table_names(self) -> list[str]:
+        """Get the names of the datasets in the store.
+
+        Returns:
+            list[str]: The dataset names.
+
+        """
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(
+            name for name in os.listdir(self.root) if os.path.isdir(os.path.join(self.root, name))
+        )
+
+    def get_table_columns(self, table_name: str) -> list[str]:
+        """Get the column names of the specified table, partitions included.
+
+        Args:
+            table_name (str): The name of the table.
+
+        Returns:
+            list[str]: The column names.
+
+        """
+        return self.dataset(table_name).schema.names
+
+    def dataset(self, table_name: str) -> ds.Dataset:
+        """Get the Arrow dataset of the specified table.
+
+        Args:
+            table_name (str): The name of the table.
+
+        Returns:
+            ds.Dataset: The dataset, its partition columns are read from the paths.
+
+        """
+        dataset, _, partitions, _ = parquet_table(table_name)
+        path = os.path.join(self.root, dataset)
+        partitioning = ds.partitioning(
+            pa.schema([(column, pa.string()) for column in partitions]), flavor="hive"
+        )
+        return ds.dataset(path, format="parquet", partitioning=partitioning)
+
+    def write_dataframe(self, table_name: str, df: pd.DataFrame, append: bool = False) -> int:
+        """Write the DataFrame in the dataset of the table with its schema.
+
+        The rows get the partition values of the table name and today's crawl
+        date, unless they already have a `crawl_date` column. The partitions
+        written replace the existing ones, so writing the same country twice a
+        day keeps the last crawl.
+
+        Args:
+            table_name (str): The name of the table.
+            df (pd.DataFrame): The data to write, its index is not written.
+            append (bool, optional): Whether to add the rows to the partitions
+                instead of replacing them, e.g. to write a table chunk by chunk.
+                Defaults to False.
+
+        Returns:
+            int: The number of rows written.
+
+        """
+        start = time.perf_counter()
+        dataset, values, partitions, schema = parquet_table(table_name)
+        df = df.assign(**values)
+        if "crawl_date" not in df.columns:
+            df = df.assign(crawl_date=date.today().isoformat())
+
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        if schema is not None:
+            table = table.cast(
+                pa.schema(
+                    [
+                        schema.field(field.name) if field.name in schema.names else field
+                        for field in table.schema
+                    ]
+                )
+            )
+        for column in partitions:
+            index = table.schema.get_field_index(column)
+            table = table.set_column(index, column, table[column].cast(pa.string()))
+
+        ds.write_dataset(
+            table,
+            os.path.join(self.root, dataset),
+            format="parquet",
+            partitioning=partitions,
+            partitioning_flavor="hive",
+            basename_template=f"part-{uuid.uuid4().hex}-{{i}}.parquet",
+            existing_data_behavior="overwrite_or_ignore" if append else "delete_matching",
+            file_options=ds.ParquetFileFormat().make_write_options(compression=self.compression),
+        )
+
+        METRICS.inc("db_write_rows_total", table.num_rows, table=table_name, backend="parquet")
+        METRICS.observe(
+            "db_write_seconds", time.perf_counter() - start, table=table_name, backend="parquet"
+        )
+        return table.num_rows
+
+    def read_table(
+        self,
+        table_name: str,
+        columns: list[str] | None = None,
+        filters: "ds.Expression | list[tuple[str, str, Any]] | None" = None,
+    ) -> pd.DataFrame:
+        """Read the specified table, reading only the requested columns and
+        skipping the partitions and row groups the filters rule out.
+
+        Args:
+            table_name (str): The name of the table.
+            columns (list[str] | None, optional): The columns to read. Defaults to
+                None, which reads all of them.
+            filters (ds.Expression | list[tuple[str, str, Any]] | None, optional): The
+                predicate, as an Arrow expression or as `pd.read_parquet` tuples,
+                e.g. [("price", ">", 1000)]. Defaults to None.
+
+        Returns:
+            pd.DataFrame: The rows of the table.
+
+        """
+        return (
+            self.dataset(table_name)
+            .to_table(columns=columns, filter=self._filter(table_name, filters))
+            .to_pandas()
+        )
+
+    def iter_table_frames(
+        self,
+        table_name: str,
+        columns: list[str] | None = None,
+        chunk_size: int = 10_000,
+        filters: "ds.Expression | list[tuple[str, str, Any]] | None" = None,
+    ) -> Iterator[pd.DataFrame]:
+        """Iterate over the data of the specified table in DataFrame chunks.
+
+        Args:
+            table_name (str): The name of the table.
+            columns (list[str] | None, optional): The columns to read. Defaults to
+                None, which reads all of them.
+            chunk_size (int, optional): The maximum rows per chunk. Defaults to 10_000.
+            filters (ds.Expression | list[tuple[str, str, Any]] | None, optional): The
+                predicate, see `read_table`. Defaults to None.
+
+        Yields:
+            pd.DataFrame: The rows of a chunk.
+
+        """
+        for batch in self.dataset(table_name).to_batches(
+            columns=columns, filter=self._filter(table_name, filters), batch_size=chunk_size
+        ):
+            if batch.num_rows:
+                yield batch.to_pandas()
+
+    @staticmethod
+    def _filter(
+        table_name: str, filters: "ds.Expression | list[tuple[str, str, Any]] | None"
+    ) -> ds.Expression | None:
+        """Build the predicate of a read, restricted to the partition values of
+        the table name.
+
+        Args:
+            table_name (str): The name of the table.
+            filters (ds.Expression | list[tuple[str, str, Any]] | None): The predicate.
+
+        Returns:
+            ds.Expression | None: The predicate, None to read every row.
+
+        """
+        expression = pq.filters_to_expression(filters) if isinstance(filters, list) else filters
+        for column, value in parquet_table(table_name)[1].items():
+            condition = ds.field(column) == value
+            expression = condition if expression is None else expression & condition
+        return expression
@@ -0,0 +1,130 @@
+"""Contains the schemas of the tables, shared by the crawler and the storage.
+
+The Arrow types are written as aliases and resolved by `arrow_type`, so pyarrow
+is only imported when an Arrow schema is built and the SQLite crawler works
+without it.
+
+"""
+
+import importlib.util
+import re
+from functools import cache
+from typing import TYPE_CHECKING, Iterable
+
+import pandas as pd
+
+if TYPE_CHECKING:
+    import pyarrow as pa
+
+# Columns kept from each search result, with their pandas dtype and the alias of
+# their Arrow type. Every other field of the result is dropped as soon as its
+# page is parsed. The price stays float64: float32 changes the stored prices,
+# e.g. 1999.99 to 1999.98999 and 85000001 to 85000000.
+PRODUCT_COLUMNS: dict[str, tuple[str, str]] = {
+    "id": ("string[pyarrow]", "string"),
+    "title": ("string[pyarrow]", "string"),
+    "price": ("float64", "float64"),
+    "permalink": ("string[pyarrow]", "string"),
+    "condition": ("category", "dictionary<int8,string>"),
+    "available_quantity": ("Int32", "int32"),
+}
+
+CATEGORY_COLUMNS: dict[str, tuple[str, str]] = {
+    "id_cat": ("string[pyarrow]", "string"),
+    "name_cat": ("string[pyarrow]", "string"),
+    "cat_code": ("string[pyarrow]", "string"),
+    "id_country": ("string[pyarrow]", "string"),
+    "name_country": ("string[pyarrow]", "string"),
+    "default_currency_id": ("string[pyarrow]", "string"),
+}
+
+CATEGORIZED_COLUMNS: dict[str, tuple[str, str]] = {
+    "id": ("string[pyarrow]", "string"),
+    "title": ("string[pyarrow]", "string"),
+    "description": ("string[pyarrow]", "string"),
+    "category": ("category", "dictionary<int8,string>"),
+}
+
+
+def arrow_type(alias: str) -> "pa.DataType":
+    """Get the Arrow type of an alias of the schemas.
+
+    Args:
+    - alias (str): The alias, e.g. "float64" or "dictionary<int8,string>".
+
+    Returns:
+    - pa.DataType: The Arrow type.
+
+    """
+    import pyarrow as pa
+
+    if match := re.fullmatch(r"dictionary<(\w+),(\w+)>", alias):
+        return pa.dictionary(pa.type_for_alias(match[1]), pa.type_for_alias(match[2]))
+    return pa.type_for_alias(alias)
+
+
+@cache
+def pandas_dtype(dtype: str) -> str:
+    """Get the pandas dtype of the schemas, the Python backed strings when
+    pyarrow is not installed.
+
+    Args:
+    - dtype (str): The dtype, e.g. "string[pyarrow]".
+
+    Returns:
+    - str: The dtype to use.
+
+    """
+    if dtype == "string[pyarrow]" and importlib.util.find_spec("pyarrow") is None:
+        return "string"
+    return dtype
+
+
+def arrow_schema(columns: dict[str, tuple[str, str]]) -> "pa.Schema":
+    """Get the Arrow schema of the columns.
+
+    Args:
+    - columns (dict[str, tuple[str, str]]): The columns, e.g. PRODUCT_COLUMNS.
+
+    Returns:
+    - pa.Schema: The schema.
+
+    """
+    import pyarrow as pa
+
+    return pa.schema([(name, arrow_type(alias)) for name, (_, alias) in columns.items()])
+
+
+def project_records(records: Iterable[dict], columns: dict[str, tuple[str, str]]) -> list[dict]:
+    """Keep only the fields of the records that are columns of the schema.
+
+    Args:
+    - records (Iterable[dict]): Raw records, e.g. the results of a search page.
+    - columns (dict[str, tuple[str, str]]): The columns to keep.
+
+    Returns:
+    - list[dict]: The records with only the columns, None where a field is missing.
+
+    """
+    return [{name: record.get(name) for name in columns} for record in records]
+
+
+def typed_frame(records: Iterable[dict], columns: dict[str, tuple[str, str]]) -> pd.DataFrame:
+    """Build a DataFrame of the records with the dtypes of the schema, column by
+    column, without an intermediate object-dtype frame.
+
+    Args:
+    - records (Iterable[dict]): The records, extra fields are ignored.
+    - columns (dict[str, tuple[str, str]]): The columns and their dtypes.
+
+    Returns:
+    - pd.DataFrame: The typed records.
+
+    """
+    records = records if isinstance(records, list) else list(records)
+    return pd.DataFrame(
+        {
+            name: pd.Series([record.get(name) for record in records], dtype=pandas_dtype(dtype))
+            for name, (dtype, _) in columns.items()
+        }
+    )
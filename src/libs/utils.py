@@ -2,8 +2,17 @@
 
 import json
 import os
+import re
 import sqlite3
-from typing import Any, Self
+import time
+from itertools import chain, islice
+from typing import TYPE_CHECKING, Any, Iterable, Iterator, Literal, Self
+
+from .metrics import METRICS
+
+if TYPE_CHECKING:
+    import pandas as pd
+    import pyarrow as pa
 
 
 def sanitize_file_path(file_path: str) -> str:
@@ -64,12 +73,131 @@ def read_config_from_file(file_path: str) -> dict:
         )
 
 
+def materialize_batches(
+    batches: Iterable[list[dict]],
+    output: Literal["pandas", "arrow"] = "pandas",
+    columns: "dict[str, tuple[str, str]] | None" = None,
+) -> "pd.DataFrame | pa.Table":
+    """Materialize batches of raw records at once, instead of concatenating a
+    growing DataFrame batch after batch.
+
+    Args:
+    - batches (Iterable[list[dict]]): Batches of records, e.g. API result pages.
+    - output (Literal["pandas", "arrow"]): Whether to build a pandas DataFrame or
+      an Arrow table, whose record batches are available with `to_batches()`.
+    - columns (dict[str, tuple[str, str]] | None): The schema to project
+      each batch to as it is consumed, e.g. PRODUCT_COLUMNS, and to type the
+      result with. Defaults to None, which keeps every field as it comes.
+
+    Returns:
+    - pd.DataFrame | pa.Table: The records of all the batches.
+
+    Raises:
+    - ImportError: If output is "arrow" and pyarrow is not installed.
+
+    """
+    import pandas as pd
+
+    from .schemas import arrow_schema, project_records, typed_frame
+
+    if output == "arrow":
+        try:
+            import pyarrow as pa
+        except ImportError as e:
+            raise ImportError("pyarrow is required to materialize Arrow record batches.") from e
+
+        if columns is not None:
+            records = chain.from_iterable(project_records(batch, columns) for batch in batches)
+            return pa.Table.from_pylist(list(records), schema=arrow_schema(columns))
+        return pa.Table.from_pylist(list(chain.from_iterable(batches)))
+
+    if columns is not None:
+        records = chain.from_iterable(project_records(batch, columns) for batch in batches)
+        return typed_frame(list(records), columns)
+    return pd.DataFrame(list(chain.from_iterable(batches)))
+
+
+# Pragmas applied to every connection: WAL lets readers work while a bulk write
+# is in progress, NORMAL synchronous is durable enough under WAL, and the busy
+# timeout makes concurrent writers wait for the lock instead of failing.
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "busy_timeout": 60_000,
+    "synchronous": "NORMAL",
+    "cache_size": -64_000,
+    "temp_store": "MEMORY",
+}
+
+# Primary key and indexes created automatically for the known tables, by regex
+# over the table name.
+TABLE_KEYS = {
+    r"^country_products_": ("id", ["price", "condition"]),
+    r"^categories_universe$": ("id_cat", ["cat_code", "id_country"]),
+}
+
+
+def quote_identifier(name: str) -> str:
+    """Quote a table or column name to use it in a SQL statement.
+
+    Args:
+    - name (str): The table or column name, e.g. "country_products_Costa Rica".
+
+    Returns:
+    - str: The quoted name.
+
+    """
+    return '"' + name.replace('"', '""') + '"'
+
+
+def table_keys(table_name: str) -> tuple[str | None, list[str]]:
+    """Get the default primary key and indexes of a table from TABLE_KEYS.
+
+    Args:
+    - table_name (str): The name of the table.
+
+    Returns:
+    - tuple[str | None, list[str]]: The primary key and the indexed columns.
+
+    """
+    for pattern, (key, indexes) in TABLE_KEYS.items():
+        if re.search(pattern, table_name):
+            return key, indexes
+    return None, []
+
+
+def sql_type(dtype: Any) -> str:
+    """Get the SQLite column type of a pandas dtype.
+
+    Args:
+    - dtype (Any): The pandas dtype.
+
+    Returns:
+    - str: INTEGER, REAL or TEXT.
+
+    """
+    import pandas as pd
+
+    if pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_integer_dtype(dtype):
+        return "INTEGER"
+    if pd.api.types.is_float_dtype(dtype):
+        return "REAL"
+    return "TEXT"
+
+
 class DatabaseHandler:
     """A class to handle database operations."""
 
-    def __init__(self, db_name: str):
-        """Initialize the DatabaseHandler object."""
+    def __init__(self, db_name: str, pragmas: dict[str, Any] | None = None):
+        """Initialize the DatabaseHandler object.
+
+        Args:
+            db_name (str): The database file.
+            pragmas (dict[str, Any] | None, optional): The pragmas to apply on
+                connection. Defaults to SQLITE_PRAGMAS.
+
+        """
         self.db_name = db_name
+        self.pragmas = SQLITE_PRAGMAS if pragmas is None else pragmas
 
     def __enter__(self) -> Self:
         """Enter the context manager.
@@ -97,6 +225,9 @@ class DatabaseHandler:
         self.cnx = sqlite3.connect(self.db_name)
         self.cur = self.cnx.cursor()
 
+        for pragma, value in self.pragmas.items():
+            self.cur.execute(f"PRAGMA {pragma} = {value};")
+
     def get_table_names(self) -> list[Any]:
         """Get the names of the tables in the database.
 
@@ -117,7 +248,7 @@ class DatabaseHandler:
             list[Any]: The columns of the specified table.
 
         """
-        query = f"PRAGMA table_info({table_name});"
+        query = f"PRAGMA table_info({quote_identifier(table_name)});"
         return [column[1] for column in self.cur.execute(query).fetchall()]
 
     def get_table_data(self, table_name: str) -> list[Any]:
@@ -130,9 +261,264 @@ class DatabaseHandler:
             list[Any]: The data from the specified table.
 
         """
-        query = f"SELECT * FROM {table_name};"
+        query = f"SELECT * FROM {quote_identifier(table_name)};"
         return self.cur.execute(query).fetchall()
 
+    def iter_table_data(
+        self,
+        table_name: str,
+        columns: list[str] | None = None,
+        chunk_size: int = 10_000,
+        key: str | None = None,
+    ) -> Iterator[list[tuple]]:
+        """Iterate over the data of the specified table in chunks, without
+        loading the whole table in memory.
+
+        Every chunk is a keyset page, `WHERE key > last_key ORDER BY key`, so
+        reading a page does not scan the previous ones and no cursor is kept open
+        between chunks.
+
+        Args:
+            table_name (str): The name of the table.
+            columns (list[str] | None, optional): The columns to read. Defaults to
+                None, which reads all of them.
+            chunk_size (int, optional): The rows per chunk. Defaults to 10_000.
+            key (str | None, optional): The unique column to paginate on. Defaults
+                to the one of TABLE_KEYS matching the table name, or the rowid.
+
+        Yields:
+            list[tuple]: The rows of a chunk.
+
+        """
+        key = key or table_keys(table_name)[0] or "rowid"
+        columns = columns or self.get_table_columns(table_name)
+        names = [quote_identifier(column) for column in columns]
+
+        key_position = columns.index(key) if key in columns else len(columns)
+        if key_position == len(columns):
+            names.append(quote_identifier(key) if key != "rowid" else key)
+
+        select = f"SELECT {', '.join(names)} FROM {quote_identifier(table_name)}"
+        order = f"ORDER BY {names[key_position]} LIMIT ?"
+        cursor = self.cnx.cursor()
+        last_key = None
+
+        try:
+            while True:
+                if last_key is None:
+                    cursor.execute(f"{select} {order};", (chunk_size,))
+                else:
+                    cursor.execute(
+                        f"{select} WHERE {names[key_position]} > ? {order};",
+                        (last_key, chunk_size),
+                    )
+
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    return
+
+                last_key = rows[-1][key_position]
+                yield [row[: len(columns)] for row in rows]
+        finally:
+            cursor.close()
+
+    def iter_table_frames(
+        self,
+        table_name: str,
+        columns: list[str] | None = None,
+        chunk_size: int = 10_000,
+        key: str | None = None,
+    ) -> Iterator["pd.DataFrame"]:
+        """Iterate over the data of the specified table in DataFrame chunks, so
+        tables bigger than memory can be processed chunk by chunk.
+
+        Args:
+            table_name (str): The name of the table.
+            columns (list[str] | None, optional): The columns to read. Defaults to
+                None, which reads all of them.
+            chunk_size (int, optional): The rows per chunk. Defaults to 10_000.
+            key (str | None, optional): The unique column to paginate on. Defaults
+                to the one of TABLE_KEYS matching the table name, or the rowid.
+
+        Yields:
+            pd.DataFrame: The rows of a chunk.
+
+        """
+        import pandas as pd
+
+        columns = columns or self.get_table_columns(table_name)
+        for rows in self.iter_table_data(table_name, columns, chunk_size=chunk_size, key=key):
+            yield pd.DataFrame.from_records(rows, columns=columns)
+
+    def create_table(
+        self,
+        table_name: str,
+        columns: dict[str, str],
+        primary_key: str | None = None,
+        indexes: list[str] | None = None,
+    ):
+        """Create the table if it does not exist, or add the columns it is
+        missing, with a unique key and indexes.
+
+        When no primary key or indexes are given, the ones of TABLE_KEYS matching
+        the table name are used, e.g. `id` for the `country_products_*` tables.
+        An existing table without that key gets a unique index on it, after
+        dropping all but the last row of each repeated key.
+
+        Args:
+            table_name (str): The name of the table.
+            columns (dict[str, str]): The SQLite type of each column.
+            primary_key (str | None, optional): The unique key column. Defaults to None.
+            indexes (list[str] | None, optional): The indexed columns. Defaults to None.
+
+        """
+        default_key, default_indexes = table_keys(table_name)
+        primary_key = default_key if primary_key is None else primary_key
+        indexes = default_indexes if indexes is None else indexes
+
+        table = quote_identifier(table_name)
+        existing = self.get_table_columns(table_name)
+
+        if not existing:
+            definitions = [
+                f"{quote_identifier(column)} {column_type}"
+                + (" PRIMARY KEY" if column == primary_key else "")
+                for column, column_type in columns.items()
+            ]
+            self.cur.execute(f"CREATE TABLE {table} ({', '.join(definitions)});")
+        else:
+            for column, column_type in columns.items():
+                if column not in existing:
+                    self.cur.execute(
+                        f"ALTER TABLE {table} ADD COLUMN {quote_identifier(column)} {column_type};"
+                    )
+            primary_keys = [
+                column[1]
+                for column in self.cur.execute(f"PRAGMA table_info({table});").fetchall()
+                if column[5]
+            ]
+            unique_index = f"ux_{table_name}_{primary_key}"
+            has_unique_index = self.cur.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?;", (unique_index,)
+            ).fetchone()
+            if primary_key is not None and primary_keys != [primary_key] and not has_unique_index:
+                # A legacy table written by `to_sql` may repeat a key, only its last
+                # written row is kept, like `write_dataframe` does.
+                key = quote_identifier(primary_key)
+                self.cur.execute(
+                    f"DELETE FROM {table} WHERE {key} IS NOT NULL AND rowid NOT IN "
+                    f"(SELECT MAX(rowid) FROM {table} WHERE {key} IS NOT NULL GROUP BY {key});"
+                )
+                self.cur.execute(
+                    f"CREATE UNIQUE INDEX {quote_identifier(unique_index)} ON {table} ({key});"
+                )
+
+        for column in indexes:
+            if column in columns or column in existing:
+                self.cur.execute(
+                    f"CREATE INDEX IF NOT EXISTS {quote_identifier(f'ix_{table_name}_{column}')} "
+                    f"ON {table} ({quote_identifier(column)});"
+                )
+        self.cnx.commit()
+
+    def upsert_rows(
+        self,
+        table_name: str,
+        columns: list[str],
+        rows: Iterable[tuple],
+        key: str | None = "id",
+        batch_size: int = 50_000,
+    ) -> int:
+        """Insert the rows in the table, updating the ones whose key already
+        exists. Each batch is written with `executemany` in one transaction.
+
+        Args:
+            table_name (str): The name of the table.
+            columns (list[str]): The columns of the rows.
+            rows (Iterable[tuple]): The rows to write.
+            key (str | None, optional): The unique key column, None to insert the
+                rows without upsert. Defaults to "id".
+            batch_size (int, optional): The rows per transaction. Defaults to 50_000.
+
+        Returns:
+            int: The number of rows written.
+
+        """
+        names = ", ".join(quote_identifier(column) for column in columns)
+        query = (
+            f"INSERT INTO {quote_identifier(table_name)} ({names}) "
+            f"VALUES ({', '.join('?' * len(columns))})"
+        )
+        if key is not None:
+            updates = ", ".join(
+                f"{quote_identifier(column)} = excluded.{quote_identifier(column)}"
+                for column in columns
+                if column != key
+            )
+            query += f" ON CONFLICT({quote_identifier(key)}) DO " + (
+                f"UPDATE SET {updates}" if updates else "NOTHING"
+            )
+
+        written = 0
+        rows = iter(rows)
+        while batch := list(islice(rows, batch_size)):
+            with self.cnx:
+                self.cur.executemany(query, batch)
+            written += len(batch)
+
+        return written
+
+    def write_dataframe(
+        self,
+        table_name: str,
+        df: "pd.DataFrame",
+        key: str | None = None,
+        batch_size: int = 50_000,
+    ) -> int:
+        """Write the DataFrame in the table, creating it with its unique key and
+        indexes if needed, and upserting the rows on the key.
+
+        Args:
+            table_name (str): The name of the table.
+            df (pd.DataFrame): The data to write, its index is not written.
+            key (str | None, optional): The unique key column. Defaults to the one of
+                TABLE_KEYS matching the table name.
+            batch_size (int, optional): The rows per transaction. Defaults to 50_000.
+
+        Returns:
+            int: The number of rows written.
+
+        """
+        start = time.perf_counter()
+        key = table_keys(table_name)[0] if key is None else key
+        if key is not None:
+            df = df.drop_duplicates(subset=key, keep="last")
+
+        columns = [str(column) for column in df.columns]
+        self.create_table(
+            table_name, {c: sql_type(t) for c, t in zip(columns, df.dtypes)}, primary_key=key
+        )
+
+        values = df.astype(object).where(df.notna(), None)
+        for column in values.columns:
+            values[column] = values[column].map(
+                lambda v: json.dumps(v) if isinstance(v, (dict, list)) else v
+            )
+
+        written = self.upsert_rows(
+            table_name,
+            columns,
+            values.itertuples(index=False, name=None),
+            key=key,
+            batch_size=batch_size,
+        )
+
+        METRICS.inc("db_write_rows_total", written, table=table_name, backend="sqlite")
+        METRICS.observe(
+            "db_write_seconds", time.perf_counter() - start, table=table_name, backend="sqlite"
+        )
+        return written
+
     def close_connection(self):
         """Close the connection to the database and the cursor."""
         self.cur.close()
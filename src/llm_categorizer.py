@@ -1,20 +1,391 @@
 """ This script categorizes the products in the dataset 'meli_148.csv'
 into 3 categories: 'multiple_units', 'single_unit' or 'package'."""
 
+import json
+import re
+from itertools import islice
+from typing import Any, Iterable, Iterator, Literal
+
 import pandas as pd
-from dotenv import load_dotenv
+from langchain_core.exceptions import OutputParserException
 from langchain_core.language_models.chat_models import BaseChatModel
 from langchain_core.language_models.llms import BaseLLM
-from langchain_core.output_parsers import StrOutputParser
+from langchain_core.output_parsers import BaseOutputParser, StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import Runnable, RunnableConfig
+from loguru import logger
+
+from core import LLMConfigBuilder, ProductCategory, embeddings_retriever, llm_retriever
+from core.dedup import TitleDeduplicator, normalize_title
+from core.knn_classifier import KNNClassifier
+from core.rule_classifier import RuleClassifier
+from libs import DatabaseHandler, LLMResultCache, ParquetStore, read_config_from_file
+from libs.metrics import METRICS
+
+log = logger.opt(colors=True)
+
+CATEGORY_PROMPT = ChatPromptTemplate.from_messages(
+    [
+        (
+            "system",
+            "Usted es un sistema que analiza en español el título de una publicación de un producto que están en venta, y a partir de dicho título debe determinar si es un producto que se vende por unidad o en paquete o varias unidades. También puede ayudarse de la descripción para categorizar el producto. Please response ONLY with 3 of the following categories: 'multiple_units' if the product is sold in multiple units, 'single_unit' if the product is sold in a single unit, 'package' if the product is sold in a package.",
+        ),
+        ("user", "Titulo:{title} Descripción:{description}"),
+    ]
+)
+
+# Digit code of each category in the constrained output mode, one token in the
+# vocabularies of the supported models.
+CATEGORY_CODES = {
+    "1": ProductCategory.MULTIPLE_UNITS,
+    "2": ProductCategory.SINGLE_UNIT,
+    "3": ProductCategory.PACKAGE,
+}
+
+CONSTRAINED_CATEGORY_PROMPT = ChatPromptTemplate.from_messages(
+    [
+        (
+            "system",
+            "Usted es un sistema que analiza en español el título de una publicación de un "
+            "producto que están en venta, y a partir de dicho título debe determinar si es un "
+            "producto que se vende por unidad o en paquete o varias unidades. También puede "
+            "ayudarse de la descripción para categorizar el producto. Responda ÚNICAMENTE con "
+            "un dígito, sin explicaciones: 1 si el producto se vende en varias unidades, 2 si "
+            "se vende en una sola unidad, 3 si se vende en un paquete.",
+        ),
+        ("user", "Titulo:{title} Descripción:{description}"),
+    ]
+)
+
+
+class CategoryCodeParser(BaseOutputParser[ProductCategory]):
+    """This class parses the answer of the constrained output mode, the digit
+    code of a category, into the category."""
+
+    def parse(self, text: str) -> ProductCategory:
+        """This method returns the category of the first digit code of the
+        answer, or of the first category it names if it has no code.
+
+        Args:
+            text (str): The answer of the LLM.
+
+        Returns:
+            ProductCategory: The category.
+
+        Raises:
+            OutputParserException: If the answer has neither a code nor a category.
+
+        """
+        code = next((c for c in text if c in CATEGORY_CODES), None)
+        category = CATEGORY_CODES[code] if code is not None else ProductCategory.from_text(text)
+        if category is None:
+            raise OutputParserException(f"No category in the answer {text!r}", llm_output=text)
+        return category
+
+    @property
+    def _type(self) -> str:
+        """Property: This method returns the type of the parser."""
+        return "category_code"
+
+
+def category_prompt_and_parser(
+    output_mode: Literal["free", "constrained"] = "free",
+) -> tuple[ChatPromptTemplate, BaseOutputParser]:
+    """This function returns the prompt and the output parser of an output mode
+    of the LLM, see `LLMConfigBuilder.output_mode`.
+
+    Args:
+        output_mode (Literal["free", "constrained"], optional): The output mode.
+            Defaults to "free".
+
+    Returns:
+        tuple[ChatPromptTemplate, BaseOutputParser]: CATEGORY_PROMPT and a string
+            parser, or CONSTRAINED_CATEGORY_PROMPT and a CategoryCodeParser.
+
+    """
+    if output_mode == "constrained":
+        return CONSTRAINED_CATEGORY_PROMPT, CategoryCodeParser()
+    return CATEGORY_PROMPT, StrOutputParser()
+
+
+PACKED_CATEGORY_PROMPT = ChatPromptTemplate.from_messages(
+    [
+        (
+            "system",
+            "Usted es un sistema que analiza en español los títulos de varias publicaciones de "
+            "productos que están en venta, y para cada uno debe determinar si es un producto "
+            "que se vende por unidad o en paquete o varias unidades. También puede ayudarse de "
+            "la descripción para categorizar cada producto. Responda ÚNICAMENTE con un objeto "
+            "JSON que asigne al número de cada producto una de las categorías: "
+            "'multiple_units', 'single_unit' o 'package', por ejemplo "
+            '{{"1": "single_unit", "2": "package"}}.',
+        ),
+        ("user", "{products}"),
+    ]
+)
+
+# Tokens of the answer of each product of a pack, e.g. `"12": "multiple_units",`.
+_ANSWER_TOKENS = 8
+
+
+def check_packing(parser: BaseOutputParser | None, pack_size: int) -> None:
+    """This function rejects packing the products of the constrained output
+    mode, whose generation is capped to a single digit code by
+    CONSTRAINED_LLM_ARGS, so the answer of a pack is always cut short and every
+    product falls back to a call of its own.
+
+    Args:
+        parser (BaseOutputParser | None): The parser of the output of the LLM.
+        pack_size (int): The products sent per call to the LLM.
+
+    Raises:
+        ValueError: If the parser is the one of the constrained mode and pack_size
+            is more than 1.
+
+    """
+    if pack_size > 1 and isinstance(parser, CategoryCodeParser):
+        raise ValueError(
+            f"pack_size={pack_size} needs the free output mode, the constrained mode"
+            " caps each answer to one category code"
+        )
+
+
+def estimate_tokens(text: str) -> int:
+    """This function estimates the tokens of a text, about 4 characters per
+    token for the tokenizers of the supported models.
+
+    Args:
+        text (str): The text.
+
+    Returns:
+        int: The estimated number of tokens.
+
+    """
+    return len(text) // 4 + 1
+
+
+class PackedCategoryChain(Runnable[dict[str, str], ProductCategory | None]):
+    """This class categorizes several products per call to the LLM, so the
+    system prompt is processed once per pack instead of once per product.
+
+    The products of a pack are numbered in the prompt and the LLM answers a JSON
+    object with the category of each number. The products whose category is
+    missing or invalid in the answer are categorized one by one with the
+    fallback chain, whose answers are parsed the same way.
+
+    """
+
+    def __init__(
+        self,
+        llm: BaseLLM | BaseChatModel,
+        fallback: Runnable,
+        pack_size: int = 20,
+        token_budget: int = 1500,
+        description_chars: int = 200,
+    ):
+        """This method initializes the class.
+
+        Args:
+            llm (BaseLLM | BaseChatModel): The LLM to use.
+            fallback (Runnable): The chain of a single product, e.g.
+                `prompt | llm | parser`.
+            pack_size (int, optional): The maximum products per call. Defaults to 20.
+            token_budget (int, optional): The maximum estimated tokens of the
+                products of a pack and of their answers. Defaults to 1500.
+            description_chars (int, optional): The characters of the description
+                of each product in the prompt. Defaults to 200.
+
+        """
+        self.chain = PACKED_CATEGORY_PROMPT | llm | StrOutputParser()
+        self.fallback = fallback
+        self.pack_size = pack_size
+        self.token_budget = token_budget
+        self.description_chars = description_chars
+        self.calls = 0
+        self.packed = 0
+        self.fallbacks = 0
+
+    @property
+    def stats(self) -> dict[str, float]:
+        """Property: This method returns the packed calls, the products
+        categorized by them and by the fallback, and the products per call."""
+        per_call = self.packed / self.calls if self.calls else 0.0
+        return {
+            "calls": self.calls,
+            "packed": self.packed,
+            "fallbacks": self.fallbacks,
+            "products_per_call": round(per_call, 2),
+        }
+
+    def line(self, number: int, product: dict[str, str]) -> str:
+        """This method returns the line of a product in the prompt of a pack.
+
+        Args:
+            number (int): The number of the product in the pack, from 1.
+            product (dict[str, str]): The title and description of the product.
+
+        Returns:
+            str: The line, with the description truncated.
+
+        """
+        description = str(product.get("description") or "")[: self.description_chars]
+        return f"{number}. Titulo:{product['title']} Descripción:{description}"
+
+    def pack(self, products: list[dict[str, str]]) -> list[list[int]]:
+        """This method groups the products in packs of at most pack_size
+        products and token_budget estimated tokens.
+
+        Args:
+            products (list[dict[str, str]]): The title and description of each
+                product.
+
+        Returns:
+            list[list[int]]: The positions of the products of each pack.
+
+        """
+        packs, tokens = [[]], 0
+        for i, product in enumerate(products):
+            cost = estimate_tokens(self.line(len(packs[-1]) + 1, product)) + _ANSWER_TOKENS
+            if packs[-1] and (
+                len(packs[-1]) == self.pack_size or tokens + cost > self.token_budget
+            ):
+                packs.append([])
+                tokens = 0
+            packs[-1].append(i)
+            tokens += cost
+        return [pack for pack in packs if pack]
+
+    @staticmethod
+    def parse(answer: str, size: int) -> list[ProductCategory | None]:
+        """This method reads the categories of a pack from the answer of the
+        LLM.
+
+        Args:
+            answer (str): The answer, with a JSON object of the category of each
+                product number.
+            size (int): The number of products of the pack.
+
+        Returns:
+            list[ProductCategory | None]: The category of each product of the pack,
+                None if it is missing or invalid.
+
+        """
+        match = re.search(r"\{.*\}", answer, re.DOTALL)
+        try:
+            labels = json.loads(match.group()) if match else {}
+        except json.JSONDecodeError:
+            labels = {}
+        if not isinstance(labels, dict):
+            labels = {}
+        return [ProductCategory.from_text(str(labels.get(str(n), ""))) for n in range(1, size + 1)]
+
+    def invoke(
+        self, input: dict[str, str], config: RunnableConfig | None = None, **_
+    ) -> ProductCategory | None:
+        """This method categorizes a single product, in a pack of one.
 
-from core import LLMConfigBuilder, llm_retriever
+        Args:
+            input (dict[str, str]): The title and description of the product.
+            config (RunnableConfig | None, optional): The config of the run.
+                Defaults to None.
 
-load_dotenv()
+        Returns:
+            ProductCategory | None: The category of the product.
+
+        """
+        return self.batch([input], config)[0]
+
+    def batch(
+        self,
+        inputs: list[dict[str, str]],
+        config: RunnableConfig | None = None,
+        *,
+        return_exceptions: bool = False,
+        **_: Any,
+    ) -> list[ProductCategory | Exception | None]:
+        """This method categorizes the products pack by pack, sending the packs
+        to the LLM concurrently, and the products missing from the answers or of
+        a failed pack to the fallback chain.
+
+        The answers of the fallback are parsed like the packed ones, so every
+        product gets a ProductCategory, or None if the answer names none.
+
+        Args:
+            inputs (list[dict[str, str]]): The title and description of each
+                product.
+            config (RunnableConfig | None, optional): The config of the run, e.g.
+                with max_concurrency. Defaults to None.
+            return_exceptions (bool, optional): Whether to return the error of a
+                product whose fallback call failed instead of raising it. Defaults
+                to False.
+
+        Returns:
+            list[ProductCategory | Exception | None]: The category of each
+                product, in the same order.
+
+        """
+        inputs = list(inputs)
+        packs = self.pack(inputs)
+        answers = self.chain.batch(
+            [
+                {"products": "\n".join(self.line(n, inputs[i]) for n, i in enumerate(pack, 1))}
+                for pack in packs
+            ],
+            config=config,
+            return_exceptions=True,
+        )
+
+        results: list[ProductCategory | Exception | None] = [None] * len(inputs)
+        for pack, answer in zip(packs, answers):
+            if isinstance(answer, Exception):
+                continue
+            for i, category in zip(pack, self.parse(answer, len(pack))):
+                results[i] = category
+
+        missing = [i for i, result in enumerate(results) if result is None]
+        if missing:
+            fallbacks = self.fallback.batch(
+                [inputs[i] for i in missing], config=config, return_exceptions=return_exceptions
+            )
+            for i, answer in zip(missing, fallbacks):
+                if isinstance(answer, Exception):
+                    results[i] = answer
+                else:
+                    results[i] = ProductCategory.from_text(str(answer))
+
+        self.calls += len(packs)
+        self.packed += len(inputs) - len(missing)
+        self.fallbacks += len(missing)
+        METRICS.inc("categorizer_packed_rows_total", len(inputs) - len(missing), outcome="packed")
+        METRICS.inc("categorizer_packed_rows_total", len(missing), outcome="fallback")
+        return results
+
+
+def cache_prompt_template(prompt: ChatPromptTemplate, pack_size: int = 1) -> str:
+    """This function returns the text of the prompts the categories depend on,
+    for the fingerprint of the LLMResultCache, so the results of a packing are
+    not reused by another one.
+
+    Args:
+        prompt (ChatPromptTemplate): The prompt of a single product.
+        pack_size (int, optional): The products sent per call to the LLM.
+            Defaults to 1.
+
+    Returns:
+        str: The prompt, followed by the packed prompt and the pack size when
+            the products are packed.
+
+    """
+    if pack_size <= 1:
+        return prompt.pretty_repr()
+    return f"{prompt.pretty_repr()}\n{PACKED_CATEGORY_PROMPT.pretty_repr()}\npack_size={pack_size}"
 
 
 def invoke_llm_from_prompt(
-    llm: BaseLLM | BaseChatModel, prompt: ChatPromptTemplate, input: dict[str, str]
+    llm: BaseLLM | BaseChatModel,
+    prompt: ChatPromptTemplate,
+    input: dict[str, str],
+    parser: BaseOutputParser | None = None,
 ) -> str:
     """This function takes the input and the prompt, creates a chain with string
     parser for the output and returns the output from the LLM.
@@ -23,19 +394,25 @@ def invoke_llm_from_prompt(
         llm (BaseLLM | BaseChatModel): The LLM to invoke.
         prompt (ChatPromptTemplate): The prompt to use.
         input (dict[str, str]): The input to the LLM based on the prompt.
+        parser (BaseOutputParser | None, optional): The parser of the output.
+            Defaults to StrOutputParser().
 
     Returns:
         str: The output from the LLM.
 
     """
 
-    chain = prompt | llm | StrOutputParser()
+    chain = prompt | llm | (parser or StrOutputParser())
 
     return chain.invoke(input)
 
 
 def categorizer(
-    llm: BaseChatModel, prompt: ChatPromptTemplate, title: str, description: str
+    llm: BaseChatModel,
+    prompt: ChatPromptTemplate,
+    title: str,
+    description: str,
+    parser: BaseOutputParser | None = None,
 ) -> str:
     """This function takes the title and description of a product and returns
     the category of the product.
@@ -45,12 +422,235 @@ def categorizer(
         prompt (ChatPromptTemplate): The prompt to use.
         title (str): The title of the product.
         description (str): The description of the product.
+        parser (BaseOutputParser | None, optional): The parser of the output, e.g.
+            the one of `category_prompt_and_parser`. Defaults to StrOutputParser().
 
     Returns:
         str: The category of the product. It can be 'multiple_units', 'single_unit' or 'package'.
 
     """
-    return invoke_llm_from_prompt(llm, prompt, {"title": title, "description": description})
+    return invoke_llm_from_prompt(llm, prompt, {"title": title, "description": description}, parser)
+
+
+def batch_or_none(
+    chain: Runnable, products: list[dict[str, str]], config: RunnableConfig
+) -> list[Any]:
+    """This function invokes the chain on a batch of products concurrently,
+    returning None for the products whose call or answer failed, e.g. an answer
+    without a category, instead of aborting the whole batch.
+
+    Args:
+        chain (Runnable): The chain to invoke.
+        products (list[dict[str, str]]): The title and description of each product.
+        config (RunnableConfig): The config of the run, e.g. with max_concurrency.
+
+    Returns:
+        list[Any]: The output of the chain for each product, None if it failed.
+
+    """
+    outputs = chain.batch(products, config=config, return_exceptions=True)
+    errors = [output for output in outputs if isinstance(output, Exception)]
+    for error in errors:
+        METRICS.inc("categorizer_failed_rows_total", reason=type(error).__name__)
+    if errors:
+        log.warning(f"Could not categorize <r>{len(errors)}</r> products: {errors[0]!r}")
+    return [None if isinstance(output, Exception) else output for output in outputs]
+
+
+def invoke_chain_batch(
+    chain: Runnable,
+    products: list[dict[str, str]],
+    max_concurrency: int = 4,
+    cache: LLMResultCache | None = None,
+) -> list[str | None]:
+    """This function invokes the chain on a batch of products concurrently.
+    Products found in the cache, or repeated within the batch, are not sent to
+    the LLM, and the ones whose call or answer failed are categorized as None
+    and not cached.
+
+    Args:
+        chain (Runnable): The chain to invoke.
+        products (list[dict[str, str]]): The title and description of each product.
+        max_concurrency (int, optional): The maximum number of requests in flight to
+            the LLM. Defaults to 4.
+        cache (LLMResultCache | None, optional): The cache of the LLM results.
+            Defaults to None.
+
+    Returns:
+        list[str | None]: The output of the chain for each product, in the same
+            order.
+
+    """
+    config = {"max_concurrency": max_concurrency}
+    if cache is None:
+        METRICS.inc("categorizer_rows_total", len(products), source="llm")
+        return batch_or_none(chain, products, config) if products else []
+
+    results = cache.get_many(products)
+    pending = {cache.key(p): p for p, r in zip(products, results) if r is None}
+    METRICS.inc("categorizer_rows_total", len(pending), source="llm")
+    METRICS.inc("categorizer_rows_total", len(products) - len(pending), source="cache")
+    if pending:
+        answers = dict(zip(pending, batch_or_none(chain, list(pending.values()), config)))
+        answered = [(pending[key], answer) for key, answer in answers.items() if answer is not None]
+        cache.set_many([p for p, _ in answered], [answer for _, answer in answered])
+        results = [answers[cache.key(p)] if r is None else r for p, r in zip(products, results)]
+
+    return results
+
+
+def categorize_batches(
+    llm: BaseLLM | BaseChatModel,
+    prompt: ChatPromptTemplate,
+    products: Iterable[dict[str, str]],
+    max_concurrency: int = 4,
+    batch_size: int = 64,
+    cache: LLMResultCache | None = None,
+    pre_classifier: RuleClassifier | KNNClassifier | None = None,
+    deduplicator: TitleDeduplicator | None = None,
+    parser: BaseOutputParser | None = None,
+    pack_size: int = 1,
+) -> Iterator[str]:
+    """This function categorizes many products, building the chain once and
+    sending each batch of products to the LLM concurrently.
+
+    Args:
+        llm (BaseLLM | BaseChatModel): The LLM to use.
+        prompt (ChatPromptTemplate): The prompt to use.
+        products (Iterable[dict[str, str]]): The title and description of each product.
+        max_concurrency (int, optional): The maximum number of requests in flight to
+            the LLM. Defaults to 4.
+        batch_size (int, optional): The number of products sent per batch. Defaults to 64.
+        cache (LLMResultCache | None, optional): The cache of the LLM results.
+            Defaults to None.
+        pre_classifier (RuleClassifier | KNNClassifier | None, optional): The
+            classifier of the products it is confident about, which are not sent to
+            the LLM, e.g. the rules over the title or the labeled neighbours.
+            Defaults to None.
+        deduplicator (TitleDeduplicator | None, optional): The clustering of the
+            near-duplicate titles of each batch with the same description. Only one
+            product per cluster is categorized, and its category is given to the
+            rest. Defaults to None.
+        parser (BaseOutputParser | None, optional): The parser of the output of the
+            LLM. Defaults to StrOutputParser().
+        pack_size (int, optional): The products sent per call to the LLM with a
+            PackedCategoryChain, 1 sends one product per call with the prompt. Only
+            the free output mode can pack products. Defaults to 1.
+
+    Yields:
+        str | None: The category of each product, in the same order as the
+            products, None if the LLM did not answer one.
+
+    Raises:
+        ValueError: If the products are packed in the constrained output mode.
+
+    """
+    check_packing(parser, pack_size)
+    chain = prompt | llm | (parser or StrOutputParser())
+    if pack_size > 1:
+        chain = PackedCategoryChain(llm, chain, pack_size)
+    products = iter(products)
+
+    while batch := list(islice(products, batch_size)):
+        if deduplicator is not None:
+            # The LLM reads the description too, so only the listings with the same
+            # description share a category.
+            representatives, clusters = deduplicator.cluster(
+                [p["title"] for p in batch],
+                [normalize_title(p.get("description") or "") for p in batch],
+            )
+            METRICS.inc("categorizer_rows_total", len(batch) - len(representatives), source="dedup")
+            batch = [batch[i] for i in representatives]
+
+        results = (
+            [None] * len(batch) if pre_classifier is None else pre_classifier.predict_batch(batch)
+        )
+        pending = [i for i, result in enumerate(results) if result is None]
+        if pre_classifier is not None:
+            METRICS.inc(
+                "categorizer_rows_total",
+                len(batch) - len(pending),
+                source=type(pre_classifier).__name__,
+            )
+        answers = invoke_chain_batch(chain, [batch[i] for i in pending], max_concurrency, cache)
+        for i, answer in zip(pending, answers):
+            results[i] = answer
+
+        yield from results if deduplicator is None else (results[i] for i in clusters)
+
+
+def categorize_csv(
+    llm: BaseLLM | BaseChatModel,
+    prompt: ChatPromptTemplate,
+    input_path: str,
+    output_path: str,
+    max_concurrency: int = 4,
+    chunk_size: int = 64,
+    cache: LLMResultCache | None = None,
+    pre_classifier: RuleClassifier | KNNClassifier | None = None,
+    store: ParquetStore | None = None,
+    deduplicator: TitleDeduplicator | None = None,
+    parser: BaseOutputParser | None = None,
+    pack_size: int = 1,
+) -> int:
+    """This function categorizes the products of a ';' separated CSV with
+    'title' and 'description' columns, appending each categorized chunk to the
+    output CSV, or to the `categorized_products` table of the store, as soon as
+    it is ready.
+
+    Args:
+        llm (BaseLLM | BaseChatModel): The LLM to use.
+        prompt (ChatPromptTemplate): The prompt to use.
+        input_path (str): The path of the CSV to categorize.
+        output_path (str): The path of the categorized CSV.
+        max_concurrency (int, optional): The maximum number of requests in flight to
+            the LLM. Defaults to 4.
+        chunk_size (int, optional): The number of rows read, categorized and written
+            at once. Defaults to 64.
+        cache (LLMResultCache | None, optional): The cache of the LLM results.
+            Defaults to None.
+        pre_classifier (RuleClassifier | KNNClassifier | None, optional): The
+            classifier applied before the LLM. Defaults to None.
+        store (ParquetStore | None, optional): The Parquet store to write the
+            categorized chunks to instead of the output CSV. Defaults to None.
+        deduplicator (TitleDeduplicator | None, optional): The clustering of the
+            near-duplicate titles of each chunk. Defaults to None.
+        parser (BaseOutputParser | None, optional): The parser of the output of the
+            LLM. Defaults to StrOutputParser().
+        pack_size (int, optional): The products sent per call to the LLM.
+            Defaults to 1.
+
+    Returns:
+        int: The number of categorized rows.
+
+    """
+    written = 0
+
+    for chunk in pd.read_csv(input_path, sep=";", chunksize=chunk_size):
+        products = chunk[["title", "description"]].to_dict("records")
+        chunk["category"] = list(
+            categorize_batches(
+                llm,
+                prompt,
+                products,
+                max_concurrency,
+                chunk_size,
+                cache,
+                pre_classifier,
+                deduplicator,
+                parser,
+                pack_size,
+            )
+        )
+        if store is not None:
+            store.write_dataframe("categorized_products", chunk, append=bool(written))
+        else:
+            chunk.to_csv(
+                output_path, sep=";", index=False, mode="a" if written else "w", header=not written
+            )
+        written += len(chunk)
+
+    return written
 
 
 if __name__ == "__main__":
@@ -61,20 +661,55 @@ if __name__ == "__main__":
 
     llm = llm_retriever(config)
 
-    prompt = ChatPromptTemplate.from_messages(
-        [
-            (
-                "system",
-                "Usted es un sistema que analiza en español el título de una publicación de un producto que están en venta, y a partir de dicho título debe determinar si es un producto que se vende por unidad o en paquete o varias unidades. También puede ayudarse de la descripción para categorizar el producto. Please response ONLY with 3 of the following categories: 'multiple_units' if the product is sold in multiple units, 'single_unit' if the product is sold in a single unit, 'package' if the product is sold in a package.",
-            ),
-            ("user", "Titulo:{title} Descripción:{description}"),
-        ]
-    )
-
-    df = pd.read_csv("meli_148.csv", sep=";")
+    prompt, parser = category_prompt_and_parser(config.output_mode)
 
-    df["category"] = df.apply(
-        lambda x: categorizer(llm, prompt, x["title"], x["description"]), axis=1
+    storage_config = read_config_from_file("src/config.json")
+    store = (
+        ParquetStore(storage_config["parquet_root"])
+        if storage_config.get("storage") == "parquet"
+        else None
     )
 
-    df.to_csv("meli_148_categorized.csv", sep=";", index=False)
+    with DatabaseHandler("meli.db") as db:
+        deduplicator = TitleDeduplicator()
+        pack_size = storage_config.get("pack_size", 1)
+        check_packing(parser, pack_size)
+        cache = LLMResultCache(
+            db, config.model, cache_prompt_template(prompt, pack_size), config.llm_args
+        )
+        if config.engine == "knn":
+            # The seed needs products labeled apart from the ones being categorized,
+            # `meli_148_categorized.csv` holds the same products as `meli_148.csv`.
+            if "knn_labels" not in storage_config:
+                raise ValueError("The knn engine needs the labeled CSV of its seed, knn_labels")
+            pre_classifier = KNNClassifier.from_csv(
+                storage_config["knn_labels"],
+                exclude_path="meli_148.csv",
+                embeddings=embeddings_retriever(config),
+                **config.knn_args,
+            )
+        elif storage_config.get("rules", False):
+            # Opt-in, the rules agree with the LLM labels on 2 of 3 products.
+            pre_classifier = RuleClassifier()
+        else:
+            pre_classifier = None
+        categorize_csv(
+            llm,
+            prompt,
+            "meli_148.csv",
+            "meli_148_categorized.csv",
+            max_concurrency=4,
+            cache=cache,
+            pre_classifier=pre_classifier,
+            store=store,
+            deduplicator=deduplicator,
+            parser=parser,
+            pack_size=pack_size,
+        )
+        if pre_classifier is not None:
+            print(f"Pre-classifier: {pre_classifier.stats}")
+        print(f"LLM cache: {cache.stats}")
+        print(f"Near-duplicate listings: {deduplicator.stats}")
+
+    if storage_config.get("metrics_path"):
+        METRICS.write(storage_config["metrics_path"])
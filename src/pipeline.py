@@ -0,0 +1,329 @@
+"""This script crawls, describes, categorizes and stores the products of a
+country as a pipeline of concurrent stages connected by bounded queues, so the
+first products land in the database within seconds and the memory stays flat
+whatever the size of the catalog."""
+
+import argparse
+import asyncio
+import resource
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.language_models.llms import BaseLLM
+from langchain_core.output_parsers import BaseOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+
+from core import Country, LLMConfigBuilder, MercadoLibreItems, llm_retriever
+from core.dedup import TitleDeduplicator
+from core.http_cache import ResponseCache
+from core.http_client import MeliSession
+from core.rule_classifier import RuleClassifier
+from libs import METRICS, DatabaseHandler, LLMResultCache
+from libs.schemas import CATEGORIZED_COLUMNS, PRODUCT_COLUMNS, typed_frame
+from llm_categorizer import (
+    CATEGORY_PROMPT,
+    cache_prompt_template,
+    categorize_batches,
+    category_prompt_and_parser,
+    check_packing,
+)
+
+PIPELINE_COLUMNS = {
+    **PRODUCT_COLUMNS,
+    "description": CATEGORIZED_COLUMNS["description"],
+    "category": CATEGORIZED_COLUMNS["category"],
+}
+
+
+async def run_stage(
+    func: Callable[[Any], Awaitable[Any]],
+    inbox: asyncio.Queue,
+    outbox: asyncio.Queue | None,
+    workers: int = 1,
+) -> float:
+    """This function runs the workers of a stage until its inbox is closed,
+    putting every result in the outbox, and closes the outbox afterwards.
+
+    A queue is closed by putting None in it. The worker that reads it puts it
+    back so its siblings stop too. The rows and duration of every page are
+    recorded in the shared metrics, labeled with the name of the function.
+
+    Args:
+        func (Callable[[Any], Awaitable[Any]]): The work of the stage on an item.
+        inbox (asyncio.Queue): The queue of the items to process.
+        outbox (asyncio.Queue | None): The queue of the results, None for the last
+            stage.
+        workers (int, optional): The number of concurrent workers. Defaults to 1.
+
+    Returns:
+        float: The rows processed per second of work of the stage.
+
+    """
+    totals = {"rows": 0, "seconds": 0.0}
+
+    async def worker() -> None:
+        """This function processes items until the inbox is closed."""
+        while (item := await inbox.get()) is not None:
+            start = time.perf_counter()
+            result = await func(item)
+            seconds = time.perf_counter() - start
+            METRICS.observe("pipeline_stage_seconds", seconds, stage=func.__name__)
+            METRICS.inc("pipeline_stage_rows_total", len(item), stage=func.__name__)
+            totals["rows"] += len(item)
+            totals["seconds"] += seconds
+            if outbox is not None:
+                await outbox.put(result)
+        await inbox.put(None)
+
+    await asyncio.gather(*(worker() for _ in range(workers)))
+    if outbox is not None:
+        await outbox.put(None)
+    return round(totals["rows"] / totals["seconds"], 1) if totals["seconds"] else 0.0
+
+
+async def run_pipeline(
+    meli: MercadoLibreItems,
+    db: DatabaseHandler,
+    llm: BaseLLM | BaseChatModel | None = None,
+    limit: int = 1000,
+    queue_size: int = 4,
+    max_concurrency: int = 10,
+    description_workers: int = 2,
+    requests_per_second: float | None = None,
+    max_llm_concurrency: int = 4,
+    cache_db_name: str | None = None,
+    cache_fingerprint: tuple[str, dict] = ("", {}),
+    pre_classifier: RuleClassifier | None = None,
+    deduplicator: TitleDeduplicator | None = None,
+    prompt: ChatPromptTemplate = CATEGORY_PROMPT,
+    parser: BaseOutputParser | None = None,
+    pack_size: int = 1,
+) -> dict[str, Any]:
+    """This function runs the crawl of the country through the stages, each one
+    waiting when the queue of the next one is full.
+
+    1. The search pages, fetched `max_concurrency` at a time.
+    2. The descriptions of the products of each page, one request per item.
+    3. The categories, in a worker thread so the LLM does not block the crawl.
+    4. The upsert of each page in the `country_products_{country}` table.
+
+    Args:
+        meli (MercadoLibreItems): The connector of the country.
+        db (DatabaseHandler): A connected database handler, e.g. of `meli.db`.
+        llm (BaseLLM | BaseChatModel | None, optional): The LLM of the categories.
+            None skips the categorization. Defaults to None.
+        limit (int, optional): Number of products to retrieve per category.
+            Defaults to 1000.
+        queue_size (int, optional): The pages each queue holds. Defaults to 4.
+        max_concurrency (int, optional): Maximum search pages in flight. Defaults
+            to 10.
+        description_workers (int, optional): Pages whose descriptions are fetched
+            at the same time. Defaults to 2.
+        requests_per_second (float | None, optional): Requests per second allowed
+            per host to each call of the connector, on top of the rate of the
+            session the stages share. None only applies the rate of the session.
+            Defaults to None.
+        max_llm_concurrency (int, optional): Maximum requests in flight to the LLM.
+            Defaults to 4.
+        cache_db_name (str | None, optional): The database of the LLM cache, opened
+            in the categorization thread. None disables the cache. Defaults to None.
+        cache_fingerprint (tuple[str, dict], optional): The model and LLM arguments
+            of the cache. Defaults to ("", {}).
+        pre_classifier (RuleClassifier | None, optional): The classifier applied
+            before the LLM. Defaults to None.
+        deduplicator (TitleDeduplicator | None, optional): The clustering of the
+            near-duplicate titles of each page. Defaults to None.
+        prompt (ChatPromptTemplate, optional): The prompt of the categories.
+            Defaults to CATEGORY_PROMPT.
+        parser (BaseOutputParser | None, optional): The parser of the output of the
+            LLM. Defaults to StrOutputParser().
+        pack_size (int, optional): The products sent per call to the LLM, see
+            PackedCategoryChain. Only the free output mode can pack products.
+            Defaults to 1.
+
+    Returns:
+        dict[str, Any]: The pages and rows written, the seconds until the first
+            write and in total, the rows per second of work of each stage, and the
+            peak RSS.
+
+    Raises:
+        ValueError: If the products are packed in the constrained output mode.
+
+    """
+    if llm is not None:
+        check_packing(parser, pack_size)
+    start = time.perf_counter()
+    stats = {"pages": 0, "rows": 0, "first_write_s": None}
+    pages, described, categorized = (asyncio.Queue(maxsize=queue_size) for _ in range(3))
+    loop = asyncio.get_running_loop()
+    llm_thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix="categorizer")
+    cache: LLMResultCache | None = None
+
+    if llm is not None and cache_db_name is not None:
+        model, llm_args = cache_fingerprint
+
+        def open_cache() -> LLMResultCache:
+            """This function opens the LLM cache in the thread of the LLM."""
+            cache_db = DatabaseHandler(cache_db_name)
+            cache_db.connect_to_db()
+            return LLMResultCache(
+                cache_db, model, cache_prompt_template(prompt, pack_size), llm_args
+            )
+
+        cache = await loop.run_in_executor(llm_thread, open_cache)
+
+    async def crawl() -> float:
+        """This function puts the search pages in the first queue, and returns
+        the rows crawled per second."""
+        rows = 0
+        async for page in meli.aiter_country_products(
+            limit, max_concurrency=max_concurrency, requests_per_second=requests_per_second
+        ):
+            if page:
+                METRICS.inc("pipeline_stage_rows_total", len(page), stage="crawl")
+                rows += len(page)
+                await pages.put(page)
+        await pages.put(None)
+        return round(rows / (time.perf_counter() - start), 1)
+
+    async def describe(page: list[dict]) -> list[dict]:
+        """This function adds the plain text description to the products."""
+        descriptions, _ = await meli.aget_products_descriptions(
+            [product["id"] for product in page], requests_per_second=requests_per_second
+        )
+        for product, description in zip(page, descriptions):
+            product["description"] = (description or {}).get("plain_text")
+        return page
+
+    def categorize_page(page: list[dict]) -> list[dict]:
+        """This function adds the category to the products."""
+        categories = categorize_batches(
+            llm,
+            prompt,
+            page,
+            max_llm_concurrency,
+            len(page),
+            cache,
+            pre_classifier,
+            deduplicator,
+            parser,
+            pack_size,
+        )
+        for product, category in zip(page, categories):
+            product["category"] = category
+        return page
+
+    async def categorize(page: list[dict]) -> list[dict]:
+        """This function categorizes the page in the categorization thread."""
+        if llm is None:
+            return page
+        return await loop.run_in_executor(llm_thread, categorize_page, page)
+
+    async def write(page: list[dict]) -> None:
+        """This function upserts the page in the table of the country."""
+        db.write_dataframe(f"country_products_{meli.country}", typed_frame(page, PIPELINE_COLUMNS))
+        stats["pages"] += 1
+        stats["rows"] += len(page)
+        if stats["first_write_s"] is None:
+            stats["first_write_s"] = round(time.perf_counter() - start, 3)
+
+    try:
+        async with asyncio.TaskGroup() as stages:
+            throughputs = [
+                stages.create_task(crawl()),
+                stages.create_task(run_stage(describe, pages, described, description_workers)),
+                stages.create_task(run_stage(categorize, described, categorized)),
+                stages.create_task(run_stage(write, categorized, None)),
+            ]
+    finally:
+        if cache is not None:
+            await loop.run_in_executor(llm_thread, cache.db.close_connection)
+        llm_thread.shutdown()
+
+    stats["total_s"] = round(time.perf_counter() - start, 3)
+    stage_names = ("crawl", "describe", "categorize", "write")
+    stats["rows_per_s"] = {name: task.result() for name, task in zip(stage_names, throughputs)}
+    stats["peak_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    return stats
+
+
+async def main(args: argparse.Namespace) -> None:
+    """This function builds the connector and the LLM from the arguments and
+    runs the pipeline.
+
+    Args:
+        args (argparse.Namespace): The arguments of the script.
+
+    """
+    configs = [
+        LLMConfigBuilder(
+            family=args.family,
+            model=args.model,
+            ls_project_name="meli",
+            llm_args={"temperature": 0, **({"base_url": base_url} if base_url else {})},
+            output_mode=args.output_mode,
+        )
+        for base_url in args.base_url or [None]
+    ]
+    config = configs[0]
+    llm = None if args.skip_categories else llm_retriever(configs if len(configs) > 1 else config)
+    prompt, parser = category_prompt_and_parser(config.output_mode)
+
+    with ResponseCache() as cache:
+        async with MeliSession(
+            cache=cache, requests_per_second=args.requests_per_second
+        ) as session:
+            meli = MercadoLibreItems(Country(country=args.country), session=session)
+            with DatabaseHandler(args.db) as db:
+                stats = await run_pipeline(
+                    meli,
+                    db,
+                    llm,
+                    limit=args.limit,
+                    queue_size=args.queue_size,
+                    max_llm_concurrency=sum(config.max_concurrency for config in configs),
+                    cache_db_name=args.db,
+                    # The hosts of a pool answer alike, so they share the cache.
+                    cache_fingerprint=(
+                        config.model,
+                        {k: v for k, v in config.llm_args.items() if k != "base_url"},
+                    ),
+                    pre_classifier=RuleClassifier() if args.rules else None,
+                    deduplicator=TitleDeduplicator(),
+                    prompt=prompt,
+                    parser=parser,
+                    pack_size=args.pack_size,
+                )
+
+    print(f"Pipeline: {stats}")
+    if args.metrics:
+        METRICS.write(args.metrics)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--country", default="Colombia")
+    parser.add_argument("--db", default="meli.db")
+    parser.add_argument("--limit", type=int, default=1000)
+    parser.add_argument("--queue-size", type=int, default=4)
+    parser.add_argument("--requests-per-second", type=float, default=None)
+    parser.add_argument("--family", default="ollama_llms")
+    parser.add_argument("--model", default="phi3:14b")
+    parser.add_argument(
+        "--base-url",
+        action="append",
+        help="Host of the LLM, repeat it to spread the calls over a pool of hosts.",
+    )
+    parser.add_argument("--skip-categories", action="store_true")
+    parser.add_argument("--output-mode", choices=["free", "constrained"], default="free")
+    parser.add_argument("--pack-size", type=int, default=1, help="Products per LLM call.")
+    parser.add_argument(
+        "--rules",
+        action="store_true",
+        help="Categorize the titles that state their units with rules before the LLM.",
+    )
+    parser.add_argument("--metrics", help="File to write the metrics to, .prom or .json.")
+
+    asyncio.run(main(parser.parse_args()))
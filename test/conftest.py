@@ -0,0 +1,10 @@
+"""Configuration of the tests: the modules are imported from `src`, like the
+scripts run from it."""
+
+import sys
+from pathlib import Path
+
+SRC = Path(__file__).resolve().parents[1] / "src"
+DATA = Path(__file__).resolve().parents[1]
+
+sys.path.insert(0, str(SRC))
@@ -0,0 +1,115 @@
+"""Tests of the closure table of the category trees."""
+
+import asyncio
+
+import pytest
+
+from benchmarks.mock_api import MockCatalog, MockMeliAPI
+from core import MercadoLibreUniverse
+from core.http_client import MeliSession
+from libs import CategoryIndex, DatabaseHandler
+
+
+@pytest.fixture
+def index(tmp_path):
+    """An empty index in a connected database."""
+    with DatabaseHandler(str(tmp_path / "meli.db")) as db:
+        yield CategoryIndex(db)
+
+
+def tree(site_id: str, totals: dict[str, int] | None = None) -> dict[str, dict]:
+    """Return the nodes of a site with two top-level categories, the first one
+    with two children and a grandchild."""
+    parents = {"1000": None, "2000": None, "100001": "1000", "100002": "1000"}
+    parents["10000101"] = "100001"
+    totals = totals or {}
+    return {
+        f"{site_id}{code}": {
+            "parent_id": parent and f"{site_id}{parent}",
+            "name": f"Categoría {code}",
+            "total_items": totals.get(code, 10),
+        }
+        for code, parent in parents.items()
+    }
+
+
+def test_ancestors_and_descendants(index):
+    """The ancestors go from the top-level category down to the parent, and the
+    descendants level by level, up to the maximum depth."""
+    index.replace_site("MCO", tree("MCO"))
+
+    assert index.ancestors("MCO10000101") == ["MCO1000", "MCO100001"]
+    assert index.ancestors("MCO1000") == []
+    assert index.descendants("MCO1000") == ["MCO100001", "MCO100002", "MCO10000101"]
+    assert index.descendants("MCO1000", max_depth=1) == ["MCO100001", "MCO100002"]
+    assert index.leaves("MCO1000") == ["MCO10000101", "MCO100002"]
+    assert index.leaves("MCO2000") == ["MCO2000"]
+
+
+def test_equivalents_between_sites(index):
+    """A category maps to the category of each site with the same code."""
+    index.replace_site("MCO", tree("MCO"))
+    nodes = tree("MLA")
+    del nodes["MLA100002"]
+    index.replace_site("MLA", nodes)
+
+    assert index.equivalents("100001") == {"MCO": "MCO100001", "MLA": "MLA100001"}
+    assert index.equivalent("MCO100001", "MLA") == "MLA100001"
+    assert index.equivalent("MCO100002", "MLA") is None
+    assert index.descendants("MLA1000") == ["MLA100001", "MLA10000101"]
+
+
+def test_replace_only_changes_the_site(index):
+    """Storing the same tree again changes nothing, and a new tree replaces the
+    categories and the closure of its site only."""
+    index.replace_site("MCO", tree("MCO"))
+    index.replace_site("MLA", tree("MLA"))
+
+    assert index.replace_site("MCO", tree("MCO")) is False
+
+    nodes = tree("MCO", {"100002": 20})
+    del nodes["MCO10000101"]
+    assert index.replace_site("MCO", nodes) is True
+
+    assert index.get("MCO100002")["total_items"] == 20
+    assert index.get("MCO10000101") is None
+    assert index.descendants("MCO1000") == ["MCO100001", "MCO100002"]
+    assert index.descendants("MLA1000") == ["MLA100001", "MLA100002", "MLA10000101"]
+
+
+def test_kept_subtrees_are_not_removed(index):
+    """The indexed descendants of a kept category stay when it is stored without
+    them."""
+    index.replace_site("MCO", tree("MCO"))
+    nodes = tree("MCO", {"1000": 30})
+    del nodes["MCO10000101"]
+
+    assert index.replace_site("MCO", nodes, kept={"MCO100001"}) is True
+    assert index.ancestors("MCO10000101") == ["MCO1000", "MCO100001"]
+
+
+def test_refresh_only_walks_the_changed_branches(index):
+    """A crawl requests again only the categories whose listing count changed
+    since the indexed one, and keeps the subtrees of the others."""
+    api = MockMeliAPI(MockCatalog(categories=2, products_per_category=50, subcategories=3))
+    universe = MercadoLibreUniverse(
+        session=MeliSession(transport=api.transport(), async_transport=api.async_transport())
+    )
+
+    def crawl(**kwargs) -> dict[str, int]:
+        """Crawl the tree of Colombia into the index."""
+        return asyncio.run(universe.acrawl_category_tree(index, site_ids=["MCO"], **kwargs))
+
+    first = crawl()
+    assert first == {"sites": 1, "changed": 1, "requested": 8, "kept": 0, "failed": 0}
+    assert index.descendants("MCO1001") == ["MCO100100", "MCO100101", "MCO100102"]
+
+    index.db.cur.execute("UPDATE categories SET total_items = 0 WHERE category_id = 'MCO100001';")
+    api.requests = 0
+    second = crawl()
+
+    assert second == {"sites": 1, "changed": 1, "requested": 3, "kept": 5, "failed": 0}
+    assert api.requests == 1 + 3
+    assert index.get("MCO100001")["total_items"] == 50
+    assert crawl()["changed"] == 0
+    assert crawl(refresh=True)["requested"] == 8
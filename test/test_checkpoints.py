@@ -0,0 +1,127 @@
+"""Tests of the resumable country crawls against the mock API."""
+
+import json
+
+import httpx
+import pytest
+
+from benchmarks.mock_api import MockCatalog, MockMeliAPI
+from core import Country, MercadoLibreItems
+from libs import CrawlCheckpoint, DatabaseHandler
+from libs.schemas import PRODUCT_COLUMNS
+
+
+class FlakyAPI(MockMeliAPI):
+    """The mock API, counting the search requests and dropping the connection
+    after `fail_after` of them."""
+
+    fail_after: int | None = None
+    searches = 0
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        """Answer the request, or fail it once the searches run out."""
+        if request.url.path.endswith("/search"):
+            if self.fail_after is not None and self.searches >= self.fail_after:
+                raise httpx.ConnectError("connection reset")
+            self.searches += 1
+        return super().handle(request)
+
+
+@pytest.fixture
+def api() -> FlakyAPI:
+    """Two categories of three search pages each."""
+    return FlakyAPI(MockCatalog(categories=2, products_per_category=120))
+
+
+@pytest.fixture
+def db(tmp_path):
+    """A database for the checkpoint."""
+    with DatabaseHandler(str(tmp_path / "meli.db")) as db:
+        yield db
+
+
+def crawl(api: FlakyAPI, checkpoint: CrawlCheckpoint | None = None, refresh: bool = False):
+    """Crawl the country through the API and return the products and the search
+    requests made."""
+    meli = MercadoLibreItems(Country(country="Colombia"), transport=api.transport())
+    api.searches = 0
+    products = meli.gell_all_country_products(checkpoint=checkpoint, refresh=refresh)
+    return products, api.searches
+
+
+def interrupt(api: FlakyAPI, checkpoint: CrawlCheckpoint, searches: int = 4) -> None:
+    """Crawl until the connection drops after the searches, leaving the first
+    category complete and the first page of the second one."""
+    api.fail_after = searches
+    with pytest.raises(httpx.ConnectError):
+        crawl(api, checkpoint)
+    api.fail_after = None
+
+
+def rows(db: DatabaseHandler, table: str) -> int:
+    """Count the rows of a checkpoint table."""
+    return db.cur.execute(f"SELECT COUNT(*) FROM {table};").fetchone()[0]
+
+
+def test_resume_requests_only_missing_pages(api, db):
+    """A crawl resumed from the checkpoint requests the pages the interrupted
+    one did not get, and collects the same products as a fresh crawl."""
+    checkpoint = CrawlCheckpoint(db, "MCO")
+    interrupt(api, checkpoint)
+
+    resumed, searches = crawl(api, checkpoint)
+    fresh, _ = crawl(api)
+
+    assert searches == 2
+    assert resumed.equals(fresh)
+
+
+def test_checkpoint_keeps_only_stored_columns(api, db):
+    """The pages of the checkpoint only have the columns that are stored."""
+    interrupt(api, CrawlCheckpoint(db, "MCO"))
+
+    (results,) = db.cur.execute("SELECT results FROM crawl_pages LIMIT 1;").fetchone()
+
+    assert set(json.loads(results)[0]) == set(PRODUCT_COLUMNS)
+
+
+def test_finished_checkpoint_is_dropped(api, db):
+    """A crawl that succeeds drops its pages, so the next one requests every
+    page again."""
+    checkpoint = CrawlCheckpoint(db, "MCO")
+    _, first = crawl(api, checkpoint)
+
+    assert (rows(db, "crawl_pages"), rows(db, "crawl_categories")) == (0, 0)
+    assert crawl(api, checkpoint)[1] == first == 6
+
+
+def test_refresh_crawls_changed_categories_again(api, db):
+    """With refresh, a category the interrupted crawl completed is requested
+    again when its listing count has changed."""
+    checkpoint = CrawlCheckpoint(db, "MCO")
+    interrupt(api, checkpoint)
+    (category_id,) = db.cur.execute(
+        "SELECT category_id FROM crawl_categories WHERE completed = 1;"
+    ).fetchone()
+    api.catalog.products_per_category = 150
+
+    products, searches = crawl(api, checkpoint, refresh=True)
+
+    assert searches == 5
+    assert products["id"].str.startswith(category_id).sum() == 150
+
+
+def test_no_refresh_reuses_completed_categories(api, db):
+    """Without refresh, the categories the interrupted crawl completed are read
+    from the checkpoint."""
+    checkpoint = CrawlCheckpoint(db, "MCO")
+    interrupt(api, checkpoint)
+    (category_id,) = db.cur.execute(
+        "SELECT category_id FROM crawl_categories WHERE completed = 1;"
+    ).fetchone()
+    api.catalog.products_per_category = 150
+
+    products, searches = crawl(api, checkpoint)
+
+    assert searches == 2
+    assert products["id"].str.startswith(category_id).sum() == 120
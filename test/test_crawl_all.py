@@ -0,0 +1,93 @@
+"""Tests of the crawl of many countries against the mock API."""
+
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import pytest
+
+import crawl_all
+from benchmarks.mock_api import MockCatalog, MockMeliAPI
+from core import http_client
+from core.http_client import MeliSession
+from libs import DatabaseHandler
+
+
+@pytest.fixture
+def api(monkeypatch, tmp_path) -> MockMeliAPI:
+    """The mock API behind the sessions of the crawls, with the HTTP cache in a
+    temporary directory and the retries without waits."""
+
+    async def no_sleep(seconds: float) -> None:
+        """Skip the backoff of the retries."""
+
+    api = MockMeliAPI(MockCatalog(categories=2, products_per_category=120))
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(http_client.asyncio, "sleep", no_sleep)
+    monkeypatch.setattr(
+        crawl_all,
+        "MeliSession",
+        partial(MeliSession, transport=api.transport(), async_transport=api.async_transport()),
+    )
+    return api
+
+
+def test_summary_reports_the_traffic(api):
+    """The summary counts the requests sent to the API, the failed ones and the
+    bytes downloaded, besides the rows written."""
+    api.catalog.error_rate = 0.3
+
+    summary = crawl_all.crawl_country("Colombia", "meli.db", None, 1000)
+
+    assert summary["error"] is None
+    assert summary["rows"] == 240
+    assert summary["requests"] == api.requests
+    assert summary["errors"] == api.errors > 0
+    assert summary["bytes"] > 240 * 100
+
+
+def test_cached_responses_are_not_counted(api):
+    """A crawl served by the cache sends no requests."""
+    crawl_all.crawl_country("Colombia", "meli.db", None, 1000)
+    api.requests = 0
+
+    summary = crawl_all.crawl_country("Colombia", "meli.db", None, 1000)
+
+    assert summary["rows"] == 240
+    assert summary["requests"] == api.requests
+    assert summary["requests"] < 10
+
+
+def test_failed_crawl_keeps_its_traffic(api):
+    """A crawl stopped by an error reports it with the requests it sent."""
+    api.catalog.error_rate = 1.0
+
+    summary = crawl_all.crawl_country("Colombia", "meli.db", None, 1000)
+
+    assert "HTTPStatusError" in summary["error"]
+    assert summary["rows"] == 0
+    assert summary["requests"] > summary["errors"] > 0
+
+
+def test_countries_share_the_request_budget(api, monkeypatch):
+    """The budget is split between the workers, and every country is written and
+    summarized."""
+    rates = []
+
+    def session(**kwargs) -> MeliSession:
+        """Record the rate of the worker and build its session on the mock
+        API."""
+        rates.append(kwargs["requests_per_second"])
+        return MeliSession(
+            transport=api.transport(), async_transport=api.async_transport(), **kwargs
+        )
+
+    monkeypatch.setattr(crawl_all, "ProcessPoolExecutor", ThreadPoolExecutor)
+    monkeypatch.setattr(crawl_all, "MeliSession", session)
+
+    summary = crawl_all.crawl_countries(["Colombia", "Chile"], "meli.db", 2, 20.0)
+
+    assert rates == [10.0, 10.0]
+    assert summary["country"].tolist() == ["Colombia", "Chile"]
+    assert summary["rows"].tolist() == [240, 240]
+    with DatabaseHandler("meli.db") as db:
+        assert {"country_products_Colombia", "country_products_Chile"} <= set(db.get_table_names())
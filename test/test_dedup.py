@@ -0,0 +1,45 @@
+"""Tests of the near-duplicate clustering of the titles."""
+
+import pandas as pd
+from conftest import DATA
+
+from core import ProductCategory
+from core.dedup import TitleDeduplicator, normalize_title, title_numbers
+
+
+def test_title_numbers_reads_attached_units():
+    """The numbers of a title are found even when attached to a word."""
+    assert title_numbers("Paquete X 6unidades De 250ml") == (6, 250)
+
+
+def test_cluster_keeps_apart_different_unit_counts():
+    """Titles that only differ in a number are never clustered."""
+    titles = [
+        "Kit De 2 Llantas Rin 15 Para Carro",
+        "Kit De 4 Llantas Rin 15 Para Carro",
+        "Paquete 10 Unidades Tapabocas Desechables",
+        "Paquete 20 Unidades Tapabocas Desechables",
+        "Kit De 4 Llantas Rin 15 Para Carro.",
+    ]
+    _, clusters = TitleDeduplicator().cluster(titles)
+    assert len(set(clusters[:4])) == 4
+    assert clusters[1] == clusters[4]
+
+
+def test_cluster_keys_must_match():
+    """Equal titles with different keys are not clustered."""
+    _, clusters = TitleDeduplicator().cluster(["Taladro Percutor"] * 3, ["a", "b", "a"])
+    assert clusters.tolist() == [0, 1, 0]
+
+
+def test_no_cluster_of_meli_148_mixes_labels():
+    """The clusters of the labeled listings, keyed by description like the
+    categorizer does, hold a single category."""
+    df = pd.read_csv(DATA / "meli_148_categorized.csv", sep=";")
+    labels = df["category"].map(ProductCategory.from_text)
+    _, clusters = TitleDeduplicator().cluster(
+        df["title"], df["description"].fillna("").map(normalize_title)
+    )
+    assert clusters.max() + 1 < len(df)
+    mixed = labels.groupby(clusters).nunique()
+    assert (mixed <= 1).all(), df[pd.Series(clusters).isin(mixed[mixed > 1].index)]
@@ -0,0 +1,149 @@
+"""Tests of the persistent cache of the API responses with a mocked server."""
+
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from core import http_cache
+from core.http_cache import (
+    AsyncCachingTransport,
+    CachingTransport,
+    ResponseCache,
+    SQLiteCacheStore,
+)
+
+SEARCH_TTL = 15 * 60
+
+
+class Server:
+    """A server answering a version of its content with its ETag, and 304 to the
+    requests whose If-None-Match is the current ETag."""
+
+    def __init__(self):
+        """Start at the first version."""
+        self.version = 1
+        self.requests: list[httpx.Request] = []
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        """Answer the request with the current version."""
+        self.requests.append(request)
+        etag = f'"v{self.version}"'
+        if request.headers.get("If-None-Match") == etag:
+            return httpx.Response(304, headers={"ETag": etag})
+        return httpx.Response(200, headers={"ETag": etag}, json={"version": self.version})
+
+
+@pytest.fixture
+def clock(monkeypatch) -> SimpleNamespace:
+    """The time of the cache, moved forward by the tests."""
+    clock = SimpleNamespace(now=1_000_000.0)
+    monkeypatch.setattr(http_cache, "time", SimpleNamespace(time=lambda: clock.now))
+    return clock
+
+
+@pytest.fixture
+def server() -> Server:
+    """The mocked server."""
+    return Server()
+
+
+@pytest.fixture
+def cache(tmp_path, clock):
+    """A cache over a SQLite store."""
+    with ResponseCache(SQLiteCacheStore(str(tmp_path / "http_cache.db"))) as cache:
+        yield cache
+
+
+def client(cache: ResponseCache, server: Server) -> httpx.Client:
+    """Return a client whose requests go through the cache to the server."""
+    transport = CachingTransport(cache, httpx.MockTransport(server.handle))
+    return httpx.Client(base_url="https://api.test", transport=transport)
+
+
+def test_fresh_responses_are_served_from_the_store(cache, server):
+    """A response is served from the store until its TTL ends."""
+    with client(cache, server) as http:
+        first = http.get("/sites/MCO/search", params={"offset": 0}).json()
+        server.version = 2
+        second = http.get("/sites/MCO/search", params={"offset": 0}).json()
+        other = http.get("/sites/MCO/search", params={"offset": 50}).json()
+
+    assert first == second == {"version": 1}
+    assert other == {"version": 2}
+    assert len(server.requests) == 2
+    assert cache.stats == {"hits": 1, "misses": 2, "revalidations": 0, "evictions": 0}
+
+
+def test_expired_response_is_revalidated_with_its_etag(cache, server, clock):
+    """An expired response is requested again with its ETag, and a 304 serves
+    the stored content and makes it fresh again."""
+    with client(cache, server) as http:
+        http.get("/sites/MCO/search")
+        clock.now += SEARCH_TTL + 1
+        revalidated = http.get("/sites/MCO/search")
+        cached = http.get("/sites/MCO/search")
+
+    assert server.requests[1].headers["If-None-Match"] == '"v1"'
+    assert revalidated.status_code == 200
+    assert revalidated.json() == cached.json() == {"version": 1}
+    assert len(server.requests) == 2
+    assert cache.revalidations == 1
+
+
+def test_changed_response_replaces_the_stored_one(cache, server, clock):
+    """An expired response whose ETag has changed is replaced by the new one."""
+    with client(cache, server) as http:
+        http.get("/sites/MCO/search")
+        server.version = 2
+        clock.now += SEARCH_TTL + 1
+        changed = http.get("/sites/MCO/search").json()
+        cached = http.get("/sites/MCO/search").json()
+
+    assert changed == cached == {"version": 2}
+    assert len(server.requests) == 2
+    assert cache.stats["misses"] == 2
+
+
+def test_uncached_requests_go_to_the_server(cache, server):
+    """The paths without a TTL and the requests other than GET are not
+    cached."""
+    with client(cache, server) as http:
+        for _ in range(2):
+            http.get("/users/me")
+            http.post("/sites/MCO/search")
+
+    assert len(server.requests) == 4
+    assert cache.stats["hits"] == cache.stats["misses"] == 0
+
+
+def test_old_entries_are_evicted_when_opened(tmp_path, server, clock):
+    """Opening the cache evicts the entries expired for longer than they are
+    kept, and keeps the ones that can still be revalidated."""
+    path = str(tmp_path / "http_cache.db")
+    with ResponseCache(SQLiteCacheStore(path)) as cache, client(cache, server) as http:
+        http.get("/sites/MCO/search")
+        clock.now += 3600
+        http.get("/sites/MCO/categories")
+
+    clock.now += 24 * 3600 + SEARCH_TTL
+    with ResponseCache(SQLiteCacheStore(path), keep_expired_s=3600) as cache:
+        assert cache.evictions == 1
+        assert cache.store.get("https://api.test/sites/MCO/search") is None
+        assert cache.store.get("https://api.test/sites/MCO/categories") is not None
+
+
+def test_async_transport_shares_the_store(cache, server):
+    """The async transport serves the responses stored by the sync one."""
+    with client(cache, server) as http:
+        http.get("/sites/MCO/search")
+
+    async def get() -> dict:
+        """Request the search through the async transport."""
+        transport = AsyncCachingTransport(cache, httpx.MockTransport(server.handle))
+        async with httpx.AsyncClient(base_url="https://api.test", transport=transport) as http:
+            return (await http.get("/sites/MCO/search")).json()
+
+    assert asyncio.run(get()) == {"version": 1}
+    assert len(server.requests) == 1
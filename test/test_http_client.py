@@ -0,0 +1,195 @@
+"""Tests of the HTTP layer of the connectors with mocked transports."""
+
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from core import http_client
+from core.http_client import HostRateLimiter, MeliSession, RetryPolicy, fetch_json
+
+NO_WAIT = RetryPolicy(max_retries=2, backoff_factor=0)
+
+
+def scripted_transport(responses: list, calls: list[httpx.Request]) -> httpx.MockTransport:
+    """Return a transport answering the requests with the responses in order,
+    raising the ones that are exceptions, and recording the requests."""
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        """Answer the next response of the script."""
+        calls.append(request)
+        response = responses[min(len(calls), len(responses)) - 1]
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    return httpx.MockTransport(handler)
+
+
+def fetch(transport: httpx.MockTransport, retry: RetryPolicy = NO_WAIT):
+    """Fetch the search of a site through a session using the transport."""
+
+    async def run():
+        """Fetch inside the async session."""
+        async with MeliSession(async_transport=transport) as session:
+            async with session.async_client() as client:
+                return await fetch_json(
+                    client, "sites/MCO/search", asyncio.Semaphore(4), HostRateLimiter(), retry
+                )
+
+    return asyncio.run(run())
+
+
+def test_retries_server_and_transport_errors():
+    """The retryable statuses and the transport errors are sent again until a
+    response succeeds."""
+    calls = []
+    transport = scripted_transport(
+        [
+            httpx.Response(503),
+            httpx.ConnectError("connection refused"),
+            httpx.Response(200, json={"results": []}),
+        ],
+        calls,
+    )
+
+    assert fetch(transport) == {"results": []}
+    assert len(calls) == 3
+
+
+def test_gives_up_after_max_retries():
+    """A request still failing after the retries raises its last status."""
+    calls = []
+    transport = scripted_transport([httpx.Response(500)], calls)
+
+    with pytest.raises(httpx.HTTPStatusError):
+        fetch(transport)
+    assert len(calls) == NO_WAIT.max_retries + 1
+
+
+def test_client_errors_are_not_retried():
+    """A status out of the retry statuses raises at once."""
+    calls = []
+    transport = scripted_transport([httpx.Response(404)], calls)
+
+    with pytest.raises(httpx.HTTPStatusError):
+        fetch(transport)
+    assert len(calls) == 1
+
+
+def test_429_waits_for_retry_after(monkeypatch):
+    """A 429 waits the seconds of its Retry-After header, bounded by the maximum
+    backoff, before the next attempt."""
+    sleeps = []
+
+    async def fake_sleep(seconds: float) -> None:
+        """Record the wait instead of sleeping."""
+        sleeps.append(seconds)
+
+    monkeypatch.setattr(http_client.asyncio, "sleep", fake_sleep)
+    calls = []
+    transport = scripted_transport(
+        [
+            httpx.Response(429, headers={"Retry-After": "7"}),
+            httpx.Response(429, headers={"Retry-After": "120"}),
+            httpx.Response(200, json={}),
+        ],
+        calls,
+    )
+
+    assert fetch(transport, RetryPolicy(max_retries=2, max_backoff=30)) == {}
+    assert sleeps == [7.0, 30.0]
+
+
+def test_backoff_is_exponential_and_bounded():
+    """Without Retry-After the delay doubles per attempt, up to the maximum."""
+    retry = RetryPolicy(backoff_factor=1, max_backoff=10)
+
+    assert 1 <= retry.backoff(0) <= 2
+    assert 4 <= retry.backoff(2) <= 5
+    assert retry.backoff(8) == 10
+
+
+def test_rate_limit_applies_per_host():
+    """The requests to a host are spaced by the rate, while the requests to
+    another host are not delayed by them."""
+    sent: dict[str, list[float]] = {}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        """Record the time each host receives a request."""
+        sent.setdefault(request.url.host, []).append(time.monotonic())
+        return httpx.Response(200, json={})
+
+    async def run():
+        """Send five requests to each of two hosts at the same time."""
+        semaphore, limiter = asyncio.Semaphore(10), HostRateLimiter(20)
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            await asyncio.gather(
+                *(
+                    fetch_json(client, f"https://{host}/items", semaphore, limiter, NO_WAIT)
+                    for host in ("a.test", "b.test")
+                    for _ in range(5)
+                )
+            )
+
+    start = time.monotonic()
+    asyncio.run(run())
+    elapsed = time.monotonic() - start
+
+    assert sorted(sent) == ["a.test", "b.test"]
+    for times in sent.values():
+        assert len(times) == 5
+        assert min(b - a for a, b in zip(times, times[1:])) >= 0.045
+    assert elapsed < 0.4
+
+
+def test_session_records_latency_by_endpoint():
+    """The session records the latency of its requests with the ids of the path
+    replaced."""
+    transport = httpx.MockTransport(lambda request: httpx.Response(200, json={}))
+
+    with MeliSession(transport=transport) as session:
+        session.client.get("sites/MCO/search").raise_for_status()
+        session.client.get("sites/MLA/search").raise_for_status()
+
+        assert session.latency.summary()["/sites/{id}/search"]["count"] == 2
+
+
+def test_session_rate_limiter_is_shared_across_runs():
+    """The connectors of a session share its limiter, and its buckets carry over
+    to the next event loop instead of starting full again."""
+    session = MeliSession(requests_per_second=10)
+    limiter = session.shared_rate_limiter()
+    assert session.shared_rate_limiter() is limiter
+
+    async def burst(requests: int) -> None:
+        """Acquire a request slot for the same host several times."""
+        for _ in range(requests):
+            await limiter.acquire("api.test")
+
+    asyncio.run(burst(1))
+    start = time.monotonic()
+    asyncio.run(burst(2))
+
+    assert time.monotonic() - start >= 0.09
+
+
+def test_rate_of_a_call_does_not_change_the_session():
+    """A rate given to a call only limits that call, on top of the rate of the
+    session, which keeps its own."""
+    session = MeliSession(requests_per_second=100)
+    slow = session.shared_rate_limiter(10)
+
+    async def burst(limiter: HostRateLimiter, requests: int) -> float:
+        """Acquire a request slot for the same host several times, and return
+        the seconds it takes."""
+        start = time.monotonic()
+        for _ in range(requests):
+            await limiter.acquire("api.test")
+        return time.monotonic() - start
+
+    assert slow is not session.rate_limiter
+    assert session.rate_limiter.requests_per_second == 100
+    assert asyncio.run(burst(slow, 3)) >= 0.19
+    assert asyncio.run(burst(session.shared_rate_limiter(), 3)) < 0.1
@@ -0,0 +1,45 @@
+"""Tests of the seeding of the k-NN classifier."""
+
+import numpy as np
+import pandas as pd
+import pytest
+from conftest import DATA
+
+from core import ProductCategory
+from core.knn_classifier import KNNClassifier, VectorIndex
+
+
+def test_seed_leaves_out_the_products_to_classify(tmp_path):
+    """The products of the excluded CSV are not indexed, so they are not their
+    own neighbours."""
+    labels = pd.read_csv(DATA / "meli_148_categorized.csv", sep=";")
+    to_classify = tmp_path / "products.csv"
+    labels.head(100).drop(columns="category").to_csv(to_classify, sep=";", index=False)
+
+    labels_path = DATA / "meli_148_categorized.csv"
+    seeded = KNNClassifier.from_csv(labels_path)
+    held_out = KNNClassifier.from_csv(labels_path, to_classify)
+
+    assert len(held_out.index) == len(seeded.index) - 100
+
+
+def test_empty_seed_raises():
+    """A seed without products left, e.g. the labels of the products to
+    classify, raises instead of deferring every product."""
+    with pytest.raises(ValueError, match="No labeled product"):
+        KNNClassifier.from_csv(DATA / "meli_148_categorized.csv", DATA / "meli_148.csv")
+
+
+def test_adds_are_incremental():
+    """Adding the vectors in several calls indexes the same vectors as adding
+    them at once."""
+    vectors = np.random.default_rng(0).normal(size=(50, 8))
+    labels = [ProductCategory.SINGLE_UNIT] * 50
+    once, chunked = VectorIndex(), VectorIndex()
+    once.add(vectors, labels)
+    for start in range(0, 50, 7):
+        chunked.add(vectors[start : start + 7], labels[start : start + 7])
+
+    assert len(chunked) == 50
+    assert np.array_equal(chunked.vectors, once.vectors)
+    assert np.array_equal(chunked.search(vectors, 3)[0], once.search(vectors, 3)[0])
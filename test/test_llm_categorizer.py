@@ -0,0 +1,96 @@
+"""Tests of the categorizer chains with a fake chat model."""
+
+import asyncio
+
+import pytest
+
+pytest.importorskip("langchain_core")
+
+from langchain_core.language_models.chat_models import SimpleChatModel
+from langchain_core.output_parsers import StrOutputParser
+
+from core import ProductCategory
+from llm_categorizer import (
+    CATEGORY_PROMPT,
+    PackedCategoryChain,
+    cache_prompt_template,
+    categorize_batches,
+    category_prompt_and_parser,
+)
+from pipeline import run_pipeline
+
+
+class ScriptedChatModel(SimpleChatModel):
+    """A chat model answering from the title of the product: "2" for the
+    titles with "ok", text without a code for the ones with "bad", and an
+    error for the ones with "down"."""
+
+    def _call(self, messages, stop=None, run_manager=None, **kwargs) -> str:
+        """Answer the last message of the prompt."""
+        text = messages[-1].content
+        if "down" in text:
+            raise ConnectionError("backend down")
+        return "no sé" if "bad" in text else "2"
+
+    @property
+    def _llm_type(self) -> str:
+        """The type of the model."""
+        return "scripted"
+
+
+def test_constrained_batch_survives_unreadable_answers():
+    """An unreadable answer or a failed call leaves its product without a
+    category instead of aborting the batch."""
+    prompt, parser = category_prompt_and_parser("constrained")
+    products = [{"title": title, "description": ""} for title in ("ok", "bad", "down", "ok")]
+
+    categories = list(
+        categorize_batches(ScriptedChatModel(), prompt, products, 2, 4, parser=parser)
+    )
+
+    assert categories == [ProductCategory.SINGLE_UNIT, None, None, ProductCategory.SINGLE_UNIT]
+
+
+class UnpackedChatModel(SimpleChatModel):
+    """A chat model that never answers the JSON of a pack, so every product
+    falls back to the single product chain."""
+
+    def _call(self, messages, stop=None, run_manager=None, **kwargs) -> str:
+        """Answer the category in free text."""
+        return "It is a single unit"
+
+    @property
+    def _llm_type(self) -> str:
+        """The type of the model."""
+        return "unpacked"
+
+
+def test_packed_fallback_answers_are_parsed():
+    """The products categorized by the fallback get a ProductCategory, like the
+    packed ones, instead of the raw answer."""
+    llm = UnpackedChatModel()
+    chain = PackedCategoryChain(llm, CATEGORY_PROMPT | llm | StrOutputParser(), pack_size=3)
+    products = [{"title": f"Producto {i}", "description": ""} for i in range(4)]
+
+    assert chain.batch(products) == [ProductCategory.SINGLE_UNIT] * 4
+    assert chain.stats["fallbacks"] == 4
+
+
+def test_cache_prompt_depends_on_packing():
+    """The results cached under a packing are not reused under another."""
+    prompts = {cache_prompt_template(CATEGORY_PROMPT, size) for size in (1, 2, 20)}
+
+    assert len(prompts) == 3
+    assert cache_prompt_template(CATEGORY_PROMPT) == CATEGORY_PROMPT.pretty_repr()
+
+
+def test_constrained_mode_cannot_pack():
+    """Packing the products of the constrained output mode, whose answers are
+    capped to one code, raises instead of falling back product by product."""
+    prompt, parser = category_prompt_and_parser("constrained")
+    products = [{"title": "ok", "description": ""}] * 4
+
+    with pytest.raises(ValueError, match="pack_size=2"):
+        list(categorize_batches(ScriptedChatModel(), prompt, products, parser=parser, pack_size=2))
+    with pytest.raises(ValueError, match="pack_size=2"):
+        asyncio.run(run_pipeline(None, None, ScriptedChatModel(), parser=parser, pack_size=2))
@@ -0,0 +1,139 @@
+"""Tests of the routing of the LLM pool with fake chat models."""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+import pytest
+
+pytest.importorskip("langchain_core")
+
+from langchain_core.language_models.chat_models import SimpleChatModel
+
+from core.llm_pool import LLMPool, PoolBackend
+
+
+class FakeChatModel(SimpleChatModel):
+    """A chat model answering its name, failing while `fail` is set, and waiting
+    for `gate` to be opened when it has one."""
+
+    answer: str
+    fail: bool = False
+    gate: Any = None
+
+    def _call(self, messages, stop=None, run_manager=None, **kwargs) -> str:
+        """Answer the name of the model."""
+        if self.gate is not None:
+            self.gate.wait(timeout=5)
+        if self.fail:
+            raise ConnectionError(f"{self.answer} down")
+        return self.answer
+
+    @property
+    def _llm_type(self) -> str:
+        """The type of the model."""
+        return "fake"
+
+
+def wait_for(condition, timeout: float = 5) -> None:
+    """Wait until the condition is true."""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def in_flight(pool: LLMPool, calls: int) -> tuple[dict[str, int], list[str]]:
+    """Send calls to the pool that wait on their gate, and return the requests
+    in flight per backend once all of them are routed, and the answers."""
+    with ThreadPoolExecutor(max_workers=calls) as executor:
+        futures = [executor.submit(pool.invoke, "hola") for _ in range(calls)]
+        wait_for(lambda: sum(b["outstanding"] for b in pool.stats.values()) == calls)
+        outstanding = {name: backend["outstanding"] for name, backend in pool.stats.items()}
+        for backend in pool.backends:
+            backend.runnable.gate.set()
+        return outstanding, [future.result().content for future in futures]
+
+
+def test_routes_to_least_outstanding_backend():
+    """The calls are spread over the backends of a tier by requests in
+    flight."""
+    gate = threading.Event()
+    pool = LLMPool(
+        [
+            PoolBackend("a", FakeChatModel(answer="a", gate=gate), max_concurrency=4),
+            PoolBackend("b", FakeChatModel(answer="b", gate=gate), max_concurrency=4),
+        ]
+    )
+
+    outstanding, answers = in_flight(pool, 4)
+
+    assert outstanding == {"a": 2, "b": 2}
+    assert sorted(answers) == ["a", "a", "b", "b"]
+
+
+def test_spills_over_to_next_tier_when_full():
+    """A higher tier only gets the calls that do not fit in the lower one."""
+    pool = LLMPool(
+        [
+            PoolBackend("local", FakeChatModel(answer="local"), max_concurrency=2),
+            PoolBackend("cloud", FakeChatModel(answer="cloud"), max_concurrency=4, priority=1),
+        ]
+    )
+    assert [pool.invoke("hola").content for _ in range(3)] == ["local"] * 3
+    assert pool.stats["cloud"]["requests"] == 0
+
+    for backend in pool.backends:
+        backend.runnable.gate = threading.Event()
+    outstanding, _ = in_flight(pool, 3)
+
+    assert outstanding == {"local": 2, "cloud": 1}
+
+
+def test_fails_over_and_cools_down():
+    """A failed backend is skipped during its cooldown and gets traffic again
+    when it ends."""
+    down = FakeChatModel(answer="a", fail=True)
+    pool = LLMPool(
+        [PoolBackend("a", down), PoolBackend("b", FakeChatModel(answer="b"), priority=1)],
+        cooldown_s=0.2,
+    )
+
+    assert pool.invoke("hola").content == "b"
+    assert pool.stats["a"] == {"requests": 1, "failures": 1, "outstanding": 0, "up": False}
+
+    assert pool.invoke("hola").content == "b"
+    assert pool.stats["a"]["requests"] == 1
+
+    down.fail = False
+    time.sleep(0.25)
+    assert pool.invoke("hola").content == "a"
+    assert pool.stats["a"]["up"]
+
+
+def test_raises_when_every_backend_fails():
+    """The error of the last backend is raised when none answers."""
+    pool = LLMPool(
+        [
+            PoolBackend("a", FakeChatModel(answer="a", fail=True)),
+            PoolBackend("b", FakeChatModel(answer="b", fail=True)),
+        ]
+    )
+
+    with pytest.raises(ConnectionError):
+        pool.invoke("hola")
+    assert all(backend["failures"] == 1 for backend in pool.stats.values())
+
+
+def test_check_health_updates_cooldowns():
+    """The health check puts the failing backends down and the others up."""
+    pool = LLMPool(
+        [
+            PoolBackend("a", FakeChatModel(answer="a")),
+            PoolBackend("b", FakeChatModel(answer="b", fail=True)),
+        ]
+    )
+
+    assert pool.check_health() == {"a": True, "b": False}
+    assert not pool.stats["b"]["up"]
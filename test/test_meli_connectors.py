@@ -0,0 +1,99 @@
+"""Tests of the search paging of the connectors against the mock API."""
+
+import asyncio
+
+import pytest
+
+from benchmarks.mock_api import MockCatalog, MockMeliAPI
+from core import Country, MercadoLibreItems
+from core.meli_connectors import SEARCH_MAX_RESULTS, SEARCH_PAGE_SIZE
+
+
+def connector(catalog: MockCatalog) -> tuple[MercadoLibreItems, MockMeliAPI]:
+    """Return the connector of Colombia on the mock API of the catalog."""
+    api = MockMeliAPI(catalog)
+    meli = MercadoLibreItems(
+        Country(country="Colombia"),
+        transport=api.transport(),
+        async_transport=api.async_transport(),
+    )
+    return meli, api
+
+
+@pytest.mark.parametrize(
+    "total, limit, offsets",
+    [(120, 1000, [0, 50, 100]), (120, 60, [0, 50]), (120, None, [0, 50, 100]), (0, 1000, [])],
+)
+def test_only_existing_pages_are_planned(total, limit, offsets):
+    """The pages requested are the ones the listing count and the limit need."""
+    meli, _ = connector(MockCatalog(categories=1))
+
+    planned = meli._plan_search("MCO1000", {}, {"paging": {"total": total}}, limit)
+
+    assert planned == (offsets, [])
+
+
+def test_search_without_split_filters_stops_at_the_offset_cap():
+    """A search over the offset cap without filters to split it requests the
+    pages up to the cap."""
+    meli, _ = connector(MockCatalog(categories=1))
+
+    offsets, searches = meli._plan_search("MCO1000", {}, {"paging": {"total": 5000}}, None)
+
+    assert searches == []
+    assert offsets == list(range(0, SEARCH_MAX_RESULTS, SEARCH_PAGE_SIZE))
+
+
+def test_split_shares_the_limit_between_the_values():
+    """The narrower searches get the listings of each value, up to the limit."""
+    meli, _ = connector(MockCatalog(categories=1))
+    first_page = {
+        "paging": {"total": 3000},
+        "available_filters": [
+            {"id": "ITEM_CONDITION", "values": [{"id": "new", "results": 1000}]},
+            {
+                "id": "category",
+                "values": [
+                    {"id": "MCO100000", "results": 1500},
+                    {"id": "MCO100001", "results": 1500},
+                ],
+            },
+        ],
+    }
+
+    _, searches = meli._plan_search("MCO1000", {}, first_page, 2000)
+
+    assert searches == [("MCO100000", {}, 1500), ("MCO100001", {}, 500)]
+
+
+def test_large_category_is_crawled_through_its_subcategories():
+    """A category over the offset cap is crawled through its subcategories,
+    getting every listing once and no page past the cap."""
+    meli, _ = connector(MockCatalog(categories=1, subcategories=3, products_per_category=600))
+
+    products = meli.get_products_by_category("MCO1000", limit=None)
+
+    assert len(products.index) == 1800
+    assert products["id"].is_unique
+
+
+def test_large_leaf_is_crawled_by_condition():
+    """A leaf over the offset cap is split on the condition of its listings."""
+    meli, _ = connector(MockCatalog(categories=1, products_per_category=1500))
+
+    products = meli.get_products_by_category("MCO1000", limit=None)
+
+    assert len(products.index) == 1500
+    assert products["id"].is_unique
+
+
+def test_async_crawl_plans_the_same_pages():
+    """The async crawl collects the same products as the sync one, with the
+    limit applied over the narrower searches."""
+    meli, _ = connector(MockCatalog(categories=2, subcategories=3, products_per_category=600))
+
+    sync_products = meli.gell_all_country_products(limit=1200)
+    async_products = asyncio.run(meli.agell_all_country_products(limit=1200))
+
+    assert len(sync_products.index) == 2 * 1200
+    assert async_products.equals(sync_products)
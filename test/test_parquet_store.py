@@ -0,0 +1,82 @@
+"""Tests of the partitioned Parquet storage of the tables."""
+
+import pytest
+
+pytest.importorskip("pyarrow")
+
+import pyarrow.dataset as ds
+
+from libs import ParquetStore
+from libs.schemas import PRODUCT_COLUMNS, typed_frame
+
+
+@pytest.fixture
+def store(tmp_path) -> ParquetStore:
+    """A store in a temporary directory."""
+    return ParquetStore(str(tmp_path))
+
+
+def products(prices: list[float], crawl_date: str = "2026-10-18"):
+    """Return the products with the prices, one per id, crawled on the date."""
+    frame = typed_frame(
+        [
+            {"id": f"MCO{i}", "title": f"Producto {i}", "price": price, "condition": "new"}
+            for i, price in enumerate(prices)
+        ],
+        PRODUCT_COLUMNS,
+    )
+    return frame.assign(crawl_date=crawl_date)
+
+
+def test_write_replaces_the_partition(store):
+    """Writing a country again on the same day replaces its rows, and leaves the
+    other countries and days alone."""
+    store.write_dataframe("country_products_Colombia", products([1.0, 2.0, 3.0]))
+    store.write_dataframe("country_products_Colombia", products([5.0], "2026-10-17"))
+    store.write_dataframe("country_products_Chile", products([7.0, 8.0]))
+    store.write_dataframe("country_products_Colombia", products([4.0, 6.0]))
+
+    colombia = store.read_table("country_products_Colombia").sort_values(["crawl_date", "id"])
+
+    assert colombia["price"].tolist() == [5.0, 4.0, 6.0]
+    assert len(store.read_table("country_products_Chile").index) == 2
+    assert store.get_table_names() == ["country_products"]
+
+
+def test_append_adds_to_the_partition(store):
+    """Writing with append keeps the rows already in the partition."""
+    store.write_dataframe("country_products_Colombia", products([1.0, 2.0]))
+    store.write_dataframe("country_products_Colombia", products([3.0]), append=True)
+
+    assert len(store.read_table("country_products_Colombia").index) == 3
+
+
+def test_reads_apply_the_filters(store):
+    """The filters, as tuples or as an expression, and the columns restrict the
+    rows and columns read, within the country of the table name."""
+    store.write_dataframe("country_products_Colombia", products([1.0, 20.0, 30.0]))
+    store.write_dataframe("country_products_Chile", products([40.0]))
+
+    tuples = store.read_table(
+        "country_products_Colombia", ["id", "price"], filters=[("price", ">", 10.0)]
+    )
+    expression = store.read_table(
+        "country_products_Colombia", ["price"], filters=ds.field("price") > 10.0
+    )
+
+    assert sorted(tuples["id"].tolist()) == ["MCO1", "MCO2"]
+    assert tuples.columns.tolist() == ["id", "price"]
+    assert sorted(expression["price"].tolist()) == [20.0, 30.0]
+
+
+def test_frames_are_chunked_and_typed(store):
+    """The table is read in chunks of at most chunk_size rows, with the types of
+    the schema."""
+    store.write_dataframe("country_products_Colombia", products([float(i) for i in range(5)]))
+
+    frames = list(store.iter_table_frames("country_products_Colombia", chunk_size=2))
+
+    assert sum(len(frame.index) for frame in frames) == 5
+    assert max(len(frame.index) for frame in frames) <= 2
+    assert str(frames[0]["price"].dtype) == "float64"
+    assert frames[0]["country"].unique().tolist() == ["Colombia"]
@@ -0,0 +1,36 @@
+"""Tests of the rules over the titles."""
+
+import pytest
+
+from core import ProductCategory
+from core.rule_classifier import RuleClassifier
+
+
+@pytest.mark.parametrize(
+    "title, category",
+    [
+        ("Paquete X 6unidades De 250ml", ProductCategory.PACKAGE),
+        ("Paquete X 6 Unidades De 250ml", ProductCategory.PACKAGE),
+        ("Pack X10und Pilas AA", ProductCategory.PACKAGE),
+        ("Kit De 4piezas Llaves", ProductCategory.MULTIPLE_UNITS),
+        ("Vasos x 6unds Vidrio", ProductCategory.MULTIPLE_UNITS),
+    ],
+)
+def test_number_attached_to_the_units(title, category):
+    """A number written together with its units is read like a separate one."""
+    assert RuleClassifier().classify(title)[0] == category
+
+
+@pytest.mark.parametrize(
+    "title",
+    ["Cable Hdmi X 1 Unidad", "Mouse Inalambrico X1", "Vaso Vidrio x 1", "Vaso x 1und"],
+)
+def test_one_unit_is_a_single_unit(title):
+    """A quantity of one is a single unit, not multiple units."""
+    assert RuleClassifier().classify(title) == (ProductCategory.SINGLE_UNIT, 0.85)
+
+
+@pytest.mark.parametrize("title", ["Vasos x 12", "Pilas X10", "Kit De 10 Llaves"])
+def test_quantities_starting_with_one_are_multiple_units(title):
+    """A quantity that only starts with a one is still multiple units."""
+    assert RuleClassifier().classify(title)[0] == ProductCategory.MULTIPLE_UNITS
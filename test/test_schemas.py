@@ -0,0 +1,65 @@
+"""Tests of the schemas of the stored tables."""
+
+import subprocess
+import sys
+
+import pytest
+from conftest import SRC
+
+from libs import DatabaseHandler
+from libs.schemas import PRODUCT_COLUMNS, typed_frame
+
+PRICES = [1999.99, 85_000_001.0, 0.1, 123_456_789.99]
+
+
+def products() -> list[dict]:
+    """Return search results with prices that float32 would change."""
+    return [
+        {
+            "id": f"MCO{i}",
+            "title": f"Producto {i}",
+            "price": price,
+            "permalink": f"https://example.com/MCO{i}",
+            "condition": "new",
+            "available_quantity": i,
+        }
+        for i, price in enumerate(PRICES)
+    ]
+
+
+def test_prices_round_trip_sqlite(tmp_path):
+    """The prices stored in SQLite come back exactly."""
+    with DatabaseHandler(str(tmp_path / "meli.db")) as db:
+        db.write_dataframe("country_products_Colombia", typed_frame(products(), PRODUCT_COLUMNS))
+        stored = db.cur.execute(
+            "SELECT price FROM country_products_Colombia ORDER BY id"
+        ).fetchall()
+
+    assert [price for (price,) in stored] == PRICES
+
+
+def test_prices_round_trip_parquet(tmp_path):
+    """The prices stored in Parquet come back exactly."""
+    pytest.importorskip("pyarrow")
+    from libs import ParquetStore
+
+    store = ParquetStore(str(tmp_path))
+    store.write_dataframe("country_products_Colombia", typed_frame(products(), PRODUCT_COLUMNS))
+    stored = store.read_table("country_products_Colombia").sort_values("id")
+
+    assert stored["price"].tolist() == PRICES
+
+
+def test_schemas_work_without_pyarrow():
+    """The crawler and the typed frames do not need pyarrow."""
+    code = (
+        "import sys; sys.modules['pyarrow'] = None\n"
+        "from core import MercadoLibreItems\n"
+        "from libs.schemas import PRODUCT_COLUMNS, typed_frame\n"
+        "print(typed_frame([{'price': 1999.99}], PRODUCT_COLUMNS)['price'][0])\n"
+    )
+    completed = subprocess.run(
+        [sys.executable, "-c", code], cwd=SRC, capture_output=True, text=True, check=True
+    )
+
+    assert completed.stdout.strip() == "1999.99"
@@ -0,0 +1,90 @@
+"""Tests of the SQLite storage of the tables."""
+
+import pandas as pd
+import pytest
+
+from libs import DatabaseHandler
+
+
+@pytest.fixture
+def db(tmp_path):
+    """A connected database."""
+    with DatabaseHandler(str(tmp_path / "meli.db")) as db:
+        yield db
+
+
+def products(prices: list[float]) -> pd.DataFrame:
+    """Return the products with the prices, one per id."""
+    return pd.DataFrame(
+        {"id": [f"MCO{i}" for i in range(len(prices))], "title": "Producto", "price": prices}
+    )
+
+
+def stored(db: DatabaseHandler, table_name: str) -> list[tuple]:
+    """Return the ids and prices of the table."""
+    return db.cur.execute(f"SELECT id, price FROM {table_name} ORDER BY id;").fetchall()
+
+
+def test_upsert_is_idempotent(db):
+    """Writing the same rows again keeps one row per id, with the last
+    values."""
+    db.write_dataframe("country_products_Colombia", products([10.0, 20.0]))
+    db.write_dataframe("country_products_Colombia", products([10.0, 20.0]))
+    db.write_dataframe("country_products_Colombia", products([11.0, 20.0, 30.0]))
+
+    assert stored(db, "country_products_Colombia") == [
+        ("MCO0", 11.0),
+        ("MCO1", 20.0),
+        ("MCO2", 30.0),
+    ]
+
+
+def test_legacy_table_with_repeated_ids(db):
+    """A table written by `to_sql` with repeated ids keeps their last row and
+    gets the unique key, instead of failing to create it."""
+    legacy = pd.concat([products([10.0, 20.0]), products([15.0])])
+    legacy.to_sql("country_products_Colombia", db.cnx, index=False)
+
+    db.write_dataframe("country_products_Colombia", products([16.0, 20.0, 30.0])[1:])
+    db.write_dataframe("country_products_Colombia", products([17.0]))
+
+    assert stored(db, "country_products_Colombia") == [
+        ("MCO0", 17.0),
+        ("MCO1", 20.0),
+        ("MCO2", 30.0),
+    ]
+
+
+def test_keyset_chunks_read_every_row_once(db):
+    """The chunks read the rows in key order, each one once, with only the
+    requested columns."""
+    db.write_dataframe("country_products_Colombia", products([float(i) for i in range(7)]))
+
+    chunks = list(db.iter_table_data("country_products_Colombia", ["price"], chunk_size=3))
+
+    assert [len(chunk) for chunk in chunks] == [3, 3, 1]
+    assert [row for chunk in chunks for row in chunk] == [(float(i),) for i in range(7)]
+
+
+def test_keyset_chunks_continue_after_the_last_key(db):
+    """A row written while the table is read is only read if its key comes after
+    the last key read, so no row is read twice or shifted out."""
+    db.write_dataframe("country_products_Colombia", products([0.0, 1.0, 2.0, 3.0]))
+    chunks = db.iter_table_data("country_products_Colombia", ["id"], chunk_size=2)
+
+    first = next(chunks)
+    db.upsert_rows("country_products_Colombia", ["id", "price"], [("MCO00", 9.0), ("MCO9", 9.0)])
+
+    assert first == [("MCO0",), ("MCO1",)]
+    assert [row for chunk in chunks for row in chunk] == [("MCO2",), ("MCO3",), ("MCO9",)]
+
+
+def test_table_without_key_is_read_by_rowid(db):
+    """A table without a known key is paginated on its rowid."""
+    pd.DataFrame({"name": list("dcbae")}).to_sql("notes", db.cnx, index=False)
+
+    frames = list(db.iter_table_frames("notes", chunk_size=2))
+
+    assert [len(frame) for frame in frames] == [2, 2, 1]
+    assert pd.concat(frames)["name"].tolist() == list("dcbae")
+    assert frames[0].columns.tolist() == ["name"]